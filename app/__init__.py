@@ -1,8 +1,26 @@
 from flask import Flask, render_template, jsonify, request
+import click
 import importlib
+import inspect
+import json
 import logging
 import os
 import glob
+import tempfile
+from app.core.artifacts import expand_grid, find_artifact, write_artifact
+from app.core.benchmark import SCALES, benchmark_cases, compare, report, run_benchmarks
+from app.core.cache import topic_cache
+from app.core.compiled import write_compiled
+from app.core.dataset import DATA_CONFIG_KEYS, dataset_version, store as dataset_store
+from app.core.embeddings import embedding_store
+from app.core.heatmap import encode_tile, parse_range
+from app.core.http_cache import ResponseCache, response_etag
+from app.core.ingest import ingest
+from app.core.jobs import JobQueue
+from app.core.pseudonyms import similarity_matrix
+from app.core.registry import VisualizationRegistry
+from app.core.shaping import shape_response, split_shaping_params
+from app.core.watcher import DataWatcher
 
 app = Flask(__name__)
 
@@ -64,6 +82,28 @@ for key, value in data_config.items():
     app.config[key] = value
     logger.info(f"Configured {key}: {os.path.basename(value)}")
 
+def reload_data():
+    """Re-detect the data files and swap in a dataset snapshot built from them
+
+    Runs in the data watcher thread; requests keep reading the previous
+    snapshot until the new one (parsed files and rebuilt indexes) is ready.
+    """
+    config = setup_data_files()
+    with app.app_context():
+        dataset_store.refresh([path for path in config.values() if path.endswith(".json")])
+    for key, value in config.items():
+        app.config[key] = value
+    data_config.update(config)
+
+# Seconds between polls of data/ for new exports (0 disables hot reload)
+app.config.setdefault("WATCH_DATA_INTERVAL", 2.0)
+data_watcher = DataWatcher(os.path.join(base_dir, "data"), reload_data, app.config["WATCH_DATA_INTERVAL"])
+
+# Directory for persistent caches (fitted topic models, ...)
+app.config.setdefault("CACHE_DIR", os.path.join(base_dir, "cache"))
+# Precomputed responses written by `flask precompute`
+app.config.setdefault("ARTIFACT_DIR", os.path.join(base_dir, "cache", "artifacts"))
+
 # Log configuration status
 logger.info(f"Data configuration complete. Files found: {list(data_config.keys())}")
 
@@ -119,6 +159,16 @@ if not VISUALIZATIONS:
     logger.warning(f"Using fallback visualizations: {VISUALIZATIONS}")
 
 visualization_modules = {}
+visualization_registry = VisualizationRegistry(os.path.join(os.path.dirname(__file__), "visualizations"))
+
+# Visualizations that accept ?async=1 and run in the background job pool
+ASYNC_VISUALIZATIONS = ["topic_modeling"]
+# Settings handed to job workers, which import the app afresh
+JOB_CONFIG_KEYS = DATA_CONFIG_KEYS + ["CACHE_DIR"]
+job_queue = JobQueue(max_workers=app.config.get("JOB_WORKERS", 2))
+
+# Serialized /data responses and their gzip/brotli variants, per ETag
+response_cache = ResponseCache()
 
 def load_visualization_module(viz_name):
     """Lazy load visualization module when needed."""
@@ -135,30 +185,32 @@ def load_visualization_module(viz_name):
             return None
     return visualization_modules.get(viz_name)
 
+def unknown_params(function, params):
+    """Names in ``params`` that ``function`` has no argument for"""
+    signature = inspect.signature(function)
+    if any(p.kind is p.VAR_KEYWORD for p in signature.parameters.values()):
+        return []
+    return sorted(set(params) - set(signature.parameters))
+
+@app.before_request
+def pin_dataset_snapshot():
+    # The watcher replaces per-access file checks once the server handles requests
+    if app.config["WATCH_DATA_INTERVAL"] and not data_watcher.running:
+        dataset_store.check_files = False
+        data_watcher.start()
+    # Each request reads a single snapshot, even if a reload swaps in a new one meanwhile
+    dataset_store.pin()
+
+@app.teardown_request
+def unpin_dataset_snapshot(exc):
+    dataset_store.unpin()
+
 @app.route("/")
 def index():
     viz_list = []
     for name in VISUALIZATIONS:
-        # Try to load module to get metadata
-        module = load_visualization_module(name)
-        if module:
-            viz_list.append(
-                {
-                    "name": name,
-                    "title": getattr(module, "TITLE", name.replace("_", " ").title()),
-                    "description": getattr(module, "DESCRIPTION", f"Visualization for {name}"),
-                }
-            )
-        else:
-            # Add with default values if module can't be loaded
-            viz_list.append(
-                {
-                    "name": name,
-                    "title": name.replace("_", " ").title(),
-                    "description": f"Visualization for {name}",
-                }
-            )
-            logger.warning(f"Visualization {name} could not be loaded, using defaults")
+        # Metadata is read from the module source, so rendering never imports it
+        viz_list.append(visualization_registry.metadata(name))
 
     logger.debug(f"Rendering index with visualizations: {[v['name'] for v in viz_list]}")
     return render_template("index.html", visualizations=viz_list)
@@ -182,17 +234,6 @@ def get_data(viz_name):
         logger.error(f"Visualization not found: {viz_name}")
         return jsonify({"error": "Visualization not found"}), 404
 
-    # Lazy load the module
-    module = load_visualization_module(viz_name)
-    if not module:
-        logger.error(f"Failed to load visualization module: {viz_name}")
-        return jsonify({"error": "Visualization module could not be loaded"}), 500
-
-    # Check if get_data function exists
-    if not hasattr(module, 'get_data'):
-        logger.error(f"get_data function not found in {viz_name}")
-        return jsonify({"error": f"get_data function not found in {viz_name}"}), 500
-
     try:
         # Extract parameters from both GET and POST requests
         params = {}
@@ -206,16 +247,187 @@ def get_data(viz_name):
                 params.update(request.get_json() or {})
             else:
                 params.update(request.form.to_dict())
+        run_async = str(params.pop("async", "")).lower() in ("1", "true", "yes")
+        data_params, shaping = split_shaping_params(params)
+
+        # Conditional GET and cached (compressed) bodies, keyed by dataset version + params
+        etag = response_etag(dataset_version(), viz_name, params)
+        if etag in request.if_none_match:
+            return response_cache.not_modified_response(etag)
+        if etag in response_cache:
+            cached = response_cache.respond(etag, request)
+            if cached is not None:
+                return cached
+
+        # Serve the response written by `flask precompute` for this dataset version;
+        # artifacts hold the default shape, so only requests without shaping use them
+        artifact = None if shaping else find_artifact(viz_name, data_params)
+        if artifact:
+            logger.debug(f"Serving precomputed {viz_name} response: {artifact}")
+            with open(artifact, "rb") as f:
+                response_cache.put(etag, f.read())
+            return response_cache.respond(etag, request)
+    except Exception as e:
+        logger.exception(f"Error reading request for {viz_name}")
+        return jsonify({"error": str(e)}), 500
+
+    # Lazy load the module
+    module = load_visualization_module(viz_name)
+    if not module:
+        logger.error(f"Failed to load visualization module: {viz_name}")
+        return jsonify({"error": "Visualization module could not be loaded"}), 500
+
+    # Check if get_data function exists
+    if not hasattr(module, 'get_data'):
+        logger.error(f"get_data function not found in {viz_name}")
+        return jsonify({"error": f"get_data function not found in {viz_name}"}), 500
+
+    try:
+        # Long-running visualizations can be computed in the background job pool
+        if run_async and viz_name in ASYNC_VISUALIZATIONS:
+            job_id = job_queue.submit(
+                viz_name, data_params, dataset_version(),
+                config={key: app.config.get(key) for key in JOB_CONFIG_KEYS},
+            )
+            status = job_queue.status(job_id)
+            status["status_url"] = f"/jobs/{job_id}"
+            status["result_url"] = f"/jobs/{job_id}/result"
+            return jsonify(status), 202
 
-        # Pass parameters as kwargs to get_data function
-        data = module.get_data(**params)
+        # Pass parameters as kwargs to get_data function; ValueError means bad parameters
+        try:
+            data = module.get_data(**data_params)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         logger.debug(f"Returning data for {viz_name} with params {params}: data keys={list(data.keys()) if isinstance(data, dict) else 'non-dict'}")
-        return jsonify(data)
+        if isinstance(data, dict) and data.get("error"):
+            return jsonify(data)
+        try:
+            data = shape_response(module, data, shaping)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        response_cache.put(etag, jsonify(data).get_data())
+        return response_cache.respond(etag, request)
     except Exception as e:
         logger.exception(f"Error generating data for {viz_name}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/data/<viz_name>/<part>")
+def get_data_part(viz_name, part):
+    """One separately cached part of a visualization's data (``PARTS`` of its module)
+
+    The ETag only covers the data files the part reads, so e.g. the
+    relationship graph stays cached when new messages arrive.
+    """
+    module = load_visualization_module(viz_name) if viz_name in VISUALIZATIONS else None
+    parts = getattr(module, "PARTS", {})
+    if part not in parts:
+        logger.error(f"Data part not found: {viz_name}/{part}")
+        return jsonify({"error": "Data part not found"}), 404
+
+    params = request.args.to_dict()
+    data_params, shaping = split_shaping_params(params)
+    get_part = getattr(module, f"get_{part}")
+    unknown = unknown_params(get_part, data_params)
+    if unknown:
+        return jsonify({"error": f"Unknown parameter for {viz_name}/{part}: {', '.join(unknown)}"}), 400
+    etag = response_etag(dataset_version(parts[part]), f"{viz_name}/{part}", params)
+    if etag in request.if_none_match:
+        return response_cache.not_modified_response(etag)
+    if etag in response_cache:
+        cached = response_cache.respond(etag, request)
+        if cached is not None:
+            return cached
+
+    try:
+        data = get_part(**data_params)
+        if isinstance(data, dict) and data.get("error"):
+            return jsonify(data)
+        try:
+            data = shape_response(module, data, shaping)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        response_cache.put(etag, jsonify(data).get_data())
+        return response_cache.respond(etag, request)
+    except Exception as e:
+        logger.exception(f"Error generating data for {viz_name}/{part}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/data/graph/heatmap/tiles")
+def graph_heatmap_tiles():
+    """Binary tile of the entity similarity matrix
+
+    ``rows``/``cols`` select ``start:stop`` ranges of the entity order given
+    by ``/data/graph/heatmap``, ``dtype`` is ``float16`` or ``float32`` and
+    ``top_k`` keeps each row's k most similar entities (see ``encode_tile``).
+    """
+    params = request.args.to_dict()
+    version = dataset_version(load_visualization_module("graph").PARTS["heatmap"])
+    etag = response_etag(version, "graph/heatmap/tiles", params)
+    if etag in request.if_none_match:
+        return response_cache.not_modified_response(etag)
+    if etag in response_cache:
+        cached = response_cache.respond(etag, request)
+        if cached is not None:
+            return cached
+
+    try:
+        entities, matrix, source = similarity_matrix()
+        rows = parse_range(params.get("rows"), len(entities))
+        cols = parse_range(params.get("cols"), len(entities))
+        top_k = params.get("top_k")
+        body, headers = encode_tile(
+            matrix, rows, cols,
+            dtype=params.get("dtype", "float32"),
+            top_k=int(top_k) if top_k not in (None, "") else None,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("Error building heatmap tile")
+        return jsonify({"error": str(e)}), 500
+
+    headers["Content-Type"] = "application/octet-stream"
+    headers["X-Heatmap-Entities"] = str(len(entities))
+    headers["X-Heatmap-Source"] = source
+    response_cache.put(etag, body, headers)
+    return response_cache.respond(etag, request)
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status)
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    if status["status"] == "failed":
+        return jsonify({"error": status["error"]}), 500
+    if status["status"] != "done":
+        return jsonify(status), 202
+    _, shaping = split_shaping_params(request.args.to_dict())
+    module = load_visualization_module(status["viz_name"])
+    try:
+        return jsonify(shape_response(module, job_queue.result(job_id), shaping))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/ingest", methods=["POST"])
+def ingest_events():
+    """Append new events and entities (``{"nodes": [...], "edges": [...]}``)"""
+    try:
+        return jsonify(ingest(request.get_json(silent=True)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("Error ingesting events")
+        return jsonify({"error": str(e)}), 500
+
 # Add a simple test route for debugging
 @app.route("/test")
 def test():
@@ -225,5 +437,117 @@ def test():
         "data_files": {k: os.path.basename(v) for k, v in data_config.items()}
     })
 
+@app.route("/stats")
+def stats():
+    return jsonify({
+        "dataset": dataset_store.stats(),
+        "watcher": data_watcher.stats(),
+        "topic_cache": topic_cache.stats(),
+        "embeddings": embedding_store().stats(),
+        "jobs": job_queue.stats(),
+        "responses": response_cache.stats(),
+    })
+
+@app.cli.command("precompute")
+@click.option("--only", "only", multiple=True, help="Limit to these visualizations.")
+@click.option("--force", is_flag=True, help="Recompute artifacts that already exist.")
+def precompute(only, force):
+    """Warm every visualization payload for the current dataset version"""
+    version = dataset_version()
+    click.echo(f"Precomputing visualization data for dataset version {version}")
+
+    for viz_name in VISUALIZATIONS:
+        if only and viz_name not in only:
+            continue
+        module = load_visualization_module(viz_name)
+        if not module or not hasattr(module, "get_data"):
+            click.echo(f"  {viz_name}: skipped (module could not be loaded)")
+            continue
+
+        for params in expand_grid(getattr(module, "PRECOMPUTE_GRID", [{}])):
+            if not force and find_artifact(viz_name, params):
+                continue
+            try:
+                data = module.get_data(**params)
+            except Exception as e:
+                click.echo(f"  {viz_name} {params}: failed ({e})")
+                continue
+            if isinstance(data, dict) and data.get("error"):
+                click.echo(f"  {viz_name} {params}: not stored ({data['error']})")
+                continue
+            data = shape_response(module, data)
+            write_artifact(viz_name, params, app.json.response(data).get_data(as_text=True), version)
+            click.echo(f"  {viz_name} {params}: ok")
+
+@app.cli.command("compile-data")
+def compile_data():
+    """Write the compiled snapshot next to every configured JSON data file"""
+    for key, path in data_config.items():
+        if not path.endswith(".json"):
+            continue
+        with open(path, "r") as f:
+            target = write_compiled(path, json.load(f))
+        click.echo(f"  {key}: {os.path.relpath(target, base_dir)}")
+
+@app.cli.command("ingest")
+@click.argument("files", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+def ingest_files(files):
+    """Append the nodes and edges of JSON files dropped in, one batch per file"""
+    for path in files:
+        with open(path, "r") as f:
+            payload = json.load(f)
+        try:
+            result = ingest(payload)
+        except ValueError as e:
+            click.echo(f"  {path}: rejected ({e})")
+            continue
+        click.echo(f"  {path}: {result['nodes']} nodes, {result['edges']} edges, "
+                   f"{result['messages']} messages (dataset version {result['dataset_version']})")
+
+@app.cli.command("benchmark")
+@click.option("--scale", "scales", multiple=True, type=int, default=SCALES, show_default=True,
+              help="Dataset sizes, as multiples of the messages in the data files.")
+@click.option("--only", "only", multiple=True, help="Limit to these visualizations.")
+@click.option("--output", default=os.path.join(base_dir, "cache", "benchmark", "results.json"),
+              show_default=True, help="Where to write the results.")
+@click.option("--baseline", default=os.path.join(base_dir, "cache", "benchmark", "baseline.json"),
+              show_default=True, help="Results to compare against.")
+@click.option("--save-baseline", is_flag=True, help="Also store the results as the new baseline.")
+@click.option("--tolerance", default=0.25, show_default=True,
+              help="Growth ratio of a metric over the baseline flagged as a regression.")
+def benchmark(scales, only, output, baseline, save_baseline, tolerance):
+    """Time every visualization's get_data on scaled copies of the data files"""
+    topic_methods = load_visualization_module("topic_modeling").TOPIC_METHODS
+    cases = [(viz, params) for viz, params in benchmark_cases(topic_methods) if not only or viz in only]
+    client = app.test_client()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as directory:
+        for result in run_benchmarks(app, client, response_cache, cases, directory, scales):
+            results.append(result)
+            status = f"failed ({result['error']})" if result["error"] else "ok"
+            click.echo(f"  {result['case']} x{result['scale']}: {result['seconds']:.3f}s, "
+                       f"peak {result['peak_bytes'] / 2**20:.1f} MiB, "
+                       f"{result['payload_bytes'] / 1024:.1f} KiB, {status}")
+
+    current = report(results, scales)
+    targets = [output] + ([baseline] if save_baseline else [])
+    for path in targets:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(current, f, indent=2)
+    click.echo(f"Results written to {output}")
+
+    if save_baseline or not os.path.exists(baseline):
+        return
+    with open(baseline, "r") as f:
+        regressions = compare(current, json.load(f), tolerance)
+    for r in regressions:
+        change = f"{r['baseline']} -> {r['current']}" + (f" ({r['ratio']}x)" if "ratio" in r else "")
+        click.echo(f"  REGRESSION {r['case']} x{r['scale']} {r['metric']}: {change}")
+    if regressions:
+        raise click.ClickException(f"{len(regressions)} regression(s) against {baseline}")
+    click.echo(f"No regressions against {baseline}")
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
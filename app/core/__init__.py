@@ -0,0 +1 @@
+# Core data services shared by the visualizations
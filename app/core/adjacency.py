@@ -0,0 +1,337 @@
+import copy
+import logging
+from collections import ChainMap
+
+import numpy as np
+from flask import current_app
+
+from app.core.buffers import Column, SharedBuffer, objects, reset_columns
+from app.core.compiled import STRING
+from app.core.dataset import store
+
+logger = logging.getLogger(__name__)
+
+UNTYPED = "untyped"
+
+
+class _TypedCSR:
+    """Outgoing and incoming CSR arrays for the edges of a single type"""
+
+    def __init__(self, n_nodes, src, dst, edge_pos):
+        # Stable sorts keep the original edge order within each neighbourhood
+        out_order = np.argsort(src, kind="stable")
+        self.out_ptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n_nodes), out=self.out_ptr[1:])
+        self.out_idx = dst[out_order]
+        self.out_edge = edge_pos[out_order]
+
+        in_order = np.argsort(dst, kind="stable")
+        self.in_ptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(dst, minlength=n_nodes), out=self.in_ptr[1:])
+        self.in_idx = src[in_order]
+        self.in_edge = edge_pos[in_order]
+
+    def __len__(self):
+        return len(self.out_idx)
+
+
+class AdjacencyIndex:
+    """Compact typed adjacency of a node-link graph
+
+    Nodes are numbered in file order. Edges are split by their ``type``
+    attribute (``sent``, ``received``, ``evidence_for``, ...; edges without a
+    type go under ``"untyped"``) and each type keeps its own CSR arrays in
+    both directions, so neighbour lookups cost O(degree). Edge positions
+    refer back to the original edge list for callers that need attributes.
+
+    Appended nodes and edges (``extended``) go to shared append-only
+    buffers (:class:`SharedBuffer`) that each version reads up to its own
+    length; lookups merge these tail edges with the CSR arrays, and the CSR
+    arrays are rebuilt once the tail outgrows a quarter of them, so appends
+    cost amortized O(delta).
+    """
+
+    node_ids = Column("nodes")
+    node_types = Column("nodes")
+    _tail_src = Column("tail")
+    _tail_dst = Column("tail")
+    _tail_pos = Column("tail")
+    _tail_type = Column("tail")
+
+    def __init__(self, nodes, edges):
+        node_ids = [node["id"] for node in nodes]
+        self._init_nodes(node_ids, [node.get("type") for node in nodes])
+        self.edges = edges
+        self._build()
+
+    @classmethod
+    def from_columns(cls, node_ids, node_types, src, dst, pos, types):
+        """Index over edge arrays already resolved to node indices"""
+        index = cls.__new__(cls)
+        index._init_nodes(node_ids, node_types)
+        # Only needed to rebuild after appends, which read the parsed records
+        index.edges = None
+        index._build_csr(src, dst, pos, types)
+        return index
+
+    def _init_nodes(self, node_ids, node_types):
+        self._sizes = {"nodes": len(node_ids), "tail": 0}
+        self._buffers = {"node_ids": SharedBuffer(objects(node_ids)),
+                         "node_types": SharedBuffer(objects(node_types))}
+        # Positions of appended nodes go to the first map, folded in on compaction
+        self.node_pos = ChainMap({}, {nid: i for i, nid in enumerate(node_ids)})
+
+    def _build(self):
+        src, dst, pos, types = [], [], [], []
+        for i, edge in enumerate(self.edges):
+            s = self.node_pos.get(edge.get("source"))
+            t = self.node_pos.get(edge.get("target"))
+            if s is None or t is None:
+                continue
+            src.append(s)
+            dst.append(t)
+            pos.append(i)
+            types.append(edge.get("type") or UNTYPED)
+        self._build_csr(
+            np.asarray(src, dtype=np.int64),
+            np.asarray(dst, dtype=np.int32),
+            np.asarray(pos, dtype=np.int64),
+            np.asarray(types, dtype=object),
+        )
+
+    def _build_csr(self, src, dst, pos, types):
+        n = len(self)
+        self.by_type = {}
+        for edge_type in sorted(set(types)):
+            mask = types == edge_type
+            self.by_type[edge_type] = _TypedCSR(n, src[mask], dst[mask], pos[mask])
+
+        self._csr_nodes = n
+        self._csr_edges = len(src)
+        # Appended edges: endpoints, edge positions and codes into _tail_types
+        self._tail_types = []
+        self._sizes["tail"] = 0
+        for name, dtype in (("_tail_src", np.int64), ("_tail_dst", np.int64),
+                            ("_tail_pos", np.int64), ("_tail_type", np.int16)):
+            self._buffers[name] = SharedBuffer(np.zeros(0, dtype=dtype))
+        self._tails = {}
+        reset_columns(self)
+
+    def __len__(self):
+        return self._sizes["nodes"]
+
+    def extended(self, delta):
+        """Index with the nodes and edges appended to the graph file; this one is left as is"""
+        index = copy.copy(self)
+        reset_columns(index)
+        index._sizes = dict(self._sizes)
+        index._buffers = dict(self._buffers)
+        index.node_pos = ChainMap(dict(self.node_pos.maps[0]), self.node_pos.maps[1])
+        index._tail_types = list(self._tail_types)
+        index._tails = {}
+        index._append(delta)
+        return index
+
+    def _extend(self, name, size, values):
+        self._buffers[name] = self._buffers[name].extended(size, values)
+
+    def _append(self, delta):
+        nodes = self._sizes["nodes"]
+        for i, node in enumerate(delta.nodes, start=nodes):
+            self.node_pos[node["id"]] = i
+        self._extend("node_ids", nodes, objects([node["id"] for node in delta.nodes]))
+        self._extend("node_types", nodes, objects([node.get("type") for node in delta.nodes]))
+        self._sizes["nodes"] += len(delta.nodes)
+        self.edges = delta.data.get("edges", delta.data.get("links", []))
+
+        src, dst, pos, types = [], [], [], []
+        for i, edge in enumerate(delta.edges, start=delta.edge_start):
+            s = self.node_pos.get(edge.get("source"))
+            t = self.node_pos.get(edge.get("target"))
+            if s is None or t is None:
+                continue
+            edge_type = edge.get("type") or UNTYPED
+            if edge_type not in self._tail_types:
+                self._tail_types.append(edge_type)
+            src.append(s)
+            dst.append(t)
+            pos.append(i)
+            types.append(self._tail_types.index(edge_type))
+        tail = self._sizes["tail"]
+        for name, values in (("_tail_src", src), ("_tail_dst", dst), ("_tail_pos", pos), ("_tail_type", types)):
+            self._extend(name, tail, values)
+        self._sizes["tail"] += len(src)
+        reset_columns(self)
+
+        if len(self.node_pos.maps[0]) > max(1024, len(self.node_pos.maps[1]) // 4):
+            self.node_pos = ChainMap({}, dict(self.node_pos))
+        if self._sizes["tail"] > max(1024, self._csr_edges // 4):
+            logger.info(f"Compacting adjacency index ({self._sizes['tail']} appended edges)")
+            self.node_pos = ChainMap({}, dict(self.node_pos))
+            self._build()
+
+    def _tail(self, edge_type, outgoing):
+        """(nodes, neighbours, edge positions) of the appended edges of a type, sorted by node"""
+        key = (edge_type, outgoing)
+        if key not in self._tails:
+            code = self._tail_types.index(edge_type) if edge_type in self._tail_types else -1
+            mask = self._tail_type == code
+            nodes, neighbours = (self._tail_src, self._tail_dst) if outgoing else (self._tail_dst, self._tail_src)
+            nodes, neighbours, edge_pos = nodes[mask], neighbours[mask], self._tail_pos[mask]
+            order = np.argsort(nodes, kind="stable")
+            self._tails[key] = (nodes[order], neighbours[order].astype(np.int32), edge_pos[order])
+        return self._tails[key]
+
+    @property
+    def edge_types(self):
+        return list(dict.fromkeys([*self.by_type, *self._tail_types]))
+
+    def _type_names(self, edge_types):
+        if edge_types is None:
+            return self.edge_types
+        if isinstance(edge_types, str):
+            return [edge_types]
+        return list(edge_types)
+
+    def out_edges(self, node, edge_types=None):
+        """(neighbour indices, edge positions) of edges leaving ``node``
+
+        ``node`` is a node index. With several types the edges are returned
+        in their original file order.
+        """
+        return self._collect(node, edge_types, outgoing=True)
+
+    def in_edges(self, node, edge_types=None):
+        """(neighbour indices, edge positions) of edges entering ``node``"""
+        return self._collect(node, edge_types, outgoing=False)
+
+    def successors(self, node, edge_types=None):
+        return self.out_edges(node, edge_types)[0]
+
+    def predecessors(self, node, edge_types=None):
+        return self.in_edges(node, edge_types)[0]
+
+    def neighbour_lists(self, nodes, edge_type, outgoing=True):
+        """Neighbours of many nodes along one edge type, in a single pass
+
+        Returns (counts, neighbours): the neighbours of ``nodes[i]`` are the
+        ``counts[i]`` entries following those of ``nodes[:i]``, each run in
+        edge order as ``out_edges``/``in_edges`` return it.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        csr = self.by_type.get(edge_type)
+        if csr is None:
+            ptr, idx = np.zeros(self._csr_nodes + 1, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        else:
+            ptr, idx = (csr.out_ptr, csr.out_idx) if outgoing else (csr.in_ptr, csr.in_idx)
+        # Nodes appended after the CSR build have no CSR edges
+        in_csr = np.minimum(nodes, self._csr_nodes)
+        starts = ptr[in_csr]
+        csr_counts = ptr[np.minimum(nodes + 1, self._csr_nodes)] - starts
+        csr_counts[nodes >= self._csr_nodes] = 0
+        if not self._sizes["tail"]:
+            counts = csr_counts
+            offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+            return counts, idx[offsets + np.arange(counts.sum())]
+
+        # Appended edges come after every CSR edge in file order, so each run
+        # is its CSR entries followed by its tail entries
+        tail_nodes, tail_neighbours, _ = self._tail(edge_type, outgoing)
+        tail_starts = np.searchsorted(tail_nodes, nodes, side="left")
+        tail_counts = np.searchsorted(tail_nodes, nodes, side="right") - tail_starts
+        counts = csr_counts + tail_counts
+        run_starts = np.cumsum(counts) - counts
+        neighbours = np.empty(int(counts.sum()), dtype=np.int32)
+        for source, source_starts, source_counts, first in (
+            (idx, starts, csr_counts, run_starts),
+            (tail_neighbours, tail_starts, tail_counts, run_starts + csr_counts),
+        ):
+            within = np.arange(source_counts.sum()) - np.repeat(np.cumsum(source_counts) - source_counts, source_counts)
+            neighbours[np.repeat(first, source_counts) + within] = source[np.repeat(source_starts, source_counts) + within]
+        return counts, neighbours
+
+    def _collect(self, node, edge_types, outgoing):
+        parts = []
+        for edge_type in self._type_names(edge_types):
+            csr = self.by_type.get(edge_type)
+            if csr is not None and node < self._csr_nodes:
+                ptr, idx, edge = (
+                    (csr.out_ptr, csr.out_idx, csr.out_edge)
+                    if outgoing
+                    else (csr.in_ptr, csr.in_idx, csr.in_edge)
+                )
+                lo, hi = ptr[node], ptr[node + 1]
+                if hi > lo:
+                    parts.append((idx[lo:hi], edge[lo:hi]))
+            if self._sizes["tail"]:
+                tail_nodes, tail_neighbours, tail_pos = self._tail(edge_type, outgoing)
+                lo, hi = np.searchsorted(tail_nodes, node, side="left"), np.searchsorted(tail_nodes, node, side="right")
+                if hi > lo:
+                    parts.append((tail_neighbours[lo:hi], tail_pos[lo:hi]))
+
+        if not parts:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+        if len(parts) == 1:
+            return parts[0]
+        neighbours = np.concatenate([p[0] for p in parts])
+        edge_pos = np.concatenate([p[1] for p in parts])
+        order = np.argsort(edge_pos, kind="stable")
+        return neighbours[order], edge_pos[order]
+
+    def stats(self):
+        counts = {edge_type: len(csr) for edge_type, csr in self.by_type.items()}
+        tail_counts = np.bincount(self._tail_type, minlength=len(self._tail_types))
+        for edge_type, count in zip(self._tail_types, tail_counts.tolist()):
+            counts[edge_type] = counts.get(edge_type, 0) + count
+        return counts
+
+
+def build_adjacency_index(data):
+    return AdjacencyIndex(data.get("nodes", []), data.get("edges", data.get("links", [])))
+
+
+def build_adjacency_columns(compiled):
+    """Build the :class:`AdjacencyIndex` of a compiled snapshot without parsing records"""
+    lists = compiled.lists()
+    edge_list = "edges" if "edges" in lists else "links"
+    id_tags, id_codes = compiled.column("nodes", "id")
+    if (np.asarray(id_tags) != STRING).any() or edge_list not in lists:
+        # Non-string ids (or no edges): fall back to the records
+        return build_adjacency_index({
+            "nodes": compiled.records("nodes", keys=("id", "type")),
+            "edges": compiled.records(edge_list, keys=("source", "target", "type")) if edge_list in lists else [],
+        })
+
+    # String id -> node index; repeated ids resolve to their last node, like a dict
+    id_codes = np.asarray(id_codes)
+    node_of_string = np.full(len(compiled.table()), -1, dtype=np.int64)
+    np.maximum.at(node_of_string, id_codes, np.arange(len(id_codes)))
+
+    def endpoint(key):
+        tags, codes = compiled.column(edge_list, key)
+        nodes = np.full(len(codes), -1, dtype=np.int64)
+        is_string = np.asarray(tags) == STRING
+        nodes[is_string] = node_of_string[np.asarray(codes)[is_string]]
+        return nodes
+
+    src, dst = endpoint("source"), endpoint("target")
+    pos = np.flatnonzero((src >= 0) & (dst >= 0))
+    types = np.array(
+        [t or UNTYPED for t in compiled.values(edge_list, "type")[pos].tolist()], dtype=object
+    )
+    return AdjacencyIndex.from_columns(
+        compiled.table()[id_codes].tolist(),
+        compiled.values("nodes", "type").tolist(),
+        src[pos],
+        dst[pos].astype(np.int32),
+        pos,
+        types,
+    )
+
+
+def adjacency_index(config_key="DATA_FILE", path=None):
+    """Return the adjacency index of a configured graph file, cached per file version"""
+    path = path or current_app.config.get(config_key)
+    if not path:
+        raise KeyError(f"{config_key} not configured")
+    return store.derive(path, "adjacency", build_adjacency_index, columnar=build_adjacency_columns)
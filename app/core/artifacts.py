@@ -0,0 +1,61 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+
+from flask import current_app
+
+from app.core.dataset import dataset_version
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_params(params):
+    """Request parameters as a sorted dict of strings, the form used in keys"""
+    return {str(k): str(v) for k, v in sorted(params.items())}
+
+
+def params_key(params):
+    payload = json.dumps(normalize_params(params), sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def expand_grid(grid):
+    """Expand a module's ``PRECOMPUTE_GRID`` into concrete parameter dicts
+
+    A grid is a list of dicts; list values are expanded as a cartesian
+    product, scalars are used as-is.
+    """
+    combinations = []
+    for spec in grid:
+        keys = list(spec)
+        values = [v if isinstance(v, (list, tuple)) else [v] for v in spec.values()]
+        for combo in itertools.product(*values):
+            combinations.append(dict(zip(keys, combo)))
+    return combinations
+
+
+def artifact_dir(version=None):
+    return os.path.join(current_app.config["ARTIFACT_DIR"], version or dataset_version())
+
+
+def artifact_path(viz_name, params, version=None):
+    return os.path.join(artifact_dir(version), viz_name, f"{params_key(params)}.json")
+
+
+def find_artifact(viz_name, params):
+    """Path of the precomputed response for this request, or None"""
+    path = artifact_path(viz_name, params)
+    return path if os.path.exists(path) else None
+
+
+def write_artifact(viz_name, params, body, version=None):
+    """Atomically write a serialized response body"""
+    path = artifact_path(viz_name, params, version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,211 @@
+import gc
+import json
+import logging
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from app.core.cache import topic_cache
+from app.core.dataset import store
+
+logger = logging.getLogger(__name__)
+
+# Dataset sizes, as multiples of the messages in the data files
+SCALES = (1, 10, 100)
+
+# Data files whose messages are multiplied; entities, the relationship graph
+# and the similarity matrix keep their size
+SCALED_KEYS = ("DATA_FILE", "COMMUNICATION_FILE")
+
+# Metrics compared against the baseline
+METRICS = ("seconds", "peak_bytes", "payload_bytes")
+
+# Differences below these are noise, whatever the ratio
+NOISE_FLOOR = {"seconds": 0.05, "peak_bytes": 1024 * 1024, "payload_bytes": 1024}
+
+
+def benchmark_cases(topic_methods):
+    """(visualization, params) of every benchmarked request"""
+    cases = [
+        ("daily_patterns", {}),
+        ("keyword_analysis", {}),
+        ("time_patterns", {}),
+    ]
+    cases += [("topic_modeling", {"method": method}) for method in topic_methods]
+    cases += [
+        ("graph", {}),
+        ("nadia_analysis", {}),
+    ]
+    return cases
+
+
+def case_name(viz_name, params):
+    return f"{viz_name}?{urlencode(sorted(params.items()))}" if params else viz_name
+
+
+def scale_messages(data, factor):
+    """Copy of a data file with every communication repeated ``factor`` times
+
+    In graph files the ``Communication`` event nodes are copied with their
+    edges (``sent``, ``received``, ``evidence_for``); in message files,
+    which have no event nodes, every link is a message and is copied. Copies
+    get ``#<n>`` appended to their ids and keep their timestamps and
+    content.
+    """
+    nodes = data.get("nodes", [])
+    link_key = "links" if "links" in data else "edges"
+    links = data.get(link_key, [])
+    events = {
+        node["id"] for node in nodes
+        if node.get("type") == "Event" and node.get("sub_type") == "Communication"
+    }
+    event_nodes = [node for node in nodes if node["id"] in events]
+    if events:
+        message_links = [link for link in links if link.get("source") in events or link.get("target") in events]
+    else:
+        message_links = links
+
+    def renamed(value, copy):
+        return f"{value}#{copy}" if value in events else value
+
+    extra_nodes, extra_links = [], []
+    for copy in range(1, factor):
+        extra_nodes.extend({**node, "id": f"{node['id']}#{copy}"} for node in event_nodes)
+        for link in message_links:
+            extra = {**link, "source": renamed(link.get("source"), copy), "target": renamed(link.get("target"), copy)}
+            for key in ("id", "event_id"):
+                if key in link:
+                    extra[key] = f"{link[key]}#{copy}"
+            extra_links.append(extra)
+    return {**data, "nodes": nodes + extra_nodes, link_key: links + extra_links}
+
+
+def write_scaled_files(config, factor, directory):
+    """Write the scaled data files into ``directory``; returns the config pointing at them"""
+    os.makedirs(directory, exist_ok=True)
+    scaled = dict(config)
+    written = {}
+    for key in SCALED_KEYS:
+        path = config.get(key)
+        if not path or not path.endswith(".json"):
+            continue
+        if path not in written:
+            with open(path, "r") as f:
+                data = json.load(f)
+            written[path] = os.path.join(directory, os.path.basename(path))
+            with open(written[path], "w") as f:
+                json.dump(scale_messages(data, factor), f)
+        scaled[key] = written[path]
+    return scaled
+
+
+def measure(client, url, trace=False):
+    """(seconds, peak traced bytes or None, response) of a GET through the test client"""
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        response = client.get(url)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+    return seconds, peak, response
+
+
+def run_benchmarks(app, client, response_cache, cases, directory, scales=SCALES):
+    """Benchmark every case at every scale, yielding one result per request
+
+    The data files are rewritten at each scale under ``directory`` and
+    ``app.config`` points at them for the run, with the data watcher off.
+    Every request starts cold: the parsed files, derived indexes and cached
+    responses are dropped and ``CACHE_DIR`` is an empty directory, so no
+    case reuses another's topic fits or embeddings. Each case runs twice,
+    first with ``tracemalloc`` (which slows it down) for the peak memory
+    Python and NumPy allocated during the request, then timed. At the
+    first scale an extra, discarded run comes first so lazy imports are
+    not counted against the case.
+    """
+    original = {key: app.config.get(key) for key in SCALED_KEYS + ("CACHE_DIR", "ARTIFACT_DIR", "WATCH_DATA_INTERVAL")}
+    compile_snapshots = store.compile
+    store.compile = False
+    try:
+        for position, factor in enumerate(scales):
+            scale_dir = os.path.join(directory, f"x{factor}")
+            scaled = write_scaled_files(original, factor, scale_dir)
+            scaled.update({"ARTIFACT_DIR": os.path.join(scale_dir, "artifacts"), "WATCH_DATA_INTERVAL": 0})
+            app.config.update(scaled)
+            for number, (viz_name, params) in enumerate(cases):
+                url = f"/data/{viz_name}" + (f"?{urlencode(params)}" if params else "")
+                runs = []
+                for trace in ((False,) if position == 0 else ()) + (True, False):
+                    app.config["CACHE_DIR"] = os.path.join(scale_dir, "cache", f"{number}-{len(runs)}")
+                    store.clear()
+                    topic_cache.clear()
+                    response_cache.clear()
+                    runs.append(measure(client, url, trace))
+                (_, peak, _), (seconds, _, response) = runs[-2:]
+                body = response.get_data()
+                error = None
+                if response.status_code != 200:
+                    error = f"HTTP {response.status_code}"
+                elif response.is_json and isinstance(response.get_json(), dict):
+                    error = response.get_json().get("error")
+                result = {
+                    "case": case_name(viz_name, params),
+                    "scale": factor,
+                    "seconds": round(seconds, 4),
+                    "peak_bytes": peak,
+                    "payload_bytes": len(body),
+                    "error": error,
+                }
+                logger.info(f"Benchmarked {result['case']} at {factor}x: {result}")
+                yield result
+    finally:
+        app.config.update(original)
+        store.compile = compile_snapshots
+        store.clear()
+        response_cache.clear()
+
+
+def report(results, scales):
+    """Benchmark results as stored in the JSON file"""
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scales": list(scales),
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=0.25):
+    """Regressions of ``current`` against ``baseline`` results
+
+    A metric regresses when it grew by more than ``tolerance`` (a ratio)
+    and by more than its ``NOISE_FLOOR``; a case that used to succeed and
+    now fails is always a regression.
+    """
+    previous = {(r["case"], r["scale"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current.get("results", []):
+        before = previous.get((result["case"], result["scale"]))
+        if before is None:
+            continue
+        if result.get("error") and not before.get("error"):
+            regressions.append({"case": result["case"], "scale": result["scale"],
+                                "metric": "error", "baseline": None, "current": result["error"]})
+            continue
+        for metric in METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > NOISE_FLOOR[metric]:
+                regressions.append({"case": result["case"], "scale": result["scale"], "metric": metric,
+                                    "baseline": old, "current": new, "ratio": round(new / old, 2)})
+    return regressions
@@ -0,0 +1,71 @@
+import numpy as np
+
+
+def objects(values):
+    """Object array of ``values`` (strings, None, ...) for columns read item by item"""
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+class SharedBuffer:
+    """Append-only array shared by the successive versions of an index
+
+    A version reads the first ``length`` items it knows of (``view``).
+    Items are only ever written past ``end``, the furthest any version got,
+    so extending the newest version appends in place, doubling the capacity
+    as needed for amortized O(new items), while older versions keep reading
+    an unchanged prefix. Extending an older version again (e.g. after an
+    append that failed half-way) copies its prefix first.
+    """
+
+    def __init__(self, values):
+        self.values = values
+        self.end = len(values)
+
+    def extended(self, length, items):
+        """Buffer holding the first ``length`` items followed by ``items``"""
+        buffer = self if length == self.end else SharedBuffer(self.values[:length].copy())
+        items = np.asarray(items, dtype=None if buffer.values.dtype.kind == "U" else buffer.values.dtype)
+        end = buffer.end + len(items)
+        # Strings may need a wider dtype; other columns keep theirs
+        dtype = np.promote_types(buffer.values.dtype, items.dtype)
+        if end > len(buffer.values) or dtype != buffer.values.dtype:
+            grown = np.zeros(max(end, 2 * len(buffer.values)), dtype=dtype)
+            grown[:buffer.end] = buffer.values[:buffer.end]
+            buffer.values = grown
+        buffer.values[buffer.end:end] = items
+        buffer.end = end
+        return buffer
+
+    def view(self, length):
+        return self.values[:length]
+
+
+class Column:
+    """Attribute reading ``obj._buffers[name]`` up to the owner's ``obj._sizes[size]`` (+ ``extra``)
+
+    The view is cached on the instance, which is fine because a version
+    never grows; ``reset_columns`` drops the cached views of a new version.
+    """
+
+    def __init__(self, size, extra=0):
+        self.size = size
+        self.extra = extra
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        view = obj._buffers[self.name].view(obj._sizes[self.size] + self.extra)
+        obj.__dict__[self.name] = view
+        return view
+
+
+def reset_columns(obj):
+    """Forget the cached column views of ``obj``, a copy about to be extended"""
+    for name in [name for name in obj.__dict__ if isinstance(getattr(type(obj), name, None), Column)]:
+        del obj.__dict__[name]
+
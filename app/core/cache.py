@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+
+def corpus_key(texts, **params):
+    """Stable hash of a list of texts plus the parameters applied to them"""
+    h = hashlib.sha256()
+    for text in texts:
+        data = (text or "").encode("utf-8")
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    h.update(json.dumps({k: str(v) for k, v in params.items()}, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Two-level cache for JSON-serializable results
+
+    Entries live in an in-memory LRU bounded by ``max_bytes`` (measured on
+    the encoded JSON) and in ``<CACHE_DIR>/<name>/<key>.json`` on disk, so
+    they survive restarts. Values are always returned in their decoded JSON
+    form, whether they were just computed or read back.
+    """
+
+    def __init__(self, name, max_bytes=64 * 1024 * 1024):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def directory(self):
+        if not has_app_context() or not current_app.config.get("CACHE_DIR"):
+            return None
+        return os.path.join(current_app.config["CACHE_DIR"], self.name)
+
+    def _path(self, key):
+        directory = self.directory
+        return os.path.join(directory, f"{key}.json") if directory else None
+
+    def _remember(self, key, payload):
+        with self._lock:
+            if key in self._memory:
+                self._bytes -= len(self._memory.pop(key))
+            if len(payload) > self.max_bytes:
+                return
+            self._memory[key] = payload
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None"""
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(payload)
+
+        path = self._path(key)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    payload = f.read()
+                value = json.loads(payload)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable {self.name} cache entry {key}: {e}")
+                return None
+            self._remember(key, payload)
+            with self._lock:
+                self.disk_hits += 1
+            return value
+        return None
+
+    def put(self, key, value):
+        """Store ``value`` and return it in decoded JSON form"""
+        payload = json.dumps(value).encode("utf-8")
+        self._remember(key, payload)
+
+        path = self._path(key)
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not write {self.name} cache entry {key}: {e}")
+        return json.loads(payload)
+
+    def get_or_compute(self, key, compute, keep=None):
+        """Cached value for ``key``, else ``compute()``, stored unless ``keep(value)`` is false"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        if keep is not None and not keep(value):
+            return json.loads(json.dumps(value))
+        return self.put(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Fitted topic models (topics, document-topic weights and model metrics)
+topic_cache = ResultCache("topics")
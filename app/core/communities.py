@@ -0,0 +1,238 @@
+import copy
+import logging
+from collections import defaultdict, deque
+
+import numpy as np
+
+from app.core.dataset import store
+from app.core.events import event_index
+
+logger = logging.getLogger(__name__)
+
+
+class CommunityIndex:
+    """Modularity communities of a weighted undirected graph, kept current as edges arrive
+
+    The first partition is Louvain's (networkx, fixed seed). Added edges and
+    nodes then only run Louvain's local-moving phase from the nodes they
+    touch: each one moves to the neighbouring community with the best
+    modularity gain, and the neighbours of a node that moved are examined
+    in turn. The rest of the partition is kept, so an update costs about
+    the size of the affected neighbourhood instead of a full run.
+    """
+
+    def __init__(self, nodes=(), edges=(), resolution=1.0, seed=0):
+        self.resolution = resolution
+        self.adjacency = {}
+        self.degree = {}
+        self.total_weight = 0.0
+        self.community = {}
+        self.community_degree = defaultdict(float)
+        self._labels = 0
+        self.moves = 0
+
+        for node in nodes:
+            self._add_node(node)
+        for u, v, weight in edges:
+            self._add_edge(u, v, weight)
+        self._louvain(seed)
+
+    def _add_node(self, node):
+        if node in self.adjacency:
+            return False
+        self.adjacency[node] = {}
+        self.degree[node] = 0.0
+        self.community[node] = self._labels
+        self._labels += 1
+        return True
+
+    def _add_edge(self, u, v, weight):
+        for node in (u, v):
+            self._add_node(node)
+        if u == v:
+            return
+        self.adjacency[u][v] = self.adjacency[u].get(v, 0.0) + weight
+        self.adjacency[v][u] = self.adjacency[v].get(u, 0.0) + weight
+        self.degree[u] += weight
+        self.degree[v] += weight
+        self.community_degree[self.community[u]] += weight
+        self.community_degree[self.community[v]] += weight
+        self.total_weight += weight
+
+    def _louvain(self, seed):
+        import networkx as nx
+
+        graph = nx.Graph()
+        graph.add_nodes_from(self.adjacency)
+        graph.add_weighted_edges_from(
+            (u, v, w) for u, neighbours in self.adjacency.items() for v, w in neighbours.items() if u < v
+        )
+        parts = nx.community.louvain_communities(
+            graph, weight="weight", resolution=self.resolution, seed=seed
+        )
+        self.community_degree = defaultdict(float)
+        for label, members in enumerate(sorted(parts, key=lambda p: (-len(p), min(p)))):
+            for node in members:
+                self.community[node] = label
+                self.community_degree[label] += self.degree[node]
+        self._labels = len(parts)
+
+    def add(self, nodes=(), edges=()):
+        """Add nodes and ``(u, v, weight)`` edges, then re-settle the nodes they touch"""
+        touched = [node for node in nodes if self._add_node(node)]
+        for u, v, weight in edges:
+            self._add_edge(u, v, weight)
+            touched.extend((u, v))
+        self._local_moving(touched)
+
+    def _local_moving(self, nodes):
+        if self.total_weight <= 0:
+            return
+        scale = self.resolution / (2 * self.total_weight)
+        pending = deque(dict.fromkeys(nodes))
+        queued = set(pending)
+        while pending:
+            node = pending.popleft()
+            queued.discard(node)
+            current, k = self.community[node], self.degree[node]
+
+            links = defaultdict(float)
+            for neighbour, weight in self.adjacency[node].items():
+                links[self.community[neighbour]] += weight
+            # Gain of (re)joining a community, with the node taken out of its own
+            self.community_degree[current] -= k
+            best = current
+            best_gain = links.get(current, 0.0) - self.community_degree[current] * k * scale
+            for label, weight in links.items():
+                gain = weight - self.community_degree[label] * k * scale
+                if gain > best_gain + 1e-12:
+                    best, best_gain = label, gain
+            self.community_degree[best] += k
+
+            if best != current:
+                self.community[node] = best
+                self.moves += 1
+                for neighbour in self.adjacency[node]:
+                    if neighbour not in queued and self.community[neighbour] != best:
+                        pending.append(neighbour)
+                        queued.add(neighbour)
+
+    def copy(self):
+        index = copy.copy(self)
+        index.adjacency = {node: dict(neighbours) for node, neighbours in self.adjacency.items()}
+        index.degree = dict(self.degree)
+        index.community = dict(self.community)
+        index.community_degree = defaultdict(float, self.community_degree)
+        return index
+
+    def groups(self):
+        """Communities as sorted member lists, largest first"""
+        members = defaultdict(list)
+        for node, label in self.community.items():
+            members[label].append(node)
+        return sorted((sorted(m) for m in members.values()), key=lambda m: (-len(m), m[0]))
+
+    def modularity(self):
+        if self.total_weight <= 0:
+            return 0.0
+        inside = defaultdict(float)
+        for u, neighbours in self.adjacency.items():
+            for v, weight in neighbours.items():
+                if self.community[u] == self.community[v]:
+                    inside[self.community[u]] += weight
+        m2 = 2 * self.total_weight
+        return float(sum(
+            inside[c] / m2 - self.resolution * (d / m2) ** 2 for c, d in self.community_degree.items()
+        ))
+
+
+class CommunicationCommunities:
+    """Communities of the entity graph weighted by message counts"""
+
+    def __init__(self, index):
+        self.index = index
+        self._seen = len(index)
+        self._entities = len(index.entity_ids)
+        self.communities = CommunityIndex(index.entity_ids, self._edges(0, len(index)))
+
+    def _edges(self, start, stop):
+        """(sender, receiver, messages) of rows ``start:stop``, one per entity pair"""
+        index = self.index
+        rows = np.arange(start, stop)
+        counts = np.diff(index.recv_ptr)[rows]
+        senders = np.repeat(index.sender[rows], counts)
+        receivers = index.recv_idx[index.recv_ptr[start]:index.recv_ptr[stop]]
+        keep = (senders >= 0) & (receivers >= 0) & (senders != receivers)
+        pairs = np.sort(np.column_stack([senders[keep], receivers[keep]]), axis=1)
+        if not len(pairs):
+            return []
+        pairs, weights = np.unique(pairs, axis=0, return_counts=True)
+        ids = index.entity_ids
+        return [(ids[a], ids[b], float(w)) for (a, b), w in zip(pairs.tolist(), weights.tolist())]
+
+    def extended(self, delta):
+        # The message index is extended first and already holds the new rows
+        communities = copy.copy(self)
+        communities.index = index = delta.current(self.index)
+        new_entities = index.entity_ids[self._entities:]
+        edges = communities._edges(self._seen, len(index))
+        communities._seen, communities._entities = len(index), len(index.entity_ids)
+        communities.communities = self.communities.copy()
+        communities.communities.add(new_entities, edges)
+        return communities
+
+
+class RelationshipCommunities:
+    """Communities of entities linked through the relationship graph
+
+    Entities that take part in the same ``Relationship`` node (colleagues,
+    operates, reports, ...) are joined by an edge per shared relationship;
+    event nodes and their ``evidence_for`` edges are left out.
+    """
+
+    def __init__(self, data):
+        self.kinds = {}
+        self.members = defaultdict(list)
+        entities, edges = self._consume(data.get("nodes", []), data.get("links", data.get("edges", [])))
+        self.communities = CommunityIndex(entities, edges)
+
+    def _consume(self, nodes, links):
+        entities = []
+        for node in nodes:
+            self.kinds[node["id"]] = node.get("type")
+            if node.get("type") == "Entity":
+                entities.append(node["id"])
+        edges = []
+        for link in links:
+            source, target = link.get("source"), link.get("target")
+            kinds = (self.kinds.get(source), self.kinds.get(target))
+            if kinds == ("Entity", "Entity"):
+                edges.append((source, target, 1.0))
+            elif "Relationship" in kinds and "Entity" in kinds:
+                relationship, entity = (source, target) if kinds[0] == "Relationship" else (target, source)
+                edges.extend((other, entity, 1.0) for other in self.members[relationship] if other != entity)
+                self.members[relationship].append(entity)
+        return entities, edges
+
+    def extended(self, delta):
+        communities = copy.copy(self)
+        communities.kinds = dict(self.kinds)
+        communities.members = defaultdict(list, {k: list(v) for k, v in self.members.items()})
+        communities.communities = self.communities.copy()
+        communities.communities.add(*communities._consume(delta.nodes, delta.edges))
+        return communities
+
+
+def communication_communities(comm_file):
+    """Communities of a message file, updated as messages are ingested"""
+
+    def build(data):
+        index = event_index(path=comm_file)
+        return CommunicationCommunities(index)
+
+    return store.derive(comm_file, "communities", build)
+
+
+def relationship_communities(relationships_file):
+    """Communities of a relationship graph file"""
+    return store.derive(relationships_file, "communities", RelationshipCommunities)
@@ -0,0 +1,231 @@
+import json
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Value tags of a column entry
+MISSING, NULL, STRING, BOOL, INT, FLOAT, OTHER = range(7)
+
+_INT64_MIN, _INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+def snapshot_dir(path):
+    return f"{path}.snapshot"
+
+
+def _source_signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+class _Strings:
+    """Interning table: every distinct string gets the next id"""
+
+    def __init__(self):
+        self.ids = {}
+
+    def intern(self, value):
+        code = self.ids.get(value)
+        if code is None:
+            code = self.ids[value] = len(self.ids)
+        return code
+
+
+def _encode_list(records, columns, strings):
+    """(tags, values, shapes) arrays of a list of records
+
+    ``tags`` and ``values`` have one row per record and one column per
+    attribute. Strings (and nested values, as JSON) are stored as string
+    ids, bools and ints as themselves and floats as their IEEE bits, all in
+    one int64 matrix. ``shapes`` numbers the distinct key orders of the
+    records, so decoding restores each record's keys in their original
+    order.
+    """
+    position = {key: c for c, key in enumerate(columns)}
+    n = len(records)
+    tags = np.zeros((n, len(columns)), dtype=np.int8)
+    values = np.zeros((n, len(columns)), dtype=np.int64)
+    shapes, shape_ids = np.zeros(n, dtype=np.int32), {}
+    for i, record in enumerate(records):
+        shape = tuple(position[key] for key in record)
+        shapes[i] = shape_ids.setdefault(shape, len(shape_ids))
+        for c, value in zip(shape, record.values()):
+            if value is None:
+                tags[i, c] = NULL
+            elif isinstance(value, str):
+                tags[i, c], values[i, c] = STRING, strings.intern(value)
+            elif isinstance(value, bool):
+                tags[i, c], values[i, c] = BOOL, value
+            elif isinstance(value, int) and _INT64_MIN <= value <= _INT64_MAX:
+                tags[i, c], values[i, c] = INT, value
+            elif isinstance(value, float):
+                tags[i, c], values[i, c] = FLOAT, np.float64(value).view(np.int64)
+            else:
+                tags[i, c], values[i, c] = OTHER, strings.intern(json.dumps(value))
+    return tags, values, shapes, [list(shape) for shape in shape_ids]
+
+
+def write_compiled(path, data):
+    """Write the compiled snapshot of ``data``, the parsed contents of ``path``
+
+    The snapshot is a directory next to the JSON file holding
+    ``strings.bin`` (every distinct string: ids, labels and message content,
+    UTF-8, addressed by character offsets in ``strings.npy``), the
+    ``<list>.tags.npy``/``values.npy``/``shapes.npy`` arrays of each
+    top-level list of records, and ``meta.json`` (column names, key orders,
+    scalar top-level values and the signature of the JSON it was compiled
+    from), written last.
+    """
+    strings = _Strings()
+    meta = {"format": FORMAT_VERSION, "source": _source_signature(path), "lists": {}, "scalars": {}}
+    arrays = {}
+    for name, value in data.items():
+        if not (isinstance(value, list) and all(isinstance(r, dict) for r in value)):
+            meta["scalars"][name] = value
+            continue
+        columns = list(dict.fromkeys(key for record in value for key in record))
+        tags, values, shapes, shape_columns = _encode_list(value, columns, strings)
+        meta["lists"][name] = {"length": len(value), "columns": columns, "shapes": shape_columns}
+        arrays[f"{name}.tags"] = tags
+        arrays[f"{name}.values"] = values
+        arrays[f"{name}.shapes"] = shapes
+
+    table = list(strings.ids)
+    offsets = np.zeros(len(table) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in table], out=offsets[1:])
+    arrays["strings"] = offsets
+
+    target = snapshot_dir(path)
+    tmp = f"{target}.tmp-{os.getpid()}-{threading.get_ident()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), array)
+    with open(os.path.join(tmp, "strings.bin"), "w", encoding="utf-8", newline="") as f:
+        f.write("".join(table))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return target
+
+
+class CompiledDataset:
+    """Memory-mapped view of a compiled snapshot (see ``write_compiled``)
+
+    Index builders read the columns they need from here instead of the
+    parsed JSON: string columns come back as string ids into ``table()``
+    and other attributes are decoded only for the records asked for.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {self.meta.get('format')}")
+        self.offsets = self._array("strings")
+        self._table = None
+
+    def lists(self):
+        return list(self.meta["lists"])
+
+    def length(self, name):
+        return self.meta["lists"][name]["length"]
+
+    def _array(self, name):
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+
+    def column(self, name, key):
+        """(tags, values) arrays of an attribute of a top-level list"""
+        c = self.meta["lists"][name]["columns"].index(key)
+        return self._array(f"{name}.tags")[:, c], self._array(f"{name}.values")[:, c]
+
+    def strings(self):
+        """The string table, as a list indexed by string id"""
+        with open(os.path.join(self.directory, "strings.bin"), "r", encoding="utf-8", newline="") as f:
+            text = f.read()
+        offsets = self.offsets.tolist()
+        return [text[a:b] for a, b in zip(offsets, offsets[1:])]
+
+    @staticmethod
+    def _decode(tags, values, table):
+        """Python values of one column (None where missing)"""
+        decoded = np.full(len(tags), None, dtype=object)
+        is_string = tags == STRING
+        decoded[is_string] = table[values[is_string]]
+        for tag, dtype in ((BOOL, bool), (INT, np.int64), (FLOAT, np.float64)):
+            mask = tags == tag
+            if mask.any():
+                view = values[mask].astype(bool) if dtype is bool else values[mask].view(dtype)
+                decoded[mask] = view.tolist()
+        mask = tags == OTHER
+        if mask.any():
+            decoded[mask] = [json.loads(s) for s in table[values[mask]]]
+        return decoded
+
+    def records(self, name, keys=None):
+        """The records of a top-level list, as ``json.load`` would return them
+
+        With ``keys`` only those attributes are decoded, which is cheaper
+        when a builder needs a few columns of every record.
+        """
+        table = self.table()
+        spec = self.meta["lists"][name]
+        columns = spec["columns"]
+        wanted = range(len(columns)) if keys is None else [c for c, k in enumerate(columns) if k in keys]
+        tags = self._array(f"{name}.tags")
+        values = self._array(f"{name}.values")
+        shapes = np.asarray(self._array(f"{name}.shapes"))
+        decoded = {c: self._decode(np.asarray(tags[:, c]), np.asarray(values[:, c]), table) for c in wanted}
+
+        records = np.empty(spec["length"], dtype=object)
+        for shape, shape_columns in enumerate(spec["shapes"]):
+            rows = np.flatnonzero(shapes == shape) if len(spec["shapes"]) > 1 else slice(None)
+            shape_columns = [c for c in shape_columns if c in decoded]
+            keys_in_order = [columns[c] for c in shape_columns]
+            if shape_columns:
+                rows_values = zip(*(decoded[c][rows].tolist() for c in shape_columns))
+                records[rows] = [dict(zip(keys_in_order, row)) for row in rows_values]
+            else:
+                records[rows] = [{} for _ in range(len(records[rows]))]
+        return records.tolist()
+
+    def values(self, name, key):
+        """Python values of an attribute over a top-level list (None where missing)"""
+        if key not in self.meta["lists"][name]["columns"]:
+            return np.full(self.meta["lists"][name]["length"], None, dtype=object)
+        tags, values = self.column(name, key)
+        return self._decode(np.asarray(tags), np.asarray(values), self.table())
+
+    def table(self):
+        """The string table as an object array, for fancy indexing by string id"""
+        if self._table is None:
+            table = np.empty(len(self.offsets) - 1, dtype=object)
+            table[:] = self.strings()
+            self._table = table
+        return self._table
+
+def open_compiled(path):
+    """The compiled snapshot of ``path`` if it is newer than the JSON, else None"""
+    directory = snapshot_dir(path)
+    meta_path = os.path.join(directory, "meta.json")
+    try:
+        if os.stat(meta_path).st_mtime_ns < os.stat(path).st_mtime_ns:
+            return None
+        dataset = CompiledDataset(directory)
+    except (OSError, ValueError) as e:
+        if os.path.exists(directory):
+            logger.warning(f"Ignoring unreadable snapshot {directory}: {e}")
+        return None
+    # A copied JSON file can keep an old mtime: require the compiled source to match
+    if dataset.meta["source"] != _source_signature(path):
+        return None
+    return dataset
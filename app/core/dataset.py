@@ -0,0 +1,437 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from flask import current_app
+
+from app.core.compiled import open_compiled, write_compiled
+
+logger = logging.getLogger(__name__)
+
+
+class Delta:
+    """Items appended to a loaded data file
+
+    ``added`` maps a top-level key of the file (``nodes``, ``edges``,
+    ``links``) to the new items, which start at ``start[key]`` in
+    ``data[key]``.
+    """
+
+    def __init__(self, data, added, start):
+        self.data = data
+        self.added = added
+        self.start = start
+        # id(derived value) -> its extended version, filled in build order
+        self._extended = {}
+
+    def current(self, value):
+        """The extended version of ``value``, a derived value of the same file built earlier
+
+        Dependents (e.g. statistics over the event index) use it to follow
+        their dependency into the new snapshot.
+        """
+        return self._extended[id(value)]
+
+    @property
+    def nodes(self):
+        return self.added.get("nodes", [])
+
+    @property
+    def edges(self):
+        return self.added.get("edges", self.added.get("links", []))
+
+    @property
+    def node_start(self):
+        return self.start.get("nodes", 0)
+
+    @property
+    def edge_start(self):
+        return self.start.get("edges", self.start.get("links", 0))
+
+
+def _extend(data, record):
+    for key, items in record.items():
+        data.setdefault(key, []).extend(items)
+
+
+class Snapshot:
+    """One consistent version of the data files and what derives from them
+
+    ``entries`` maps a file path to its parsed contents and signature,
+    ``derived`` maps (path, name) to (signature, value, builders). A snapshot
+    is never swapped out from under a request: readers pin the current one
+    and a reload builds a new snapshot next to it.
+    """
+
+    def __init__(self, number, entries=None, derived=None):
+        self.number = number
+        self.entries = entries or {}
+        self.derived = derived or {}
+
+
+class DatasetStore:
+    """In-process cache of the parsed JSON data files.
+
+    Each file is parsed once and kept in memory as part of the current
+    :class:`Snapshot`. By default a file is reloaded on access when its
+    mtime or size changes on disk. With ``check_files`` off (a
+    :class:`~app.core.watcher.DataWatcher` is running) accesses never touch
+    the disk: ``refresh`` parses changed files and rebuilds their derived
+    values into a new snapshot in the background, then swaps it in.
+    Requests that pinned the previous snapshot (``pin``) finish on it.
+
+    A JSON file with a fresh compiled snapshot next to it (see
+    :mod:`app.core.compiled`) is not parsed up front: derived values that
+    have a ``columnar`` builder are built from the memory-mapped columns and
+    the JSON itself is only read when ``load`` needs the records. Files
+    parsed from JSON get their compiled snapshot written for the next start.
+
+    The parsed objects are shared between requests, so callers must treat
+    them as read-only. ``append`` adds items to a file without touching
+    them either: it builds a new snapshot whose lists and derived values
+    are extended copies, records the new items in a journal next to the
+    file (``<file>.ingest.jsonl``) that is replayed on load, and swaps the
+    snapshot in.
+    """
+
+    def __init__(self):
+        self._current = Snapshot(0)
+        self._lock = threading.Lock()
+        # Serializes writers: appends and snapshot rebuilds
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self.check_files = True
+        # Write compiled snapshots next to JSON files parsed without one
+        self.compile = True
+        self.hits = 0
+        self.reloads = 0
+        self.appends = 0
+        self.swaps = 0
+
+    @staticmethod
+    def signature(path):
+        """Cheap change detector: (mtime_ns, size) of the file"""
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def journal_path(path):
+        return f"{path}.ingest.jsonl"
+
+    @classmethod
+    def source_signature(cls, path):
+        """Signature of a file together with its ingestion journal, if any"""
+        journal = cls.journal_path(path)
+        if os.path.exists(journal):
+            return cls.signature(path) + cls.signature(journal)
+        return cls.signature(path)
+
+    # -- snapshots -------------------------------------------------------
+
+    def snapshot(self):
+        """The snapshot this thread reads: the pinned one, else the current one"""
+        return getattr(self._local, "snapshot", None) or self._current
+
+    def pin(self, snapshot=None):
+        """Make this thread read ``snapshot`` (default: the current one) until ``unpin``
+
+        Worker threads helping a request pin the request's snapshot so they
+        read the same data.
+        """
+        self._local.snapshot = snapshot or self._current
+        return self._local.snapshot
+
+    def unpin(self):
+        self._local.snapshot = None
+
+    @contextmanager
+    def _reading(self, snapshot):
+        """Resolve this thread's reads (and derives) in ``snapshot`` for a while"""
+        previous = getattr(self._local, "snapshot", None)
+        self._local.snapshot = snapshot
+        try:
+            yield snapshot
+        finally:
+            self._local.snapshot = previous
+
+    def _parse(self, path, sig):
+        journal = self.journal_path(path)
+        # The compiled snapshot only covers the JSON file, not appended batches
+        if not os.path.exists(journal):
+            compiled = open_compiled(path)
+            if compiled is not None:
+                logger.info(f"Opened compiled snapshot of {os.path.basename(path)}")
+                return {"path": path, "signature": sig, "data": None, "compiled": compiled}
+
+        data = self._read_json(path)
+        if self.compile:
+            try:
+                write_compiled(path, data)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning(f"Could not write compiled snapshot of {os.path.basename(path)}: {e}")
+        if os.path.exists(journal):
+            with open(journal, "r") as f:
+                for line in f:
+                    if line.strip():
+                        _extend(data, json.loads(line))
+        return {"path": path, "signature": sig, "data": data, "compiled": None}
+
+    @staticmethod
+    def _read_json(path):
+        logger.info(f"Parsing data file: {os.path.basename(path)}")
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _data(self, entry):
+        """Parsed records of an entry, read from the JSON on first use"""
+        if entry["data"] is None:
+            with self._lock:
+                if entry["data"] is None:
+                    entry["data"] = self._read_json(entry["path"])
+        return entry["data"]
+
+    def _entry(self, path):
+        path = os.path.abspath(path)
+        snapshot = self.snapshot()
+        entry = snapshot.entries.get(path)
+        # Pinned and still-building snapshots keep the versions they were made of
+        if entry is not None and (not self.check_files or snapshot is not self._current):
+            self.hits += 1
+            return entry
+
+        sig = self.source_signature(path)
+        with self._lock:
+            entry = snapshot.entries.get(path)
+            if entry is not None and entry["signature"] == sig:
+                self.hits += 1
+                return entry
+
+            entry = self._parse(path, sig)
+            snapshot.entries[path] = entry
+            self.reloads += 1
+            return entry
+
+    def refresh(self, paths=()):
+        """Rebuild changed files into a new snapshot and swap it in
+
+        Files of the current snapshot whose signature changed on disk are
+        parsed again, as are ``paths`` not loaded yet; their derived values
+        are rebuilt with the builders that made them. Everything else is
+        carried over. Returns True when a new snapshot was swapped in. On
+        error (e.g. a file still being written) the current snapshot stays.
+        """
+        with self._write_lock:
+            old = self._current
+            targets = {os.path.abspath(p) for p in paths} | set(old.entries)
+            entries, changed = dict(old.entries), set()
+            for path in targets:
+                entry = old.entries.get(path)
+                if not os.path.exists(path):
+                    if entry is not None:
+                        del entries[path]
+                        changed.add(path)
+                    continue
+                sig = self.source_signature(path)
+                if entry is None or entry["signature"] != sig:
+                    entries[path] = self._parse(path, sig)
+                    changed.add(path)
+            if not changed:
+                return False
+
+            new = Snapshot(old.number + 1, entries)
+            # Builders resolve their dependencies (store.derive) in the new snapshot
+            with self._reading(new):
+                for key, (sig, value, builders) in old.derived.items():
+                    if key[0] not in changed:
+                        new.derived[key] = (sig, value, builders)
+                    elif key[0] in entries:
+                        self.derive(key[0], key[1], *builders)
+
+            with self._lock:
+                self._current = new
+                self.swaps += 1
+                self.reloads += len(changed)
+            logger.info(
+                f"Swapped in dataset snapshot {new.number} "
+                f"({', '.join(sorted(os.path.basename(p) for p in changed))})"
+            )
+            return True
+
+    # -- access ----------------------------------------------------------
+
+    def load(self, path):
+        """Return the parsed contents of a JSON file, reloading it if it changed"""
+        return self._data(self._entry(path))
+
+    def version(self, path):
+        """Return the signature of the currently loaded version of a file"""
+        return self._entry(path)["signature"]
+
+    def derive(self, path, name, builder, columnar=None):
+        """Return ``builder(data)`` for a file, rebuilt only when the file changes
+
+        Derived structures (indexes, tables) are cached per file version
+        under ``name`` and share the file's invalidation rules. When the
+        file was opened from its compiled snapshot and ``columnar`` is given,
+        the value is ``columnar(compiled)`` instead and the JSON is not read.
+        """
+        entry = self._entry(path)
+        snapshot = self.snapshot()
+        key = (os.path.abspath(path), name)
+
+        with self._lock:
+            cached = snapshot.derived.get(key)
+            if cached is not None and cached[0] == entry["signature"]:
+                return cached[1]
+
+        logger.info(f"Building {name} for {os.path.basename(path)}")
+        compiled = entry["compiled"]
+        if columnar is not None and compiled is not None:
+            value = columnar(compiled)
+        else:
+            value = builder(self._data(entry))
+        with self._lock:
+            snapshot.derived[key] = (entry["signature"], value, (builder, columnar))
+        return value
+
+    def append(self, path, record):
+        """Append items to a loaded data file, see ``append_many``"""
+        return self.append_many({path: record})[os.path.abspath(path)]
+
+    def append_many(self, records):
+        """Append items to loaded data files and swap in one snapshot holding them
+
+        ``records`` maps each file to a record, which maps top-level keys of
+        the file to lists of new items. Derived values that implement
+        ``extended(delta)`` return an updated copy at a cost proportional to
+        the delta; other derived values are dropped and rebuilt on next use.
+        The new snapshot is built next to the current one without holding the
+        store lock, so requests keep reading the current snapshot meanwhile
+        and the ones that pinned it finish on it unchanged. Every file is
+        extended before anything is written: if one fails, none of them is
+        changed. The records are then journaled and published in a single
+        swap, so readers see all of the files appended or none. Returns the
+        delta of each file, keyed by absolute path.
+        """
+        with self._write_lock:
+            old = self._current
+            new = Snapshot(old.number + 1, dict(old.entries), dict(old.derived))
+            deltas, journaled = {}, {}
+            for path, record in records.items():
+                with self._reading(old):
+                    data = self._data(self._entry(path))
+                path = os.path.abspath(path)
+                journaled[path] = record
+
+                # Copies of the extended lists (not of their items): the old snapshot keeps its own
+                start = {key: len(data.get(key, [])) for key in record}
+                data = {**data, **{key: data.get(key, []) + items for key, items in record.items()}}
+                # Columns no longer cover the file once it has appended batches
+                new.entries[path] = {"path": path, "signature": None, "data": data, "compiled": None}
+
+                delta = deltas[path] = Delta(data, record, start)
+                # Derived values are extended in the order they were built, so
+                # dependencies (adjacency, event index) come before dependents
+                with self._reading(new):
+                    for key in [k for k in old.derived if k[0] == path]:
+                        signature, value, builders = old.derived[key]
+                        if signature == old.entries[path]["signature"] and hasattr(value, "extended"):
+                            delta._extended[id(value)] = value.extended(delta)
+                            new.derived[key] = (None, delta._extended[id(value)], builders)
+                        else:
+                            del new.derived[key]
+
+            with self._lock:
+                self._journal(journaled)
+                for path in deltas:
+                    entry = new.entries[path]
+                    entry["signature"] = self.source_signature(path)
+                    for key, (signature, value, builders) in new.derived.items():
+                        if key[0] == path:
+                            new.derived[key] = (entry["signature"], value, builders)
+                self._current = new
+                self.appends += 1
+        return deltas
+
+    def _journal(self, records):
+        """Write each file's record to its journal, all of them or (on error) none"""
+        written = []
+        try:
+            for path, record in records.items():
+                journal = self.journal_path(path)
+                size = os.path.getsize(journal) if os.path.exists(journal) else None
+                with open(journal, "a") as f:
+                    written.append((journal, size))
+                    f.write(json.dumps(record) + "\n")
+        except BaseException:
+            for journal, size in written:
+                if size is None:
+                    os.remove(journal)
+                else:
+                    os.truncate(journal, size)
+            raise
+
+    def clear(self):
+        with self._lock:
+            self._current = Snapshot(self._current.number + 1)
+
+    def stats(self):
+        """Hit/reload counters and the on-disk size of the loaded files
+
+        ``file_bytes`` counts the source files (and ingestion journals) the
+        current snapshot was read from, not the memory their parsed data
+        and derived indexes take.
+        """
+        with self._lock:
+            snapshot = self._current
+            return {
+                "snapshot": snapshot.number,
+                "files": sorted(os.path.basename(p) for p in snapshot.entries),
+                "hits": self.hits,
+                "reloads": self.reloads,
+                "appends": self.appends,
+                "swaps": self.swaps,
+                "derived": sorted(f"{os.path.basename(p)}:{n}" for p, n in snapshot.derived),
+                "compiled": sorted(
+                    os.path.basename(p) for p, e in snapshot.entries.items() if e["compiled"] is not None
+                ),
+                # Signatures are (mtime_ns, size) pairs, a second pair for the journal
+                "file_bytes": sum(sum(e["signature"][1::2]) for e in snapshot.entries.values()),
+            }
+
+
+store = DatasetStore()
+
+
+DATA_CONFIG_KEYS = ["DATA_FILE", "COMMUNICATION_FILE", "RELATIONSHIPS_FILE", "HEATMAP_SIMILARITY_FILE"]
+
+
+def dataset_version(keys=DATA_CONFIG_KEYS):
+    """Short hash identifying the current version of the configured data files
+
+    ``keys`` limits the hash to the files a response reads, so it only
+    changes when one of them does.
+    """
+    parts = []
+    snapshot = store.snapshot()
+    for key in keys:
+        path = current_app.config.get(key)
+        if path and os.path.exists(path):
+            # Without per-access checks (a watcher swaps snapshots) loaded files are
+            # versioned by the snapshot serving them; otherwise the next access
+            # reloads whatever is on disk, so that is the version
+            entry = None if store.check_files else snapshot.entries.get(os.path.abspath(path))
+            signature = entry["signature"] if entry else DatasetStore.source_signature(path)
+            parts.append(f"{key}={os.path.basename(path)}:{signature}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+def load_config_file(config_key):
+    """Load the JSON file configured under ``config_key`` in ``app.config``"""
+    path = current_app.config.get(config_key)
+    if not path:
+        raise KeyError(f"{config_key} not configured")
+    return store.load(path)
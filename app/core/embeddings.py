@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+# Same sentence encoder BERTopic uses by default for English
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+CHUNK_PREFIX = "chunk-"
+
+
+def text_key(text):
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Content-addressed store of sentence embeddings
+
+    Each batch of newly encoded texts is written as a chunk directory: a
+    float32 ``vectors.npy`` opened with ``mmap_mode="r"`` and a
+    ``keys.json`` with the SHA-1 of each text, in row order. A chunk is
+    written under a temporary name and moved into place in one rename, and
+    never changes afterwards, so processes sharing the directory see whole
+    chunks or nothing and an append costs O(new texts). Chunks other
+    processes add are picked up when the directory changes. Each unique
+    text is encoded once; later calls only gather rows. Without a directory
+    the store lives in memory only.
+    """
+
+    def __init__(self, directory=None, model_name=DEFAULT_MODEL):
+        self.directory = directory
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._encoder = None
+        # text key -> (chunk, row), over the vector matrices of the chunks
+        self._rows = {}
+        self._chunks = []
+        self._loaded = set()
+        self._scanned = None
+        self.hits = 0
+        self.encoded = 0
+        self._open()
+
+    def _open(self):
+        if not self.directory:
+            return
+        # Stores written before chunks: a single matrix plus a key -> row index
+        vectors_path = os.path.join(self.directory, "vectors.npy")
+        index_path = os.path.join(self.directory, "index.json")
+        if os.path.exists(vectors_path) and os.path.exists(index_path):
+            try:
+                with open(index_path, "r") as f:
+                    rows = json.load(f)
+                self._add_chunk("", sorted(rows, key=rows.get), np.load(vectors_path, mmap_mode="r"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable embedding store in {self.directory}: {e}")
+        self._refresh()
+        if self._rows:
+            logger.info(f"Opened embedding store with {len(self._rows)} vectors ({self.model_name})")
+
+    def _refresh(self):
+        """Load the chunks added to the directory since the last scan"""
+        try:
+            scanned = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return
+        if scanned == self._scanned:
+            return
+        self._scanned = scanned
+        for name in sorted(os.listdir(self.directory)):
+            if not name.startswith(CHUNK_PREFIX) or name.endswith(".tmp") or name in self._loaded:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(os.path.join(path, "keys.json"), "r") as f:
+                    keys = json.load(f)
+                vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable embedding chunk {path}: {e}")
+                continue
+            self._add_chunk(name, keys, vectors)
+
+    def _add_chunk(self, name, keys, vectors):
+        if len(keys) != len(vectors):
+            logger.warning(f"Ignoring inconsistent embedding chunk {name!r} in {self.directory}")
+            return
+        chunk = len(self._chunks)
+        self._chunks.append(vectors)
+        self._loaded.add(name)
+        for row, key in enumerate(keys):
+            # Texts encoded by two processes at once keep their first vector
+            self._rows.setdefault(key, (chunk, row))
+
+    @property
+    def encoder(self):
+        """The sentence-transformers model, loaded on first use"""
+        if self._encoder is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._encoder = SentenceTransformer(self.model_name)
+        return self._encoder
+
+    def __len__(self):
+        return len(self._rows)
+
+    def embed(self, texts):
+        """Return a float32 matrix with one embedding per text, encoding only unseen texts"""
+        keys = [text_key(t) for t in texts]
+
+        with self._lock:
+            if self.directory:
+                self._refresh()
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self._rows and key not in missing:
+                    missing[key] = text
+            self.hits += len(keys) - len(missing)
+
+            if missing:
+                logger.info(f"Encoding {len(missing)} new texts with {self.model_name}")
+                vectors = self.encoder.encode(
+                    list(missing.values()), show_progress_bar=False, convert_to_numpy=True
+                )
+                self._append(list(missing), np.asarray(vectors, dtype=np.float32))
+                self.encoded += len(missing)
+
+            if not keys:
+                return np.zeros((0, 0), dtype=np.float32)
+            locations = np.array([self._rows[k] for k in keys], dtype=np.int64)
+            out = np.empty((len(keys), self._chunks[locations[0, 0]].shape[1]), dtype=np.float32)
+            for chunk in np.unique(locations[:, 0]).tolist():
+                selected = locations[:, 0] == chunk
+                out[selected] = self._chunks[chunk][locations[selected, 1]]
+            return out
+
+    def _append(self, keys, vectors):
+        name = ""
+        if self.directory:
+            name = f"{CHUNK_PREFIX}{time.time_ns():020d}-{os.getpid()}-{threading.get_ident()}"
+            path = os.path.join(self.directory, name)
+            tmp = f"{path}.tmp"
+            os.makedirs(tmp)
+            np.save(os.path.join(tmp, "vectors.npy"), vectors)
+            with open(os.path.join(tmp, "keys.json"), "w") as f:
+                json.dump(keys, f)
+            os.replace(tmp, path)
+            vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self._add_chunk(name, keys, vectors)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "vectors": len(self._rows),
+                "chunks": len(self._chunks),
+                "hits": self.hits,
+                "encoded": self.encoded,
+            }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def embedding_store(model_name=DEFAULT_MODEL):
+    """Shared embedding store for ``model_name`` under ``CACHE_DIR/embeddings``"""
+    directory = None
+    if has_app_context() and current_app.config.get("CACHE_DIR"):
+        directory = os.path.join(current_app.config["CACHE_DIR"], "embeddings", model_name)
+
+    with _stores_lock:
+        store = _stores.get((directory, model_name))
+        if store is None:
+            store = EmbeddingStore(directory, model_name)
+            _stores[(directory, model_name)] = store
+        return store
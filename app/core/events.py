@@ -0,0 +1,505 @@
+import copy
+import logging
+from bisect import bisect_right
+from datetime import datetime
+from functools import cached_property
+
+import numpy as np
+from flask import current_app
+
+from app.core.adjacency import adjacency_index, build_adjacency_columns, build_adjacency_index
+from app.core.buffers import Column, SharedBuffer, objects, reset_columns
+from app.core.dataset import store
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def parse_timestamp(value):
+    """Parse the timestamp formats found in the MC3 exports, or return None
+
+    Accepts ISO strings with 'T' (optionally with 'Z' or an offset, which is
+    dropped), space-separated 'YYYY-MM-DD HH:MM:SS' and date-only strings.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", ""))
+    except ValueError:
+        return None
+    return dt.replace(tzinfo=None)
+
+
+def node_timestamp(node):
+    """Raw timestamp string of an event node (timestamp, date + time or date)"""
+    if node.get("timestamp"):
+        return node["timestamp"]
+    if node.get("date") and node.get("time"):
+        return f"{node['date']} {node['time']}"
+    return node.get("date")
+
+
+def node_text(node):
+    return node.get("content") or node.get("findings") or node.get("results") or ""
+
+
+class EventIndex:
+    """Columnar table of timestamped events and the entities involved
+
+    Rows follow the order of the source file. Per-row attributes are NumPy
+    columns so callers select events with boolean masks; message text is
+    stored in a few large string chunks addressed by ``text_offsets``.
+    Receivers are stored CSR-style (``recv_ptr``/``recv_idx``) since an event
+    can reach several entities.
+
+    Events appended to the source file are added by ``extended``, which
+    returns a new index: only the new rows are parsed, and the columns,
+    text chunks and per-entity rows live in shared append-only buffers
+    (:class:`SharedBuffer`) that each version reads up to its own length,
+    so an append costs amortized O(new rows). An index is never modified
+    once built, as requests may still be reading it.
+    """
+
+    ids = Column("rows")
+    raw_timestamps = Column("rows")
+    node_pos = Column("rows")
+    sub_type = Column("rows")
+    has_timestamp = Column("rows")
+    valid = Column("rows")
+    ts = Column("rows")
+    day_number = Column("rows")
+    year = Column("rows")
+    month = Column("rows")
+    day = Column("rows")
+    minute_of_day = Column("rows")
+    hour = Column("rows")
+    minute = Column("rows")
+    weekday = Column("rows")
+    iso = Column("rows")
+    sender = Column("rows")
+    receiver = Column("rows")
+    text_offsets = Column("rows", extra=1)
+    recv_ptr = Column("rows", extra=1)
+    recv_idx = Column("pairs")
+
+    def __init__(self, ids, sub_types, raw_timestamps, texts, node_pos,
+                 senders, receivers, entity_ids, entity_nodes, source="graph"):
+        self.source = source
+        self.entity_ids = []
+        self.entity_pos = {}
+        self.entity_sub_types = []
+        self.entity_labels = []
+        self.entity_names = []
+        # Rows of each entity's events, and how many of them this version holds
+        self._entity_rows = []
+        self._entity_sizes = np.zeros(0, dtype=np.int64)
+        self.add_entities(entity_ids, entity_nodes)
+
+        self._sizes = {"rows": 0, "pairs": 0, "chunks": 0}
+        self._buffers = {
+            "text_offsets": SharedBuffer(np.zeros(1, dtype=np.int64)),
+            "recv_ptr": SharedBuffer(np.zeros(1, dtype=np.int64)),
+        }
+        self.sub_type_names = sorted(set(sub_types))
+        self.append_rows(ids, sub_types, raw_timestamps, texts, node_pos, senders, receivers)
+
+    def add_entities(self, entity_ids, entity_nodes):
+        """Add entities to the entity table, skipping known ids"""
+        for eid, node in zip(entity_ids, entity_nodes):
+            if eid in self.entity_pos:
+                continue
+            self.entity_pos[eid] = len(self.entity_ids)
+            self.entity_ids.append(eid)
+            self.entity_sub_types.append(node.get("sub_type"))
+            self.entity_labels.append(node.get("label", ""))
+            self.entity_names.append(node.get("name", eid))
+            self._entity_rows.append(SharedBuffer(np.zeros(0, dtype=np.int64)))
+        if len(self._entity_sizes) < len(self.entity_ids):
+            self._entity_sizes = np.concatenate([
+                self._entity_sizes,
+                np.zeros(len(self.entity_ids) - len(self._entity_sizes), dtype=np.int64),
+            ])
+
+    def _extend(self, name, size, values):
+        buffer = self._buffers.get(name)
+        if buffer is None:
+            buffer = SharedBuffer(values[:0].copy())
+        self._buffers[name] = buffer.extended(size, values)
+
+    def append_rows(self, ids, sub_types, raw_timestamps, texts, node_pos, senders, receivers):
+        """Add events after the existing rows; senders/receivers are entity indices"""
+        n = len(ids)
+        first_row = self._sizes["rows"]
+
+        # New sub types get the next codes, existing codes never change
+        for name in sub_types:
+            if name not in self.sub_type_names:
+                self.sub_type_names.append(name)
+        codes = {name: i for i, name in enumerate(self.sub_type_names)}
+
+        columns = {
+            "ids": objects(ids),
+            "raw_timestamps": objects(raw_timestamps),
+            "node_pos": np.asarray(node_pos, dtype=np.int64),
+            "sub_type": np.fromiter((codes[s] for s in sub_types), dtype=np.int16, count=n),
+        }
+
+        # Timestamps as int64 epoch seconds plus the calendar fields derived from them
+        columns["has_timestamp"] = np.fromiter((bool(t) for t in raw_timestamps), dtype=bool, count=n)
+        parsed = [parse_timestamp(t) for t in raw_timestamps]
+        columns["valid"] = np.fromiter((dt is not None for dt in parsed), dtype=bool, count=n)
+        ts = np.fromiter(
+            (int((dt - _EPOCH).total_seconds()) if dt is not None else 0 for dt in parsed),
+            dtype=np.int64,
+            count=n,
+        )
+        stamps = ts.astype("datetime64[s]")
+        months = stamps.astype("datetime64[M]")
+        minute_of_day = ((ts % 86400) // 60).astype(np.int16)
+        day_number = (ts // 86400).astype(np.int32)
+        columns.update({
+            "ts": ts,
+            "day_number": day_number,
+            "year": (months.astype(np.int64) // 12 + 1970).astype(np.int16),
+            "month": (months.astype(np.int64) % 12 + 1).astype(np.int8),
+            "day": ((stamps.astype("datetime64[D]") - months).astype(np.int64) + 1).astype(np.int8),
+            "minute_of_day": minute_of_day,
+            "hour": (minute_of_day // 60).astype(np.int8),
+            "minute": (minute_of_day % 60).astype(np.int8),
+            "weekday": ((day_number + 3) % 7).astype(np.int8),  # 1970-01-01 was a Thursday
+            "iso": np.datetime_as_string(stamps, unit="s"),
+        })
+
+        # Content: one new string chunk per batch
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=n)
+        text_base = int(self.text_offsets[-1])
+        columns["text_offsets"] = text_base + np.cumsum(lengths)
+        if lengths.sum():
+            chunks = self._sizes["chunks"]
+            self._extend("text_chunks", chunks, objects(["".join(texts)]))
+            self._extend("chunk_starts", chunks, np.array([text_base], dtype=np.int64))
+            self._sizes["chunks"] = chunks + 1
+
+        columns["sender"] = np.asarray(senders, dtype=np.int32)
+        counts = np.fromiter((len(r) for r in receivers), dtype=np.int64, count=n)
+        columns["recv_ptr"] = int(self.recv_ptr[-1]) + np.cumsum(counts)
+        recv_idx = np.fromiter(
+            (r for row in receivers for r in row), dtype=np.int32, count=int(counts.sum())
+        )
+        # First receiver per event, -1 when there is none
+        receiver = np.full(n, -1, dtype=np.int32)
+        has_recv = counts > 0
+        receiver[has_recv] = recv_idx[(np.cumsum(counts) - counts)[has_recv]]
+        columns["receiver"] = receiver
+
+        for name, values in columns.items():
+            self._extend(name, first_row + (1 if name in ("text_offsets", "recv_ptr") else 0), values)
+        self._extend("recv_idx", self._sizes["pairs"], recv_idx)
+        self._sizes["rows"] += n
+        self._sizes["pairs"] += len(recv_idx)
+        reset_columns(self)
+
+        self._index_entities(first_row, columns["sender"], counts, recv_idx)
+
+    def _index_entities(self, first_row, senders, counts, recv_idx):
+        """Add the new rows to the rows of the entities that sent or received them"""
+        rows = np.arange(first_row, first_row + len(senders), dtype=np.int64)
+        has_sender = senders >= 0
+        pair_entity = np.concatenate([senders[has_sender], recv_idx]).astype(np.int64)
+        pair_row = np.concatenate([rows[has_sender], np.repeat(rows, counts)])
+        # Sorted by entity, then row; the new rows all follow the existing ones
+        stride = max(first_row + len(senders), 1)
+        pairs = np.unique(pair_entity * stride + pair_row)
+        entities, starts = np.unique(pairs // stride, return_index=True)
+        pair_row = pairs % stride
+        for k, lo, hi in zip(entities.tolist(), starts.tolist(), [*starts[1:].tolist(), len(pairs)]):
+            self._entity_rows[k] = self._entity_rows[k].extended(self._entity_sizes[k], pair_row[lo:hi])
+            self._entity_sizes[k] += hi - lo
+        self.__dict__.pop("entity_event_ptr", None)
+        self.__dict__.pop("entity_event_rows", None)
+
+    @cached_property
+    def entity_event_ptr(self):
+        """CSR pointers of the per-entity rows (``entity_event_rows``)"""
+        ptr = np.zeros(len(self.entity_ids) + 1, dtype=np.int64)
+        np.cumsum(self._entity_sizes, out=ptr[1:])
+        return ptr
+
+    @cached_property
+    def entity_event_rows(self):
+        """Rows each entity sent or received, entity after entity"""
+        if not self.entity_ids:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([self.entity_rows(eid) for eid in self.entity_ids])
+
+    def extended(self, delta):
+        """Index with the events appended to the source file (see ``DatasetStore.append``)"""
+        index = copy.copy(self)
+        index.__dict__.pop("entity_event_ptr", None)
+        index.__dict__.pop("entity_event_rows", None)
+        reset_columns(index)
+        for name in ("entity_ids", "entity_sub_types", "entity_labels", "entity_names",
+                     "sub_type_names", "_entity_rows"):
+            setattr(index, name, list(getattr(self, name)))
+        index.entity_pos = dict(self.entity_pos)
+        index._entity_sizes = self._entity_sizes.copy()
+        index._sizes = dict(self._sizes)
+        index._buffers = dict(self._buffers)
+        if self.source == "graph":
+            _extend_from_graph(index, delta)
+        else:
+            _extend_from_messages(index, delta)
+        return index
+
+    def __len__(self):
+        return self._sizes["rows"]
+
+    # -- masks -----------------------------------------------------------
+
+    def sub_type_mask(self, sub_type):
+        if sub_type not in self.sub_type_names:
+            return np.zeros(len(self), dtype=bool)
+        return self.sub_type == self.sub_type_names.index(sub_type)
+
+    def month_mask(self, year, month):
+        return self.valid & (self.year == year) & (self.month == month)
+
+    def entity_mask(self, entity_id):
+        """Events sent or received by ``entity_id``"""
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.entity_rows(entity_id)] = True
+        return mask
+
+    def entity_rows(self, entity_id):
+        """Sorted rows of the events sent or received by ``entity_id``"""
+        k = self.entity_pos.get(entity_id)
+        if k is None:
+            return np.zeros(0, dtype=np.int64)
+        return self._entity_rows[k].view(self._entity_sizes[k])
+
+    # -- row access ------------------------------------------------------
+
+    def text(self, row):
+        offsets = self.text_offsets
+        start, stop = offsets.item(row), offsets.item(row + 1)
+        if start == stop:
+            return ""
+        # Chunks of later versions may follow this version's ones, never precede them
+        starts = self._buffers["chunk_starts"].values
+        chunk = bisect_right(starts, start, 0, self._sizes["chunks"]) - 1
+        return self._buffers["text_chunks"].values[chunk][start - starts[chunk]:stop - starts[chunk]]
+
+    def receivers(self, row):
+        return self.recv_idx[self.recv_ptr[row]:self.recv_ptr[row + 1]]
+
+    def date(self, row):
+        return self.iso[row][:10]
+
+    def time(self, row):
+        return self.iso[row][11:]
+
+    def participants(self, rows):
+        """Entity indices involved in ``rows``, in order of first appearance
+
+        Each event contributes its sender followed by its receivers.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.int32)
+        counts = self.recv_ptr[rows + 1] - self.recv_ptr[rows]
+        # Position of every receiver entry of the selected rows in recv_idx
+        starts = np.repeat(self.recv_ptr[rows] - np.cumsum(counts) + counts, counts)
+        recv = self.recv_idx[starts + np.arange(counts.sum())]
+        # Interleave: sender slot at the head of each row's segment
+        seg_start = np.cumsum(counts + 1) - (counts + 1)
+        seq = np.empty(int((counts + 1).sum()), dtype=np.int32)
+        seq[seg_start] = self.sender[rows]
+        recv_slots = np.ones(len(seq), dtype=bool)
+        recv_slots[seg_start] = False
+        seq[recv_slots] = recv
+        seq = seq[seq >= 0]
+        uniq, first = np.unique(seq, return_index=True)
+        return uniq[np.argsort(first, kind="stable")]
+
+    def entity_record(self, k):
+        return {
+            "id": self.entity_ids[k],
+            "sub_type": self.entity_sub_types[k],
+            "label": self.entity_labels[k],
+        }
+
+
+def build_event_index(data, adjacency=None):
+    """Build an :class:`EventIndex` from either export format
+
+    Node-link graphs (``MC3_graph.json``) contribute every Event node, with
+    senders and receivers taken from ``sent``/``received`` edges of the
+    graph's :class:`AdjacencyIndex`. Message lists
+    (``MC3_graph_communication.json``) contribute one Communication event
+    per link.
+    """
+    nodes = data.get("nodes", [])
+    edges = data.get("edges", data.get("links", []))
+    node_map = {node["id"]: node for node in nodes}
+
+    if any(node.get("type") == "Event" for node in nodes):
+        if adjacency is None:
+            adjacency = build_adjacency_index(data)
+        return _build_from_graph(nodes, adjacency, node_map)
+    return _build_from_messages(nodes, edges, node_map)
+
+
+# Node attributes the event index reads
+EVENT_NODE_KEYS = (
+    "id", "type", "sub_type", "label", "name",
+    "timestamp", "date", "time", "content", "findings", "results",
+)
+
+
+def build_event_index_columns(compiled, adjacency=None):
+    """Build an :class:`EventIndex` from a compiled snapshot
+
+    Only the node attributes the index uses are decoded, and the graph's
+    adjacency comes from the edge columns, so the JSON is never parsed.
+    """
+    lists = compiled.lists()
+    nodes = compiled.records("nodes", keys=EVENT_NODE_KEYS) if "nodes" in lists else []
+    node_map = {node["id"]: node for node in nodes}
+    if any(node.get("type") == "Event" for node in nodes):
+        if adjacency is None:
+            adjacency = build_adjacency_columns(compiled)
+        return _build_from_graph(nodes, adjacency, node_map)
+    links = next((compiled.records(name) for name in ("edges", "links") if name in lists), [])
+    return _build_from_messages(nodes, links, node_map)
+
+
+def _build_from_graph(nodes, adjacency, node_map):
+    entity_ids = [node["id"] for node in nodes if node.get("type") == "Entity"]
+    entity_pos = {eid: i for i, eid in enumerate(entity_ids)}
+    # Node index -> entity index, -1 for non-entity nodes
+    entity_of_node = np.full(len(adjacency), -1, dtype=np.int32)
+    for eid, k in entity_pos.items():
+        entity_of_node[adjacency.node_pos[eid]] = k
+
+    event_nodes = [(pos, node) for pos, node in enumerate(nodes) if node.get("type") == "Event"]
+    node_pos = [pos for pos, _ in event_nodes]
+    ids = [node["id"] for _, node in event_nodes]
+    sub_types = [node.get("sub_type", "Unknown") for _, node in event_nodes]
+    raw_ts = [node_timestamp(node) for _, node in event_nodes]
+    texts = [node_text(node) for _, node in event_nodes]
+
+    # Sender: the first entity with a sent edge to the event
+    counts, sources = adjacency.neighbour_lists(node_pos, "sent", outgoing=False)
+    sources = entity_of_node[sources]
+    event_of = np.repeat(np.arange(len(node_pos)), counts)
+    first_events, first = np.unique(event_of[sources >= 0], return_index=True)
+    senders = np.full(len(node_pos), -1, dtype=np.int32)
+    senders[first_events] = sources[sources >= 0][first]
+
+    # Receivers: the entities the event has received edges to, in edge order
+    counts, targets = adjacency.neighbour_lists(node_pos, "received")
+    targets = entity_of_node[targets]
+    event_of = np.repeat(np.arange(len(node_pos)), counts)[targets >= 0]
+    targets = targets[targets >= 0]
+    cuts = np.cumsum(np.bincount(event_of, minlength=len(node_pos)))[:-1]
+    receivers = [r.tolist() for r in np.split(targets, cuts)] if node_pos else []
+
+    return EventIndex(ids, sub_types, raw_ts, texts, node_pos, senders, receivers,
+                      entity_ids, [node_map[eid] for eid in entity_ids])
+
+
+def _build_from_messages(nodes, links, node_map):
+    entity_ids = [node["id"] for node in nodes]
+    entity_pos = {eid: i for i, eid in enumerate(entity_ids)}
+
+    def entity(eid):
+        if not eid:
+            return -1
+        if eid not in entity_pos:
+            entity_pos[eid] = len(entity_ids)
+            entity_ids.append(eid)
+        return entity_pos[eid]
+
+    ids, raw_ts, texts, senders, receivers = [], [], [], [], []
+    for i, link in enumerate(links):
+        ids.append(link.get("event_id", link.get("id", f"comm_{i}")))
+        raw_ts.append(link.get("datetime", link.get("timestamp")))
+        texts.append(link.get("content", link.get("message", link.get("text", ""))) or "")
+        senders.append(entity(link.get("source")))
+        target = entity(link.get("target"))
+        receivers.append([target] if target >= 0 else [])
+
+    n = len(ids)
+    return EventIndex(ids, ["Communication"] * n, raw_ts, texts, list(range(n)), senders,
+                      receivers, entity_ids, [node_map.get(eid, {"id": eid}) for eid in entity_ids],
+                      source="messages")
+
+
+def _extend_from_graph(index, delta):
+    """Append the Event nodes of a graph delta, wired by their sent/received edges"""
+    new_entities = [node for node in delta.nodes if node.get("type") == "Entity"]
+    index.add_entities([node["id"] for node in new_entities], new_entities)
+
+    sent_by, received_by = {}, {}
+    for edge in delta.edges:
+        if edge.get("type") == "sent":
+            sent_by.setdefault(edge.get("target"), []).append(edge.get("source"))
+        elif edge.get("type") == "received":
+            received_by.setdefault(edge.get("source"), []).append(edge.get("target"))
+
+    ids, sub_types, raw_ts, texts, node_pos, senders, receivers = [], [], [], [], [], [], []
+    for pos, node in enumerate(delta.nodes, start=delta.node_start):
+        if node.get("type") != "Event":
+            continue
+        sent_from = [index.entity_pos[e] for e in sent_by.get(node["id"], []) if e in index.entity_pos]
+        ids.append(node["id"])
+        sub_types.append(node.get("sub_type", "Unknown"))
+        raw_ts.append(node_timestamp(node))
+        texts.append(node_text(node))
+        node_pos.append(pos)
+        senders.append(sent_from[0] if sent_from else -1)
+        receivers.append(
+            [index.entity_pos[e] for e in received_by.get(node["id"], []) if e in index.entity_pos]
+        )
+    index.append_rows(ids, sub_types, raw_ts, texts, node_pos, senders, receivers)
+
+
+def _extend_from_messages(index, delta):
+    """Append the links of a message-list delta, one Communication event each"""
+    index.add_entities([node["id"] for node in delta.nodes], delta.nodes)
+
+    def entity(eid):
+        if not eid:
+            return -1
+        if eid not in index.entity_pos:
+            index.add_entities([eid], [{"id": eid}])
+        return index.entity_pos[eid]
+
+    ids, raw_ts, texts, senders, receivers = [], [], [], [], []
+    for i, link in enumerate(delta.edges, start=delta.edge_start):
+        ids.append(link.get("event_id", link.get("id", f"comm_{i}")))
+        raw_ts.append(link.get("datetime", link.get("timestamp")))
+        texts.append(link.get("content", link.get("message", link.get("text", ""))) or "")
+        senders.append(entity(link.get("source")))
+        target = entity(link.get("target"))
+        receivers.append([target] if target >= 0 else [])
+
+    n = len(ids)
+    index.append_rows(ids, ["Communication"] * n, raw_ts, texts,
+                      list(range(delta.edge_start, delta.edge_start + n)), senders, receivers)
+
+
+def event_index(config_key="DATA_FILE", path=None):
+    """Return the event index of a configured data file, cached per file version"""
+    path = path or current_app.config.get(config_key)
+    if not path:
+        raise KeyError(f"{config_key} not configured")
+    return store.derive(
+        path,
+        "event_index",
+        lambda data: build_event_index(data, adjacency_index(path=path)),
+        columnar=lambda compiled: build_event_index_columns(compiled, adjacency_index(path=path)),
+    )
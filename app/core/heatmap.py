@@ -0,0 +1,89 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Little-endian so browsers can view the body with a Float32Array/DataView directly
+DTYPES = {"float16": np.dtype("<f2"), "float32": np.dtype("<f4")}
+
+# Largest tile edge served in one response
+MAX_TILE = 1024
+
+
+def parse_range(value, size):
+    """(start, stop) of a ``start:stop`` range over ``size`` items, clipped
+
+    Missing bounds default to the whole axis; a tile is at most
+    ``MAX_TILE`` long.
+    """
+    if value in (None, ""):
+        start, stop = 0, size
+    else:
+        parts = str(value).split(":")
+        if len(parts) != 2:
+            raise ValueError(f"Expected a start:stop range, got {value!r}")
+        try:
+            start = int(parts[0]) if parts[0] else 0
+            stop = int(parts[1]) if parts[1] else size
+        except ValueError:
+            raise ValueError(f"Expected a start:stop range, got {value!r}")
+    start, stop = max(0, min(start, size)), max(0, min(stop, size))
+    if stop < start:
+        raise ValueError(f"Empty range {value!r}")
+    return start, min(stop, start + MAX_TILE)
+
+
+def encode_tile(matrix, rows, cols, dtype="float32", top_k=None):
+    """Binary body and headers of a tile of a similarity matrix
+
+    ``rows`` and ``cols`` are (start, stop) ranges. Dense tiles are the
+    row-major block of values in ``dtype``. With ``top_k`` every row keeps
+    its k most similar other entities over the whole matrix (the diagonal,
+    self-similarity, is left out) and the tile shows the ones that fall
+    within ``cols``: the body is the (rows x k) int32 matrix of absolute
+    column indices, best first, followed by the (rows x k) matrix of their
+    values. Neighbours outside ``cols`` are listed as index -1 with a NaN
+    value, so a client stitching tiles together gets each neighbour once.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+    if cols[1] <= cols[0]:
+        raise ValueError(f"Empty column range {cols[0]}:{cols[1]}")
+    headers = {
+        "X-Heatmap-Rows": f"{rows[0]}:{rows[1]}",
+        "X-Heatmap-Cols": f"{cols[0]}:{cols[1]}",
+        "X-Heatmap-Dtype": dtype,
+    }
+
+    if top_k is None:
+        block = np.asarray(matrix[rows[0]:rows[1], cols[0]:cols[1]], dtype=np.float32)
+        headers["X-Heatmap-Layout"] = "dense"
+        headers["X-Heatmap-Shape"] = f"{block.shape[0]},{block.shape[1]}"
+        return block.astype(DTYPES[dtype]).tobytes(), headers
+
+    if int(top_k) < 1:
+        raise ValueError("top_k must be positive")
+    full = np.array(matrix[rows[0]:rows[1]], dtype=np.float32)
+    count = full.shape[0]
+    own = np.arange(rows[0], rows[1])
+    inside = own < full.shape[1]
+    full[inside.nonzero()[0], own[inside]] = -np.inf
+    k = min(int(top_k), max(full.shape[1] - 1, 1))
+    if k < full.shape[1]:
+        part = np.argpartition(-full, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(k), (count, k)).copy()
+    values = np.take_along_axis(full, part, axis=1)
+    order = np.argsort(-values, axis=1, kind="stable")
+    indices = np.take_along_axis(part, order, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+
+    outside = (indices < cols[0]) | (indices >= cols[1]) | np.isneginf(values)
+    indices[outside] = -1
+    values[outside] = np.nan
+
+    headers["X-Heatmap-Layout"] = "topk"
+    headers["X-Heatmap-Shape"] = f"{count},{k}"
+    body = indices.astype("<i4").tobytes() + values.astype(DTYPES[dtype]).tobytes()
+    return body, headers
@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+from app.core.artifacts import normalize_params
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+def response_etag(version, viz_name, params):
+    """Strong ETag for a visualization response: dataset version plus normalized params"""
+    payload = f"{version}|{viz_name}|{sorted(normalize_params(params).items())}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]
+
+
+def supported_encodings():
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def _compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=6)
+    return gzip.compress(body, compresslevel=6)
+
+
+class ResponseCache:
+    """Serialized response bodies per ETag, with their compressed variants
+
+    Each entry holds the identity body and any gzip/brotli encodings
+    requested so far; entries are evicted least-recently-used once the
+    total size of all stored variants exceeds ``max_bytes``. Bodies are JSON
+    unless stored with other ``headers`` (e.g. a binary ``Content-Type``).
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._headers = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.served = 0
+        self.stored = 0
+        self.not_modified = 0
+
+    def __contains__(self, etag):
+        with self._lock:
+            return etag in self._entries
+
+    def put(self, etag, body, headers=None):
+        with self._lock:
+            old = self._entries.pop(etag, None)
+            if old is not None:
+                self._bytes -= sum(len(v) for v in old.values())
+            self._entries[etag] = {"identity": body}
+            self._headers.pop(etag, None)
+            if headers:
+                self._headers[etag] = dict(headers)
+            self._bytes += len(body)
+            self.stored += 1
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            etag, entry = self._entries.popitem(last=False)
+            self._headers.pop(etag, None)
+            self._bytes -= sum(len(v) for v in entry.values())
+
+    def body(self, etag, encoding="identity"):
+        """Return the body in ``encoding``, compressing and caching it on first use"""
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                return None
+            self._entries.move_to_end(etag)
+            encoded = entry.get(encoding)
+            identity = entry["identity"]
+        if encoded is not None:
+            return encoded
+
+        encoded = _compress(identity, encoding)
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is not None and encoding not in entry:
+                entry[encoding] = encoded
+                self._bytes += len(encoded)
+                self._evict()
+        return encoded
+
+    def respond(self, etag, request):
+        """Build the response for a cached ETag, negotiating Content-Encoding"""
+        encoding = request.accept_encodings.best_match(supported_encodings()) or "identity"
+        body = self.body(etag, encoding)
+        if body is None:
+            return None
+        with self._lock:
+            self.served += 1
+            headers = dict(self._headers.get(etag, {}))
+
+        response = Response(body, mimetype=headers.pop("Content-Type", "application/json"))
+        response.headers.update(headers)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = "no-cache"
+        response.set_etag(etag)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._headers.clear()
+            self._bytes = 0
+
+    def not_modified_response(self, etag):
+        with self._lock:
+            self.not_modified += 1
+        response = Response(status=304)
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = "no-cache"
+        response.set_etag(etag)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.served - self.stored,
+                "misses": self.stored,
+                "not_modified": self.not_modified,
+                "encodings": supported_encodings(),
+            }
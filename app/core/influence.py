@@ -0,0 +1,150 @@
+import copy
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.dataset import store
+from app.core.events import event_index
+
+logger = logging.getLogger(__name__)
+
+# Windows whose pair matrices are kept, least recently used evicted first
+MAX_WINDOWS = 8
+
+
+class InfluenceEngine:
+    """Lead-lag statistics between message senders
+
+    For an ordered pair (A, B), A's message at time t is *followed* by B
+    when B sends a message in (t, t + window]. Messages are kept in one
+    time-sorted table plus a sorted timestamp array per sender, so B's next
+    message after every message of the table is a single
+    ``np.searchsorted`` over B's array: all pairs cost one binary search per
+    (message, entity) instead of comparing messages with each other.
+
+    A's ``rate`` is the share of its messages followed by B and ``lift``
+    compares it with B's base rate, the share of everyone else's messages
+    followed by B, so entities B answers more than chance rank first. The
+    pair matrices of the ``MAX_WINDOWS`` most recently used windows are
+    kept until new messages arrive through ``extended``.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.ts = np.zeros(0, dtype=np.int64)
+        self.sender = np.zeros(0, dtype=np.int64)
+        self.sent = []
+        self._seen = 0
+        self._matrices = OrderedDict()
+        self._consume()
+
+    def _consume(self):
+        """Insert the messages added to the event index since the last call"""
+        index = self.index
+        rows = np.arange(self._seen, len(index))
+        self._seen = len(index)
+        rows = rows[index.sub_type_mask("Communication")[rows] & index.valid[rows] & (index.sender[rows] >= 0)]
+        ts = index.ts[rows]
+        order = np.argsort(ts, kind="stable")
+        ts, senders = ts[order], index.sender[rows][order].astype(np.int64)
+
+        at = np.searchsorted(self.ts, ts, side="right")
+        self.ts, self.sender = np.insert(self.ts, at, ts), np.insert(self.sender, at, senders)
+        while len(self.sent) < len(index.entity_ids):
+            self.sent.append(np.zeros(0, dtype=np.int64))
+        for k in np.unique(senders):
+            own = ts[senders == k]
+            self.sent[k] = np.insert(self.sent[k], np.searchsorted(self.sent[k], own, side="right"), own)
+        self._matrices = OrderedDict()
+
+    def extended(self, delta):
+        # The message index is extended first and already holds the new rows;
+        # _consume replaces the arrays it changes, so they can be shared
+        engine = copy.copy(self)
+        engine.index = delta.current(self.index)
+        engine.sent = list(self.sent)
+        engine._consume()
+        return engine
+
+    def matrices(self, window):
+        """(messages, followed, delay, base_rate) for a window in seconds
+
+        ``followed[a, b]`` counts a's messages followed by b within the
+        window, ``delay[a, b]`` sums how long b took to follow them and
+        ``base_rate[b]`` is the share of other senders' messages b follows.
+        """
+        cached = self._matrices.get(window)
+        if cached is not None:
+            self._matrices.move_to_end(window)
+            return cached
+
+        n = len(self.sent)
+        followed = np.zeros((n, n), dtype=np.int64)
+        delay = np.zeros((n, n))
+        base_rate = np.zeros(n)
+        for b, times in enumerate(self.sent):
+            if not len(times):
+                continue
+            after = np.searchsorted(times, self.ts, side="right")
+            gap = times[np.minimum(after, len(times) - 1)] - self.ts
+            others = self.sender != b
+            hit = (after < len(times)) & (gap <= window) & others
+            followed[:, b] = np.bincount(self.sender[hit], minlength=n)
+            delay[:, b] = np.bincount(self.sender[hit], weights=gap[hit], minlength=n)
+            base_rate[b] = hit.sum() / max(others.sum(), 1)
+
+        messages = np.array([len(times) for times in self.sent], dtype=np.int64)
+        result = messages, followed, delay, base_rate
+        self._matrices[window] = result
+        while len(self._matrices) > MAX_WINDOWS:
+            self._matrices.popitem(last=False)
+        return result
+
+    def influencers(self, window, targets=None, top=10, min_followed=3):
+        """{entity id: ranked influencers} for ``targets`` (entity positions, default all senders)
+
+        Each influencer lists its messages, how many ``target`` followed
+        within ``window`` seconds, the rate, the lift over the target's base
+        rate and the mean delay. Pairs followed fewer than ``min_followed``
+        times are left out.
+        """
+        messages, followed, delay, base_rate = self.matrices(window)
+        ids = self.index.entity_ids
+        if targets is None:
+            targets = np.flatnonzero(messages)
+
+        ranked = {}
+        for b in targets:
+            counts = followed[:, b]
+            candidates = np.flatnonzero(counts >= max(min_followed, 1))
+            rate = counts[candidates] / messages[candidates]
+            lift = rate / base_rate[b] if base_rate[b] > 0 else np.zeros(len(candidates))
+            order = np.lexsort((-counts[candidates], -lift))[:top]
+            ranked[ids[b]] = [
+                {
+                    "entity": ids[a],
+                    "messages": int(messages[a]),
+                    "followed": int(counts[a]),
+                    "rate": round(float(rate[i]), 4),
+                    "lift": round(float(lift[i]), 4),
+                    "mean_delay_minutes": round(float(delay[a, b] / counts[a] / 60), 2),
+                }
+                for i, a in ((i, candidates[i]) for i in order)
+            ]
+        return ranked
+
+    def base_rates(self, window, targets=None):
+        messages, _, _, base_rate = self.matrices(window)
+        if targets is None:
+            targets = np.flatnonzero(messages)
+        return {self.index.entity_ids[b]: round(float(base_rate[b]), 4) for b in targets}
+
+
+def influence_engine(path):
+    """Lead-lag engine of a data file, updated as messages are ingested"""
+
+    def build(data):
+        return InfluenceEngine(event_index(path=path))
+
+    return store.derive(path, "influence", build)
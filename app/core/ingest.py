@@ -0,0 +1,135 @@
+import logging
+import os
+
+from flask import current_app
+
+from app.core.adjacency import adjacency_index
+from app.core.dataset import dataset_version, store
+
+logger = logging.getLogger(__name__)
+
+NODE_TYPES = ("Event", "Entity")
+EDGE_TYPES = ("sent", "received")
+
+
+def prepare_delta(payload, known_ids):
+    """Validate a batch of new graph nodes and edges, return (nodes, edges)
+
+    ``payload`` holds ``nodes`` (Event or Entity nodes with new ids) and
+    ``edges`` (``sent`` edges from an entity to a new event, ``received``
+    edges from a new event to an entity). ``known_ids`` tells whether a node
+    id already exists. Raises ValueError describing the first problem.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object with nodes and edges")
+    nodes = payload.get("nodes") or []
+    edges = payload.get("edges") or []
+    if not isinstance(nodes, list) or not isinstance(edges, list):
+        raise ValueError("nodes and edges must be lists")
+    if not nodes and not edges:
+        raise ValueError("Nothing to ingest")
+
+    new_ids = {}
+    for node in nodes:
+        if not isinstance(node, dict) or not node.get("id"):
+            raise ValueError("Every node needs an id")
+        if node.get("type") not in NODE_TYPES:
+            raise ValueError(f"Node {node['id']}: type must be one of {', '.join(NODE_TYPES)}")
+        if node["id"] in new_ids or known_ids(node["id"]):
+            raise ValueError(f"Node {node['id']} already exists")
+        new_ids[node["id"]] = node["type"]
+
+    def exists(node_id):
+        return node_id in new_ids or known_ids(node_id)
+
+    for edge in edges:
+        if not isinstance(edge, dict):
+            raise ValueError("Every edge must be an object")
+        edge_type, source, target = edge.get("type"), edge.get("source"), edge.get("target")
+        if edge_type not in EDGE_TYPES:
+            raise ValueError(f"Edge {source} -> {target}: type must be one of {', '.join(EDGE_TYPES)}")
+        # Appended edges may only wire up new events, existing events are immutable
+        event = target if edge_type == "sent" else source
+        if new_ids.get(event) != "Event":
+            raise ValueError(f"Edge {source} -> {target}: {edge_type} edges must involve a new event")
+        if not exists(source) or not exists(target):
+            raise ValueError(f"Edge {source} -> {target}: unknown node")
+
+    return nodes, edges
+
+
+def communication_links(nodes, edges):
+    """Message-list links (``MC3_graph_communication.json``) for new communications"""
+    events = {
+        node["id"]: node for node in nodes
+        if node.get("type") == "Event" and node.get("sub_type") == "Communication"
+    }
+    senders, receivers = {}, {}
+    for edge in edges:
+        if edge["type"] == "sent":
+            senders.setdefault(edge["target"], edge["source"])
+        else:
+            receivers.setdefault(edge["source"], []).append(edge["target"])
+
+    links = []
+    for event_id, node in events.items():
+        if event_id not in senders:
+            continue
+        for target in receivers.get(event_id, []):
+            links.append({
+                "source": senders[event_id],
+                "target": target,
+                "event_id": event_id,
+                "datetime": node.get("timestamp"),
+                "content": node.get("content", ""),
+            })
+    return links
+
+
+def ingest(payload):
+    """Append new events and entities to the configured data files
+
+    The graph file receives the nodes and edges as given; when the message
+    list is a separate file it receives one link per (sender, receiver) of
+    each new Communication event plus the new entities. Both files are
+    appended in one ``DatasetStore.append_many``: derived indexes are
+    extended into a new snapshot, which is published only once every file
+    was extended, so readers never see one file without the other.
+    """
+    data_file = current_app.config.get("DATA_FILE")
+    comm_file = current_app.config.get("COMMUNICATION_FILE")
+    if not data_file:
+        raise KeyError("DATA_FILE not configured")
+
+    graph_format = data_file != comm_file
+    if graph_format:
+        known = adjacency_index(path=data_file).node_pos
+    else:
+        # Only the message list is loaded: its entities and event ids are the known nodes
+        messages = store.load(data_file)
+        known = {node["id"] for node in messages.get("nodes", [])}
+        known.update(link.get("event_id") for link in messages.get("links", []))
+    nodes, edges = prepare_delta(payload, known.__contains__)
+
+    records = {}
+    if graph_format:
+        records[data_file] = {"nodes": nodes, "edges": edges}
+
+    links = communication_links(nodes, edges)
+    if comm_file and os.path.exists(comm_file):
+        known = {node["id"] for node in store.load(comm_file).get("nodes", [])}
+        entities = [
+            node for node in nodes if node["type"] == "Entity" and node["id"] not in known
+        ]
+        if links or entities:
+            records[comm_file] = {"nodes": entities, "links": links}
+    if records:
+        store.append_many(records)
+
+    logger.info(f"Ingested {len(nodes)} nodes, {len(edges)} edges ({len(links)} messages)")
+    return {
+        "nodes": len(nodes),
+        "edges": len(edges),
+        "messages": len(links),
+        "dataset_version": dataset_version(),
+    }
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def job_id_for(viz_name, params, version=None):
+    """Deterministic job id, so identical requests on the same dataset version share a single job"""
+    payload = json.dumps({"viz": viz_name, "params": params, "version": version}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _run_visualization(viz_name, params, config=None):
+    """Worker entry point: compute ``get_data`` inside the child's own app context
+
+    ``config`` carries the submitting app's settings (data files, cache
+    directory), which a freshly spawned child would otherwise take from
+    its defaults. An ``{"error": ...}`` response fails the job.
+    """
+    from app import app, load_visualization_module
+
+    app.config.update(config or {})
+    with app.app_context():
+        module = load_visualization_module(viz_name)
+        if module is None:
+            raise RuntimeError(f"Visualization module could not be loaded: {viz_name}")
+        data = module.get_data(**params)
+    if isinstance(data, dict) and data.get("error"):
+        raise RuntimeError(data["error"])
+    return data
+
+
+class JobQueue:
+    """Bounded pool of worker processes for long-running ``get_data`` calls
+
+    Processes rather than threads, so model fitting is not limited by the
+    GIL and does not hold Flask workers. Jobs are keyed by visualization,
+    parameters and dataset version; submitting the same request again
+    returns the existing job unless it failed or the data changed since.
+    Only the most recent ``max_jobs`` jobs are kept.
+    """
+
+    def __init__(self, max_workers=2, max_jobs=100):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: children import the app fresh instead of inheriting server threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def submit(self, viz_name, params, version=None, config=None):
+        job_id = job_id_for(viz_name, params, version)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and self._status(job) != "failed":
+                return job_id
+
+            logger.info(f"Queueing {viz_name} job {job_id} with params {params}")
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "viz_name": viz_name,
+                "params": params,
+                "submitted_at": time.time(),
+                "future": self._pool().submit(_run_visualization, viz_name, params, config),
+            }
+            self._jobs.move_to_end(job_id)
+            self._prune()
+        return job_id
+
+    def _prune(self):
+        finished = [jid for jid, job in self._jobs.items() if job["future"].done()]
+        while len(self._jobs) > self.max_jobs and finished:
+            del self._jobs[finished.pop(0)]
+
+    @staticmethod
+    def _status(job):
+        future = job["future"]
+        if future.done():
+            return "failed" if future.exception() is not None else "done"
+        return "running" if future.running() else "queued"
+
+    def status(self, job_id):
+        """Job description without the result, or None for unknown ids"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        status = self._status(job)
+        info = {
+            "job_id": job_id,
+            "viz_name": job["viz_name"],
+            "params": job["params"],
+            "status": status,
+            "submitted_at": job["submitted_at"],
+        }
+        if status == "failed":
+            info["error"] = str(job["future"].exception())
+        return info
+
+    def result(self, job_id):
+        """Return the job's result; only valid once its status is ``done``"""
+        with self._lock:
+            job = self._jobs[job_id]
+        return job["future"].result()
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {}
+        for job in jobs:
+            status = self._status(job)
+            counts[status] = counts.get(status, 0) + 1
+        return {"max_workers": self.max_workers, "jobs": counts}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
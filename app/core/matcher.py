@@ -0,0 +1,85 @@
+import re
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _trie_pattern(terms):
+    """Regex alternation of ``terms`` factored into a prefix trie
+
+    Shared prefixes are matched once, so each position costs one branch per
+    distinct next character instead of one attempt per term. Optional
+    suffixes are greedy: the longest term matching at a position wins.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class TermMatcher:
+    """Find every term of several term sets in a text with a single scan
+
+    ``term_sets`` maps a set name to a list of terms (a plain list is a
+    single unnamed set). Matching is case-insensitive; with
+    ``whole_words`` a term only matches between word boundaries, like
+    ``re.search(rf"\\b{term}\\b")``, otherwise like ``term in text``.
+
+    The text is scanned once with one compiled pattern: a lookahead at
+    every candidate position reports the longest term starting there, and
+    the shorter terms that are prefixes of it are implied, so overlapping
+    and nested terms are all reported.
+    """
+
+    def __init__(self, term_sets, whole_words=False):
+        if not isinstance(term_sets, dict):
+            term_sets = {None: term_sets}
+        self.whole_words = whole_words
+        self.term_sets = {
+            name: [t.lower() for t in terms if t] for name, terms in term_sets.items()
+        }
+        self.terms = list(dict.fromkeys(t for terms in self.term_sets.values() for t in terms))
+
+        self._pattern = None
+        if self.terms:
+            boundary = r"\b" if whole_words else ""
+            self._pattern = re.compile(rf"{boundary}(?=({_trie_pattern(self.terms)}){boundary})")
+
+        # Shorter terms matched implicitly wherever a longer term matches
+        self._implied = {
+            term: [
+                p for p in self.terms
+                if len(p) < len(term) and term.startswith(p)
+                and (not whole_words or _is_word_char(term[len(p) - 1]) != _is_word_char(term[len(p)]))
+            ]
+            for term in self.terms
+        }
+
+    def find(self, text):
+        """Set of all terms occurring in ``text``"""
+        found = set()
+        if self._pattern is None or not text:
+            return found
+        for match in self._pattern.finditer(text.lower()):
+            term = match.group(1)
+            if term not in found:
+                found.add(term)
+                found.update(self._implied[term])
+        return found
+
+    def scan(self, text):
+        """Terms found per set, each list in the order the set was given"""
+        found = self.find(text)
+        return {name: [t for t in terms if t in found] for name, terms in self.term_sets.items()}
@@ -0,0 +1,102 @@
+import base64
+import binascii
+import logging
+from collections import defaultdict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PostingIndex:
+    """Inverted index from (dimension, value) to sorted arrays of row positions
+
+    Built once per dataset version: rows are registered with ``add`` and
+    ``freeze`` turns each posting list into a sorted, de-duplicated int64
+    array. ``select`` unions the lists of the requested values within a
+    dimension and intersects across dimensions.
+    """
+
+    def __init__(self):
+        self._lists = defaultdict(lambda: defaultdict(list))
+        self.postings = {}
+        self.size = 0
+
+    def add(self, dimension, value, position):
+        self._lists[dimension][value].append(position)
+
+    def freeze(self, size):
+        self.size = size
+        self.postings = {
+            dimension: {
+                value: np.unique(np.asarray(positions, dtype=np.int64))
+                for value, positions in values.items()
+            }
+            for dimension, values in self._lists.items()
+        }
+        self._lists = None
+        return self
+
+    def values(self, dimension):
+        return sorted(self.postings.get(dimension, {}))
+
+    def select(self, filters):
+        """Sorted positions matching every dimension in ``filters``
+
+        ``filters`` maps a dimension to a list of accepted values; an empty
+        mapping selects every row.
+        """
+        result = None
+        for dimension, values in filters.items():
+            lists = self.postings.get(dimension, {})
+            matched = [lists[v] for v in values if v in lists]
+            if not matched:
+                return np.empty(0, dtype=np.int64)
+            positions = matched[0] if len(matched) == 1 else np.unique(np.concatenate(matched))
+            result = positions if result is None else np.intersect1d(result, positions, assume_unique=True)
+            if len(result) == 0:
+                break
+        if result is None:
+            return np.arange(self.size, dtype=np.int64)
+        return result
+
+    def stats(self):
+        return {
+            "rows": self.size,
+            "dimensions": {d: len(v) for d, v in self.postings.items()},
+            "entries": int(sum(len(p) for v in self.postings.values() for p in v.values())),
+        }
+
+
+def encode_cursor(version, position):
+    """Opaque pagination cursor: the dataset version and the last position served"""
+    return base64.urlsafe_b64encode(f"{version}:{position}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, version):
+    """Return the last position encoded in ``cursor``
+
+    Raises ValueError when the cursor is malformed or was issued for a
+    different dataset version, since positions are not stable across
+    versions.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_version, position = base64.urlsafe_b64decode(padded).decode("utf-8").rsplit(":", 1)
+        position = int(position)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor") from None
+    if cursor_version != version:
+        raise ValueError("Cursor was issued for a different version of the data")
+    return position
+
+
+def page(positions, cursor_position, limit):
+    """Slice sorted ``positions`` to the page after ``cursor_position``
+
+    Returns (page positions, last position or None when exhausted).
+    """
+    start = 0 if cursor_position is None else int(np.searchsorted(positions, cursor_position, side="right"))
+    selected = positions[start:start + limit]
+    has_more = start + limit < len(positions)
+    return selected, (int(selected[-1]) if has_more and len(selected) else None)
@@ -0,0 +1,156 @@
+import copy
+import logging
+
+import numpy as np
+from flask import current_app
+
+from app.core.dataset import store
+from app.core.embeddings import embedding_store
+from app.core.events import event_index
+
+logger = logging.getLogger(__name__)
+
+
+class SimilarityEngine:
+    """Entity x entity similarity of message-embedding centroids
+
+    An entity's centroid is the mean of the unit-normalized embeddings of
+    the messages it sent; two entities writing about the same things in the
+    same way (a person and their pseudonym) get a high cosine similarity.
+    The full matrix is a single ``C @ C.T`` product. New messages only move
+    their senders' centroids, so ``extended`` recomputes just those rows
+    and columns, O(changed entities x entities x dim), in a copy. The new
+    messages are encoded before anything is copied, while readers keep
+    using this engine (``DatasetStore.append`` holds no read lock then).
+    """
+
+    def __init__(self, index, embed):
+        self.index = index
+        self.embed = embed
+        self.sums = np.zeros((0, 0), dtype=np.float32)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.similarity = np.zeros((0, 0), dtype=np.float32)
+        self._seen = 0
+        self._consume(*self._encode_new())
+
+    @property
+    def entity_ids(self):
+        return self.index.entity_ids[:len(self.counts)]
+
+    def _grow(self, n_entities, dim):
+        """Pad the per-entity arrays to ``n_entities`` rows (and ``dim`` columns)"""
+        old, old_dim = self.sums.shape
+        dim = max(dim, old_dim)
+        if (n_entities, dim) == (old, old_dim):
+            return
+        sums = np.zeros((n_entities, dim), dtype=np.float32)
+        sums[:old, :old_dim] = self.sums
+        centroids = np.zeros((n_entities, dim), dtype=np.float32)
+        centroids[:old, :old_dim] = self.centroids
+        similarity = np.zeros((n_entities, n_entities), dtype=np.float32)
+        similarity[:old, :old] = self.similarity
+        counts = np.zeros(n_entities, dtype=np.int64)
+        counts[:old] = self.counts
+        self.sums, self.centroids, self.similarity, self.counts = sums, centroids, similarity, counts
+
+    def _encode_new(self):
+        """(rows, unit vectors) of the sent messages of ``index`` not consumed yet"""
+        index = self.index
+        rows = np.arange(self._seen, len(index))
+        has_content = np.diff(index.text_offsets)[rows] > 0
+        rows = rows[(index.sender[rows] >= 0) & has_content]
+
+        vectors = np.zeros((0, self.sums.shape[1]), dtype=np.float32)
+        if len(rows):
+            vectors = np.asarray(self.embed([index.text(r) for r in rows]), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1)
+        return rows, vectors
+
+    def _consume(self, rows, vectors):
+        index = self.index
+        self._seen = len(index)
+        first_build = self.similarity.size == 0
+        self._grow(len(index.entity_ids), vectors.shape[1])
+        if not len(rows):
+            return
+
+        senders = index.sender[rows]
+        np.add.at(self.sums, senders, vectors)
+        np.add.at(self.counts, senders, 1)
+        changed = np.unique(senders)
+        norms = np.linalg.norm(self.sums[changed], axis=1, keepdims=True)
+        self.centroids[changed] = self.sums[changed] / np.where(norms > 0, norms, 1)
+
+        if first_build:
+            self.similarity = self.centroids @ self.centroids.T
+        else:
+            block = self.centroids[changed] @ self.centroids.T
+            self.similarity[changed, :] = block
+            self.similarity[:, changed] = block.T
+        logger.info(f"Updated similarity of {len(changed)} entities from {len(rows)} messages")
+
+    def extended(self, delta):
+        # The message index is extended first and already holds the new rows
+        engine = copy.copy(self)
+        engine.index = delta.current(self.index)
+        encoded = engine._encode_new()
+        for name in ("sums", "counts", "centroids", "similarity"):
+            setattr(engine, name, getattr(self, name).copy())
+        engine._consume(*encoded)
+        return engine
+
+    def stats(self):
+        return {
+            "entities": len(self.counts),
+            "messages": int(self.counts.sum()),
+            "dim": self.sums.shape[1],
+        }
+
+
+def similarity_engine(comm_file):
+    """The pseudonym similarity engine of a message list, kept current as messages arrive
+
+    None when it cannot be built (the sentence encoder is optional); that
+    outcome is cached like the engine, so it is only retried once the file
+    changes.
+    """
+
+    def build(data):
+        try:
+            return SimilarityEngine(event_index(path=comm_file), embedding_store().embed)
+        except Exception as e:
+            logger.warning(f"Entity similarity engine unavailable, using the CSV: {str(e)}")
+            return None
+
+    return store.derive(comm_file, "pseudonyms", build)
+
+
+_csv_cache = {}
+
+
+def _similarity_csv(csv_path):
+    """(entities, matrix) of a precomputed similarity CSV, parsed once per file version"""
+    import pandas as pd
+
+    signature = store.signature(csv_path)
+    cached = _csv_cache.get(csv_path)
+    if cached is None or cached[0] != signature:
+        df = pd.read_csv(csv_path, index_col=0)
+        cached = _csv_cache[csv_path] = (signature, df.index.tolist(), df.values.astype(np.float32))
+    return cached[1], cached[2]
+
+
+def similarity_matrix():
+    """(entities, matrix, source) of the entity similarity heatmap
+
+    The matrix comes from the embedding engine over the configured message
+    file; without a sentence encoder it is the precomputed
+    ``HEATMAP_SIMILARITY_FILE``.
+    """
+    engine = similarity_engine(current_app.config["COMMUNICATION_FILE"])
+    if engine is not None:
+        return list(engine.entity_ids), engine.similarity, "embeddings"
+    entities, matrix = _similarity_csv(current_app.config["HEATMAP_SIMILARITY_FILE"])
+    return entities, matrix, "csv"
@@ -0,0 +1,71 @@
+import ast
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+METADATA_FIELDS = ("NAME", "TITLE", "DESCRIPTION")
+
+
+def read_metadata(path):
+    """Read the module-level NAME/TITLE/DESCRIPTION constants without importing the module"""
+    with open(path, "r") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    metadata = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        for target in node.targets:
+            if isinstance(target, ast.Name) and target.id in METADATA_FIELDS:
+                try:
+                    metadata[target.id] = ast.literal_eval(node.value)
+                except ValueError:
+                    pass
+    return metadata
+
+
+class VisualizationRegistry:
+    """Metadata of the visualization modules, read from source and cached by mtime
+
+    Lets the index page list every visualization without importing the
+    modules (and their heavy dependencies).
+    """
+
+    def __init__(self, viz_dir):
+        self.viz_dir = viz_dir
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def metadata(self, viz_name):
+        path = os.path.join(self.viz_dir, f"{viz_name}.py")
+        defaults = {
+            "name": viz_name,
+            "title": viz_name.replace("_", " ").title(),
+            "description": f"Visualization for {viz_name}",
+        }
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return defaults
+
+        with self._lock:
+            cached = self._cache.get(viz_name)
+            if cached is not None and cached[0] == mtime:
+                return dict(cached[1])
+
+        try:
+            fields = read_metadata(path)
+        except (OSError, SyntaxError) as e:
+            logger.warning(f"Could not read metadata of {viz_name}: {e}")
+            return defaults
+
+        info = {
+            "name": viz_name,
+            "title": fields.get("TITLE", defaults["title"]),
+            "description": fields.get("DESCRIPTION", defaults["description"]),
+        }
+        with self._lock:
+            self._cache[viz_name] = (mtime, info)
+        return dict(info)
@@ -0,0 +1,163 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Request parameters consumed by the shaping layer, never passed to get_data
+SHAPING_PARAMS = ("fields", "normalize")
+
+
+def split_shaping_params(params):
+    """Separate the shaping parameters from the ones meant for ``get_data``"""
+    data_params = {k: v for k, v in params.items() if k not in SHAPING_PARAMS}
+    shaping = {k: v for k, v in params.items() if k in SHAPING_PARAMS}
+    return data_params, shaping
+
+
+def _field_tree(paths):
+    tree = {}
+    for path in paths:
+        node = tree
+        for part in path.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def parse_fields(value):
+    """Parse a ``fields`` projection into (include tree, exclude tree)
+
+    ``fields`` is a comma-separated list of dotted paths, e.g.
+    ``events.id,events.sub_type,filter_options``; paths prefixed with ``-``
+    are removed instead (``-messages.content``). Lists are transparent, so
+    a path applies to every element. An empty include tree keeps everything.
+    """
+    if isinstance(value, (list, tuple)):
+        paths = [str(v).strip() for v in value]
+    else:
+        paths = [p.strip() for p in str(value or "").split(",")]
+    include = _field_tree(p for p in paths if p and not p.startswith("-"))
+    exclude = _field_tree(p[1:] for p in paths if p.startswith("-") and len(p) > 1)
+    return include, exclude
+
+
+def _dicts(data):
+    """The dicts at this level of ``data``, looking through lists"""
+    if isinstance(data, list):
+        return [d for item in data for d in _dicts(item)]
+    return [data] if isinstance(data, dict) else []
+
+
+def unknown_fields(data, tree, prefix=""):
+    """Dotted paths of a field tree that match no key of ``data``
+
+    A level without any dict (e.g. an empty list of events) cannot tell a
+    misspelled field from a missing one, so nothing below it is reported.
+    """
+    dicts = _dicts(data)
+    if not dicts:
+        return []
+    unknown = []
+    for name, sub in tree.items():
+        children = [d[name] for d in dicts if name in d]
+        if not children:
+            unknown.append(f"{prefix}{name}")
+        elif sub:
+            unknown.extend(unknown_fields(children, sub, f"{prefix}{name}."))
+    return unknown
+
+
+def project(data, include, exclude, memo=None):
+    """Copy of ``data`` restricted to the ``include`` tree minus ``exclude``
+
+    The same source object projected at the same path yields the same copy,
+    so shared nodes stay shared for ``normalize``.
+    """
+    if not include and not exclude:
+        return data
+    if memo is None:
+        memo = {}
+
+    if isinstance(data, list):
+        return [project(item, include, exclude, memo) for item in data]
+    if not isinstance(data, dict):
+        return data
+
+    key = (id(data), id(include), id(exclude))
+    if key in memo:
+        return memo[key]
+
+    result = {}
+    for name, value in data.items():
+        if include and name not in include:
+            continue
+        sub_exclude = exclude.get(name, {}) if exclude else {}
+        if name in exclude and not sub_exclude:
+            continue
+        sub_include = include.get(name, {}) if include else {}
+        result[name] = project(value, sub_include, sub_exclude, memo)
+    memo[key] = result
+    return result
+
+
+def normalize(data, references):
+    """Replace repeated objects by indexes into shared tables
+
+    ``references`` maps a key (e.g. ``"raw"``) to a table name (e.g.
+    ``"nodes"``); every dict value stored under that key is moved to
+    ``data["tables"][table]`` once and replaced by its position there.
+    Containers on the way are copied, the input is left untouched.
+    """
+    tables = {name: [] for name in references.values()}
+    positions = {}
+
+    def intern(table, obj):
+        key = (table, id(obj))
+        if key not in positions:
+            positions[key] = len(tables[table])
+            tables[table].append(obj)
+        return positions[key]
+
+    def walk(value):
+        if isinstance(value, list):
+            return [walk(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        result = {}
+        for name, item in value.items():
+            if name in references and isinstance(item, dict):
+                result[name] = intern(references[name], item)
+            else:
+                result[name] = walk(item)
+        return result
+
+    shaped = walk(data)
+    if isinstance(shaped, dict):
+        shaped["tables"] = tables
+    return shaped
+
+
+def _enabled(value):
+    return str(value).lower() not in ("0", "false", "no", "off")
+
+
+def shape_response(module, data, shaping=None):
+    """Apply projection and normalization to a ``get_data`` result
+
+    Modules opt into normalization by declaring ``NORMALIZE``, a mapping of
+    payload keys to table names; ``normalize=false`` returns embedded copies
+    instead. Error payloads are returned unchanged. Raises ValueError for
+    ``fields`` paths that match nothing in the payload.
+    """
+    shaping = shaping or {}
+    if not isinstance(data, dict) or data.get("error"):
+        return data
+
+    include, exclude = parse_fields(shaping.get("fields", ""))
+    unknown = unknown_fields(data, include) + unknown_fields(data, exclude)
+    if unknown:
+        raise ValueError(f"Unknown field: {', '.join(unknown)}")
+    shaped = project(data, include, exclude)
+
+    references = getattr(module, "NORMALIZE", None)
+    if references and _enabled(shaping.get("normalize", "true")):
+        shaped = normalize(shaped, references)
+    return shaped
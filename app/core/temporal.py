@@ -0,0 +1,284 @@
+import copy
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.core.dataset import store
+from app.core.events import event_index
+
+logger = logging.getLogger(__name__)
+
+SLOT_MINUTES = (60, 15)
+
+CUBE_AXES = ("sender", "receiver", "day", "slot")
+
+# Roll-up axis counting each message once for every entity taking part in it
+ENTITY_AXIS = "entity"
+
+_EPOCH_DAY = date(1970, 1, 1)
+
+
+class TemporalCube:
+    """Dense message counts indexed by (sender, receiver, day, time slot)
+
+    ``counts[s, r, d, t]`` is the number of ``Communication`` events with a
+    valid timestamp sent by entity ``s`` to entity ``r`` on day ``d`` in the
+    ``t``-th slot of ``slot_minutes`` of that day. Entities follow the event
+    index; the last receiver position holds messages without a receiver. A
+    message to several receivers is counted once per receiver, so
+    ``sent[s, d, t]`` counts the messages themselves, once per sender.
+    Message lists have one row per receiver: rows sharing an event id are
+    one message. Days run from the first to the last message day, empty
+    days included.
+
+    Views are slices and sums of the arrays (see ``rollup``). Messages
+    appended to the data file are counted in a copy made by ``extended``;
+    the arrays grow when new entities or days appear.
+    """
+
+    def __init__(self, index, slot_minutes=60):
+        if slot_minutes not in SLOT_MINUTES:
+            raise ValueError(f"slot_minutes must be one of {', '.join(map(str, SLOT_MINUTES))}")
+        self.index = index
+        self.slot_minutes = slot_minutes
+        self.slots = 1440 // slot_minutes
+        self.first_day = 0
+        self.counts = np.zeros((0, 1, 0, self.slots), dtype=np.int32)
+        self.sent = np.zeros((0, 0, self.slots), dtype=np.int32)
+        self._seen = 0
+        self._consume()
+
+    @property
+    def n_entities(self):
+        return self.counts.shape[0]
+
+    @property
+    def n_days(self):
+        return self.counts.shape[2]
+
+    def _cells(self, start, stop):
+        """(row, sender, receiver, day, slot) of every message/receiver pair of rows ``start:stop``"""
+        index = self.index
+        rows = np.arange(start, stop)
+        n_recv = np.diff(index.recv_ptr)[start:stop]
+        # Messages without receivers keep one pair, with receiver -1
+        per_row = np.maximum(n_recv, 1)
+        pair_row = np.repeat(rows, per_row)
+        receiver = np.full(len(pair_row), -1, dtype=np.int64)
+        slot_start = np.repeat(np.cumsum(per_row) - per_row, n_recv)
+        row_start = np.repeat(np.cumsum(n_recv) - n_recv, n_recv)
+        receiver[slot_start + np.arange(len(slot_start)) - row_start] = (
+            index.recv_idx[index.recv_ptr[start]:index.recv_ptr[stop]]
+        )
+
+        keep = (
+            index.sub_type_mask("Communication")[pair_row]
+            & index.valid[pair_row]
+            & (index.sender[pair_row] >= 0)
+        )
+        pair_row, receiver = pair_row[keep], receiver[keep]
+        slot = index.minute_of_day[pair_row].astype(np.int64) // self.slot_minutes
+        return (
+            pair_row,
+            index.sender[pair_row].astype(np.int64),
+            receiver,
+            index.day_number[pair_row].astype(np.int64),
+            slot,
+        )
+
+    def _first_pairs(self, rows):
+        """Positions of the first pair of each message among the pairs of ``rows``"""
+        ids = np.array([self.index.ids[r] for r in rows.tolist()], dtype=object)
+        return np.sort(np.unique(ids, return_index=True)[1]) if len(ids) else np.zeros(0, dtype=np.int64)
+
+    def _grow(self, n_entities, first_day, n_days):
+        """Resize the cube, keeping existing counts (and the no-receiver column last)"""
+        old = self.counts
+        e0, d0 = old.shape[0], old.shape[2]
+        counts = np.zeros((n_entities, n_entities + 1, n_days, self.slots), dtype=np.int32)
+        sent = np.zeros((n_entities, n_days, self.slots), dtype=np.int32)
+        if d0:
+            shift = self.first_day - first_day
+            counts[:e0, :e0, shift:shift + d0] = old[:, :e0]
+            counts[:e0, n_entities, shift:shift + d0] = old[:, e0]
+            sent[:e0, shift:shift + d0] = self.sent
+        self.counts, self.sent, self.first_day = counts, sent, first_day
+
+    def _consume(self):
+        """Count the rows added to the event index since the last call"""
+        rows, senders, receivers, days, slots = self._cells(self._seen, len(self.index))
+        self._seen = len(self.index)
+
+        n_entities = len(self.index.entity_ids)
+        first_day, last_day = self.first_day, self.first_day + self.n_days - 1
+        if len(days):
+            if not self.n_days:
+                first_day, last_day = int(days.min()), int(days.max())
+            else:
+                first_day, last_day = min(first_day, int(days.min())), max(last_day, int(days.max()))
+        n_days = max(last_day - first_day + 1, 0)
+        if (n_entities, n_days) != (self.n_entities, self.n_days) or first_day != self.first_day:
+            self._grow(n_entities, first_day, n_days)
+        if not len(days):
+            return
+
+        receivers = np.where(receivers < 0, n_entities, receivers)
+        flat = np.ravel_multi_index((senders, receivers, days - self.first_day, slots), self.counts.shape)
+        cells, counts = np.unique(flat, return_counts=True)
+        self.counts.reshape(-1)[cells] += counts.astype(np.int32)
+
+        # New rows carry new event ids, so messages never span two batches
+        first = self._first_pairs(rows)
+        flat = np.ravel_multi_index((senders[first], days[first] - self.first_day, slots[first]), self.sent.shape)
+        cells, counts = np.unique(flat, return_counts=True)
+        self.sent.reshape(-1)[cells] += counts.astype(np.int32)
+
+    def extended(self, delta):
+        # The message index is extended first and already holds the new rows
+        cube = copy.copy(self)
+        cube.index = delta.current(self.index)
+        cube.counts, cube.sent = self.counts.copy(), self.sent.copy()
+        cube._consume()
+        return cube
+
+    # -- labels ----------------------------------------------------------
+
+    def day_labels(self):
+        return [(_EPOCH_DAY + timedelta(days=self.first_day + d)).isoformat() for d in range(self.n_days)]
+
+    def slot_labels(self):
+        return [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, 1440, self.slot_minutes)]
+
+    def day_range(self, value):
+        """(start, stop) day positions of an ISO ``first:last`` date range, both ends included
+
+        Either bound may be left out; a single date selects that day.
+        """
+        if value in (None, ""):
+            return 0, self.n_days
+        parts = str(value).split(":")
+        if len(parts) == 1:
+            parts = parts * 2
+        if len(parts) != 2:
+            raise ValueError(f"Expected a first:last date range, got {value!r}")
+        try:
+            bounds = [
+                (date.fromisoformat(p) - _EPOCH_DAY).days - self.first_day if p else None for p in parts
+            ]
+        except ValueError:
+            raise ValueError(f"Expected ISO dates in {value!r}")
+        start = 0 if bounds[0] is None else bounds[0]
+        stop = self.n_days if bounds[1] is None else bounds[1] + 1
+        start, stop = max(0, min(start, self.n_days)), max(0, min(stop, self.n_days))
+        if stop < start:
+            raise ValueError(f"Empty date range {value!r}")
+        return start, stop
+
+    # -- queries ---------------------------------------------------------
+
+    def rollup(self, keep=("day", "slot"), senders=None, receivers=None, involving=None, days=None):
+        """Counts summed over every axis not in ``keep``, and the labels of the kept axes
+
+        ``keep`` lists axes of ``CUBE_AXES`` in output order, or ``entity``
+        (with ``day``/``slot``) for messages sent or received by each
+        entity, a message counting once for its sender whatever its number
+        of receivers. ``senders``/``receivers`` restrict those axes to entity
+        positions (``-1`` is the no-receiver column), ``involving`` keeps
+        messages sent or received by any of the given entities and
+        ``days`` is a (start, stop) range of day positions.
+        """
+        keep = tuple(keep)
+        unknown = [axis for axis in keep if axis not in CUBE_AXES + (ENTITY_AXIS,)]
+        if unknown or len(set(keep)) != len(keep):
+            raise ValueError(f"keep must list distinct axes of {', '.join(CUBE_AXES + (ENTITY_AXIS,))}")
+        if ENTITY_AXIS in keep and {"sender", "receiver"} & set(keep):
+            raise ValueError("entity cannot be combined with the sender or receiver axes")
+
+        n = self.n_entities
+        sender_pos = np.arange(n) if senders is None else np.asarray(senders, dtype=np.int64)
+        receiver_pos = np.arange(n + 1) if receivers is None else np.asarray(receivers, dtype=np.int64) % (n + 1)
+        days = days or (0, self.n_days)
+
+        cube = self.counts[:, :, days[0]:days[1]]
+        if senders is not None:
+            cube = cube[sender_pos]
+        if receivers is not None:
+            cube = cube[:, receiver_pos]
+        if involving is not None:
+            involving = np.asarray(involving, dtype=np.int64)
+            pairs = np.isin(sender_pos, involving)[:, None] | np.isin(receiver_pos, involving)[None, :]
+            cube = cube * pairs[:, :, None, None]
+
+        if ENTITY_AXIS in keep:
+            # Sent plus received, less messages to oneself which are both
+            values = np.zeros((n,) + cube.shape[2:], dtype=np.int64)
+            if receivers is None and involving is None:
+                values[sender_pos] += self.sent[sender_pos, days[0]:days[1]]
+            else:
+                values += self._sent_matching(sender_pos, receiver_pos, involving, days)
+            to_entity = receiver_pos < n
+            values[receiver_pos[to_entity]] += cube.sum(axis=0)[to_entity]
+            s, r = np.nonzero(sender_pos[:, None] == receiver_pos[None, :])
+            values[sender_pos[s]] -= cube[s, r]
+            axes, positions = (ENTITY_AXIS, "day", "slot"), {ENTITY_AXIS: np.arange(n)}
+        else:
+            values, axes = cube, CUBE_AXES
+            positions = {"sender": sender_pos, "receiver": receiver_pos}
+
+        summed = tuple(i for i, axis in enumerate(axes) if axis not in keep)
+        values = values.sum(axis=summed, dtype=np.int64)
+        remaining = [axis for axis in axes if axis in keep]
+        values = values.transpose([remaining.index(axis) for axis in keep])
+
+        ids = self.index.entity_ids
+        labels = {
+            "day": self.day_labels()[days[0]:days[1]],
+            "slot": self.slot_labels(),
+        }
+        for axis, pos in positions.items():
+            labels[axis] = [ids[p] if p < n else None for p in pos.tolist()]
+        return values, {axis: labels[axis] for axis in keep}
+
+    def _sent_matching(self, sender_pos, receiver_pos, involving, days):
+        """(entities x days x slots) messages sent with a pair kept by the rollup filters
+
+        Receiver filters select pairs, so which messages they keep is only
+        known per message: this scans the pairs of every counted row.
+        """
+        n = self.n_entities
+        rows, senders, receivers, day, slot = self._cells(0, self._seen)
+        receivers = np.where(receivers < 0, n, receivers)
+        day = day - self.first_day
+        keep = np.isin(senders, sender_pos) & np.isin(receivers, receiver_pos)
+        keep &= (day >= days[0]) & (day < days[1])
+        if involving is not None:
+            keep &= np.isin(senders, involving) | np.isin(receivers, involving)
+        first = np.flatnonzero(keep)[self._first_pairs(rows[keep])]
+
+        sent = np.zeros((n, days[1] - days[0], self.slots), dtype=np.int64)
+        np.add.at(sent, (senders[first], day[first] - days[0], slot[first]), 1)
+        return sent
+
+    def entity_slots(self):
+        """(entities x slots) counts of the messages each entity sent or received"""
+        return self.rollup(keep=(ENTITY_AXIS, "slot"))[0]
+
+    def stats(self):
+        return {
+            "shape": list(self.counts.shape),
+            "bytes": int(self.counts.nbytes),
+            "messages": int(self.sent.sum()),
+            "first_day": self.day_labels()[0] if self.n_days else None,
+        }
+
+
+def temporal_cube(path, slot_minutes=60):
+    """Temporal cube of a data file, built once per file version and slot size"""
+    if slot_minutes not in SLOT_MINUTES:
+        raise ValueError(f"slot_minutes must be one of {', '.join(map(str, SLOT_MINUTES))}")
+
+    def build(data):
+        return TemporalCube(event_index(path=path), slot_minutes)
+
+    return store.derive(path, f"temporal_cube:{slot_minutes}", build)
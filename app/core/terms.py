@@ -0,0 +1,188 @@
+import copy
+from collections import Counter
+
+import numpy as np
+
+
+def _grow(array, size):
+    """``array`` zero-padded to at least ``size``, doubling its capacity"""
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class TermStatistics:
+    """Document-term counts of a growing corpus
+
+    Documents are analyzed once, when added. The vocabulary keeps terms in
+    order of first occurrence and term and document frequencies are updated
+    per document, so adding documents costs O(new text). ``tfidf`` turns
+    the counts into the matrix ``TfidfVectorizer.fit_transform`` would
+    produce for the same analyzer without re-tokenizing the corpus.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.vocabulary = {}
+        self.terms = []
+        self.doc_cols = []
+        self.doc_counts = []
+        self._term_freq = np.zeros(0, dtype=np.int64)
+        self._doc_freq = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.doc_cols)
+
+    def copy(self):
+        statistics = TermStatistics(self.analyzer)
+        statistics.vocabulary = dict(self.vocabulary)
+        statistics.terms = list(self.terms)
+        statistics.doc_cols = list(self.doc_cols)
+        statistics.doc_counts = list(self.doc_counts)
+        statistics._term_freq = self._term_freq.copy()
+        statistics._doc_freq = self._doc_freq.copy()
+        return statistics
+
+    @property
+    def term_freq(self):
+        return self._term_freq[:len(self.terms)]
+
+    @property
+    def doc_freq(self):
+        return self._doc_freq[:len(self.terms)]
+
+    def add(self, text):
+        counts = {}
+        for feature in self.analyzer(text):
+            col = self.vocabulary.get(feature)
+            if col is None:
+                col = self.vocabulary[feature] = len(self.terms)
+                self.terms.append(feature)
+            counts[col] = counts.get(col, 0) + 1
+
+        cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        self._term_freq = _grow(self._term_freq, len(self.terms))
+        self._doc_freq = _grow(self._doc_freq, len(self.terms))
+        self._term_freq[cols] += values
+        self._doc_freq[cols] += 1
+        self.doc_cols.append(cols)
+        self.doc_counts.append(values)
+
+    def counts(self, docs=None):
+        """(count matrix, term names) over ``docs`` (all documents by default)
+
+        Columns follow the order in which terms first occur in the selected
+        documents, like ``CountVectorizer`` before it sorts its features.
+        """
+        from scipy import sparse
+
+        docs = range(len(self)) if docs is None else docs
+        cols = [self.doc_cols[d] for d in docs]
+        values = [self.doc_counts[d] for d in docs]
+        indptr = np.zeros(len(cols) + 1, dtype=np.int64)
+        np.cumsum([len(c) for c in cols], out=indptr[1:])
+        indices = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        data = np.concatenate(values) if values else np.zeros(0, dtype=np.int64)
+
+        # Renumber the columns in order of first occurrence within the selection
+        used, first = np.unique(indices, return_index=True)
+        used = used[np.argsort(first, kind="stable")]
+        remap = np.empty(len(self.terms), dtype=np.int64)
+        remap[used] = np.arange(len(used))
+
+        matrix = sparse.csr_matrix(
+            (data.astype(np.float64), remap[indices], indptr), shape=(len(cols), len(used))
+        )
+        matrix.sort_indices()
+        return matrix, [self.terms[c] for c in used]
+
+    def tfidf(self, docs=None, max_features=None):
+        """TF-IDF matrix and feature names, as ``TfidfVectorizer`` computes them
+
+        Features are sorted by name and, with ``max_features``, limited to
+        the most frequent ones before inverse document frequencies are fit.
+        """
+        from sklearn.feature_extraction.text import TfidfTransformer
+
+        matrix, names = self.counts(docs)
+        if not names:
+            raise ValueError("empty vocabulary")
+
+        order = sorted(range(len(names)), key=names.__getitem__)
+        map_index = np.empty(len(names), dtype=matrix.indices.dtype)
+        map_index[order] = np.arange(len(names))
+        matrix.indices = map_index.take(matrix.indices, mode="clip")
+        names = [names[i] for i in order]
+
+        if max_features is not None and len(names) > max_features:
+            term_freq = np.asarray(matrix.sum(axis=0)).ravel()
+            kept = np.sort((-term_freq).argsort()[:max_features])
+            matrix = matrix[:, kept]
+            names = [names[i] for i in kept]
+
+        transformer = TfidfTransformer()
+        transformer.fit(matrix)
+        return transformer.transform(matrix, copy=False), names
+
+    def stats(self):
+        return {
+            "documents": len(self),
+            "terms": len(self.terms),
+            "tokens": int(self.term_freq.sum()),
+        }
+
+
+class CommunicationStats:
+    """Term and contact counts over the communications of an event index
+
+    Covers Communication events with a sender and some content. Counts are
+    kept current as events are appended to the index: ``extended`` only
+    reads the rows added since the last update.
+    """
+
+    def __init__(self, index, analyzer):
+        self.index = index
+        self.terms = TermStatistics(analyzer)
+        self.rows = []
+        # (sender id, receiver id) -> number of messages
+        self.contacts = Counter()
+        self._seen = 0
+        self._consume()
+
+    def _consume(self):
+        index = self.index
+        rows = np.arange(self._seen, len(index))
+        if "Communication" in index.sub_type_names:
+            code = index.sub_type_names.index("Communication")
+            has_content = np.diff(index.text_offsets)[rows] > 0
+            rows = rows[(index.sub_type[rows] == code) & (index.sender[rows] >= 0) & has_content]
+        else:
+            rows = rows[:0]
+
+        for row in rows:
+            self.rows.append(int(row))
+            self.terms.add(index.text(row))
+            sender = index.entity_ids[index.sender[row]]
+            for k in index.receivers(row):
+                self.contacts[(sender, index.entity_ids[k])] += 1
+        self._seen = len(index)
+
+    def extended(self, delta):
+        # The event index is extended first and already holds the new rows
+        stats = copy.copy(self)
+        stats.index = delta.current(self.index)
+        stats.terms = self.terms.copy()
+        stats.rows = list(self.rows)
+        stats.contacts = Counter(self.contacts)
+        stats._consume()
+        return stats
+
+    def documents(self, rows):
+        """Document numbers of the given event rows"""
+        return np.flatnonzero(np.isin(np.asarray(self.rows, dtype=np.int64), rows))
+
+    def stats(self):
+        return {**self.terms.stats(), "contact_pairs": len(self.contacts)}
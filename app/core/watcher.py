@@ -0,0 +1,89 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+WATCHED_SUFFIXES = (".json", ".csv", ".jsonl")
+
+
+class DataWatcher:
+    """Poll the data directory and reload when its files change
+
+    A change is acted on once the directory looks the same on two polls in
+    a row, so files still being copied in are not parsed half-written.
+    ``on_change`` then runs in the watcher thread (see ``reload_data`` in
+    the app) and the current dataset snapshot keeps serving requests until
+    it returns.
+    """
+
+    def __init__(self, directory, on_change, interval=2.0):
+        self.directory = directory
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reloads = 0
+        self.failures = 0
+
+    def scan(self):
+        """{file name: (mtime_ns, size)} of the watched files"""
+        files = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(WATCHED_SUFFIXES):
+                        st = entry.stat()
+                        files[entry.name] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+        return files
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+            self._thread.start()
+        logger.info(f"Watching {self.directory} for data changes every {self.interval}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        seen = self.scan()
+        pending = None
+        while not self._stop.wait(self.interval):
+            current = self.scan()
+            if current == seen:
+                pending = None
+                continue
+            if current != pending:
+                # Changed since the last poll: wait until it settles
+                pending = current
+                continue
+            try:
+                self.on_change()
+                self.reloads += 1
+            except Exception:
+                self.failures += 1
+                logger.exception("Reloading data failed, keeping the current snapshot")
+            # Retry a failed reload only after the next change
+            seen, pending = current, None
+
+    def stats(self):
+        return {
+            "directory": os.path.basename(self.directory),
+            "running": self.running,
+            "interval": self.interval,
+            "reloads": self.reloads,
+            "failures": self.failures,
+        }
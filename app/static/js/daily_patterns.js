@@ -532,6 +532,10 @@ function init_daily_patterns() {
                 method: currentTopicMethod,
                 num_topics: topicCount
             });
+            // BERTopic ignores the topic count; leaving it out shares one cached/precomputed response
+            if (currentTopicMethod === "bertopic") {
+                params.delete("num_topics");
+            }
 
             // Show loading status
             d3.select(".loading-status").style("display", "block");
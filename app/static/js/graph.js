@@ -61,7 +61,17 @@ function init_graph() {
     });
   // ─────────────────────────────────────────────────────────────────
 
-  d3.json("/data/graph").then(data => {
+  // Each panel's data is a separately cached sub-resource: the three requests
+  // run in parallel and each panel draws as soon as its own data arrives
+  const relationshipsReady = d3.json("/data/graph/relationships");
+  const heatmapReady = d3.json("/data/graph/heatmap");
+
+  d3.json("/data/graph/communication").then(communication => {
+    const data = {
+      communication,
+      relationships: { nodes: [], links: [] },
+      heatmap: { entities: [] }
+    };
     // Shared state
     let selectedNodes = new Set();
     let selectedTypes = new Set();
@@ -101,12 +111,8 @@ function init_graph() {
     // 1) track checkbox state
     let hideEvidence = false;
 
-    // 2) precompute all 'evidence_for' sources
-    const evidenceSources = new Set(
-      data.relationships.links
-        .filter(e => e.type === "evidence_for")
-        .map(e => e.source)
-    );
+    // 2) all 'evidence_for' sources, filled in with the relationship graph
+    let evidenceSources = new Set();
 
     // 3) hook up the checkbox
     d3.select("#hide-evidence-checkbox").on("change", function() {
@@ -114,26 +120,24 @@ function init_graph() {
       updateHighlights();
     });
 
+    // Node positions come precomputed (unit square) with each graph
+    const layoutPad = 40;
+    const place = (layout, i, width) => ({
+      x: layoutPad + layout.x[i] * (width - 2 * layoutPad),
+      y: layoutPad + layout.y[i] * (height - 2 * layoutPad)
+    });
+
     // Communication graph data
-    const commNodes = data.communication.nodes.map(n => ({
+    const commNodes = data.communication.nodes.map((n, i) => ({
       id: n.id,
       type: n.sub_type,
-      is_pseudonym: n.is_pseudonym
+      is_pseudonym: n.is_pseudonym,
+      ...place(data.communication.layout, i, commWidth)
     }));
     const commLinks = data.communication.links.map(e => ({
       id: e.event_id, source: e.source, target: e.target
     }));
 
-    // Relationship graph data
-    const relNodes = data.relationships.nodes.map(n => ({
-      id: n.id,
-      type: n.sub_type,
-      is_pseudonym: n.is_pseudonym
-    }));
-    const relLinks = data.relationships.links.map(e => ({
-      id: e.event_id, source: e.source, target: e.target, type: e.type
-    }));
-
     // Type → color
     const color = d3.scaleOrdinal(d3.schemeCategory10);
     const entityTypeMap = new Map(commNodes.map(d => [d.id, d.type]));
@@ -148,7 +152,9 @@ function init_graph() {
       .force("link", d3.forceLink(commLinks).id(d => d.id).distance(100))
       .force("charge", d3.forceManyBody().strength(-300))
       .force("center", d3.forceCenter(commWidth/2, height/2))
-      .force("collision", d3.forceCollide().radius(30));
+      .force("collision", d3.forceCollide().radius(30))
+      .alpha(0)
+      .stop();  // already laid out; only dragging runs the simulation
 
     const commLinkSel = commG.append("g").attr("class", "links")
       .selectAll("line")
@@ -187,7 +193,7 @@ function init_graph() {
         .attr("font-size", "12px");
 
     // Tick
-    commSim.on("tick", () => {
+    function commTicked() {
       commLinkSel
         .attr("x1", d => d.source.x)
         .attr("y1", d => d.source.y)
@@ -198,7 +204,9 @@ function init_graph() {
       commLabel
         .attr("x", d => d.x)
         .attr("y", d => d.y);
-    });
+    }
+    commSim.on("tick", commTicked);
+    commTicked();
 
     // Zoom
     commSvg.call(d3.zoom().on("zoom", ev => {
@@ -206,66 +214,89 @@ function init_graph() {
     }));
 
     // ── RELATIONSHIP GRAPH (static) ───────────────────────────────────
-    const relSim = d3.forceSimulation(relNodes)
-      .force("link", d3.forceLink(relLinks).id(d => d.id).distance(80))
-      .force("charge", d3.forceManyBody().strength(-200))
-      .force("center", d3.forceCenter(relWidth/2, height/2))
-      .force("collision", d3.forceCollide().radius(25));
+    let relNode = null, relLabel = null, relLinkSel = null;
+
+    function drawRelationships(relationships) {
+      const relNodes = relationships.nodes.map((n, i) => ({
+        id: n.id,
+        type: n.sub_type,
+        is_pseudonym: n.is_pseudonym,
+        ...place(relationships.layout, i, relWidth)
+      }));
+      const relLinks = relationships.links.map(e => ({
+        id: e.event_id, source: e.source, target: e.target, type: e.type
+      }));
+      evidenceSources = new Set(
+        relationships.links
+          .filter(e => e.type === "evidence_for")
+          .map(e => e.source)
+      );
 
-    const relLinkSel = relG.append("g").attr("class", "links")
-      .selectAll("line")
-      .data(relLinks)
-      .join("line")
-        .attr("stroke", "#666")
-        .attr("stroke-width", 1.5)
-        .attr("marker-end", "url(#arrowhead)")                 // ← add arrow
-        .attr("stroke-dasharray", d =>                        // ← dashed if evidence_for
-          d.type === "evidence_for" ? "4 2" : null
-        );
+      const relSim = d3.forceSimulation(relNodes)
+        .force("link", d3.forceLink(relLinks).id(d => d.id).distance(80))
+        .force("charge", d3.forceManyBody().strength(-200))
+        .force("center", d3.forceCenter(relWidth/2, height/2))
+        .force("collision", d3.forceCollide().radius(25))
+        .alpha(0)
+        .stop();
+
+      relLinkSel = relG.append("g").attr("class", "links")
+        .selectAll("line")
+        .data(relLinks)
+        .join("line")
+          .attr("stroke", "#666")
+          .attr("stroke-width", 1.5)
+          .attr("marker-end", "url(#arrowhead)")                 // ← add arrow
+          .attr("stroke-dasharray", d =>                        // ← dashed if evidence_for
+            d.type === "evidence_for" ? "4 2" : null
+          );
 
-    const relNode = relG.append("g").attr("class", "nodes")
-      .selectAll("path")
-      .data(relNodes)
-      .join("path")
-        .attr("d", d => d3.symbol()
-                         .type(d.is_pseudonym ? d3.symbolStar : d3.symbolCircle)
-                         .size(80)()
-        )
-        .attr("fill", d => color(d.type))
-        .attr("stroke", "#333")
-        .attr("stroke-width", 1.5)
-        .style("cursor", "grab")
-        .call(d3.drag()
-          .on("start", e => { if (!e.active) relSim.alphaTarget(0.3).restart(); e.subject.fx = e.subject.x; e.subject.fy = e.subject.y; })
-          .on("drag",  e => { e.subject.fx = e.x; e.subject.fy = e.y; })
-          .on("end",   e => { if (!e.active) relSim.alphaTarget(0); e.subject.fx = null; e.subject.fy = null; })
-        );
+      relNode = relG.append("g").attr("class", "nodes")
+        .selectAll("path")
+        .data(relNodes)
+        .join("path")
+          .attr("d", d => d3.symbol()
+                           .type(d.is_pseudonym ? d3.symbolStar : d3.symbolCircle)
+                           .size(80)()
+          )
+          .attr("fill", d => color(d.type))
+          .attr("stroke", "#333")
+          .attr("stroke-width", 1.5)
+          .style("cursor", "grab")
+          .call(d3.drag()
+            .on("start", e => { if (!e.active) relSim.alphaTarget(0.3).restart(); e.subject.fx = e.subject.x; e.subject.fy = e.subject.y; })
+            .on("drag",  e => { e.subject.fx = e.x; e.subject.fy = e.y; })
+            .on("end",   e => { if (!e.active) relSim.alphaTarget(0); e.subject.fx = null; e.subject.fy = null; })
+          );
 
-    const relLabel = relG.append("g").attr("class", "labels")
-      .selectAll("text")
-      .data(relNodes)
-      .join("text")
-        .text(d => d.id)
-        .attr("dx", 12)
-        .attr("dy", 4)
-        .attr("font-size", "11px");
+      relLabel = relG.append("g").attr("class", "labels")
+        .selectAll("text")
+        .data(relNodes)
+        .join("text")
+          .text(d => d.id)
+          .attr("dx", 12)
+          .attr("dy", 4)
+          .attr("font-size", "11px");
 
-    relSim.on("tick", () => {
-      relLinkSel
-        .attr("x1", d => d.source.x)
-        .attr("y1", d => d.source.y)
-        .attr("x2", d => d.target.x)
-        .attr("y2", d => d.target.y);
-      relNode
-        .attr("transform", d => `translate(${d.x},${d.y})`);
-      relLabel
-        .attr("x", d => d.x)
-        .attr("y", d => d.y);
-    });
+      function relTicked() {
+        relLinkSel
+          .attr("x1", d => d.source.x)
+          .attr("y1", d => d.source.y)
+          .attr("x2", d => d.target.x)
+          .attr("y2", d => d.target.y);
+        relNode
+          .attr("transform", d => `translate(${d.x},${d.y})`);
+        relLabel
+          .attr("x", d => d.x)
+          .attr("y", d => d.y);
+      }
+      relSim.on("tick", relTicked);
+      relTicked();
 
-    relSvg.call(d3.zoom().on("zoom", ev => {
-      relG.attr("transform", ev.transform);
-    }));
+      relSvg.call(d3.zoom().on("zoom", ev => {
+        relG.attr("transform", ev.transform);
+      }));
+    }
 
     // ── Interactive Type Legend on Communication ──────────────────────
     const types = Array.from(new Set(commNodes.map(d => d.type)));
@@ -436,6 +467,8 @@ function init_graph() {
         commLinkSel.attr("opacity", 0.6);
       }
          
+      if (!relNode) return;  // relationship graph not loaded yet
+
       // ── REL GRAPH: show selected, their neighbors, AND neighbors-of-neighbors ──
       if (selectedNodes.size) {
         // build twoHop set (selected + neighbors + neighbors‐of‐neighbors)
@@ -554,21 +587,72 @@ function init_graph() {
       renderHeatmap();
     });
 
+    // Heatmap tiles: the matrix is fetched in float16 blocks, only those rendered
+    const HEATMAP_TILE = 64;
+    const heatmapTiles = new Map(),   // key -> pending fetch
+          heatmapLoaded = new Map();  // key -> { width, values }
+
+    function halfToFloat(h) {
+      const sign = (h & 0x8000) ? -1 : 1,
+            exp  = (h >> 10) & 0x1f,
+            frac = h & 0x3ff;
+      if (exp === 0)  return sign * Math.pow(2, -14) * (frac / 1024);
+      if (exp === 31) return frac ? NaN : sign * Infinity;
+      return sign * Math.pow(2, exp - 15) * (1 + frac / 1024);
+    }
+
+    function loadHeatmapTiles(indices) {
+      const blocks = Array.from(new Set(indices.map(i => Math.floor(i / HEATMAP_TILE))));
+      const n = data.heatmap.entities.length;
+      const requests = [];
+      blocks.forEach(r => blocks.forEach(c => {
+        const key = `${r}:${c}`;
+        if (heatmapTiles.has(key)) { requests.push(heatmapTiles.get(key)); return; }
+        const rows = `${r*HEATMAP_TILE}:${Math.min(n, (r+1)*HEATMAP_TILE)}`,
+              cols = `${c*HEATMAP_TILE}:${Math.min(n, (c+1)*HEATMAP_TILE)}`;
+        const tile = fetch(`/data/graph/heatmap/tiles?rows=${rows}&cols=${cols}&dtype=float16`)
+          .then(res => {
+            if (!res.ok) throw new Error(`heatmap tile ${key}: HTTP ${res.status}`);
+            const width = +res.headers.get("X-Heatmap-Shape").split(",")[1];
+            return res.arrayBuffer().then(buf => {
+              const half = new Uint16Array(buf);
+              const values = new Float32Array(half.length);
+              for (let k = 0; k < half.length; k++) values[k] = halfToFloat(half[k]);
+              heatmapLoaded.set(key, { width, values });
+            });
+          })
+          .catch(err => { heatmapTiles.delete(key); throw err; });
+        heatmapTiles.set(key, tile);
+        requests.push(tile);
+      }));
+      return Promise.all(requests);
+    }
+
+    function heatmapValue(i, j) {
+      const t = heatmapLoaded.get(`${Math.floor(i/HEATMAP_TILE)}:${Math.floor(j/HEATMAP_TILE)}`);
+      return t.values[(i % HEATMAP_TILE) * t.width + (j % HEATMAP_TILE)];
+    }
+
     // Heatmap rendering
     function renderHeatmap() {
       const hm = data.heatmap;
-      let ents = hm.entities.slice(),
-          mat  = hm.matrix.map(r=>r.slice());
+      if (!hm.entities.length) return;  // heatmap not loaded yet
+      let keep = hm.entities.map((e,i)=>i);
 
       // filter rows & cols by type
       if (selectedTypes.size) {
-        const keep = ents
-          .map((e,i)=> selectedTypes.has(entityTypeMap.get(e))? i : -1 )
-          .filter(i=>i>=0);
-        ents = keep.map(i=>hm.entities[i]);
-        mat  = keep.map(i=> keep.map(j=>hm.matrix[i][j]) );
+        keep = keep.filter(i => selectedTypes.has(entityTypeMap.get(hm.entities[i])));
       }
 
+      loadHeatmapTiles(keep)
+        .then(() => drawHeatmap(
+          keep.map(i => hm.entities[i]),
+          keep.map(i => keep.map(j => heatmapValue(i, j)))
+        ))
+        .catch(err => console.error("Error loading heatmap:", err));
+    }
+
+    function drawHeatmap(ents, mat) {
       // size
       const panel = document.getElementById("heatmap-container"),
             W = Math.min(panel.clientWidth, 600);
@@ -670,5 +754,16 @@ function init_graph() {
     updateHighlights();
     renderHeatmap();
 
+    relationshipsReady.then(relationships => {
+      data.relationships = relationships;
+      drawRelationships(relationships);
+      updateHighlights();
+    }).catch(err=>console.error("Error loading relationship graph:",err));
+
+    heatmapReady.then(heatmap => {
+      data.heatmap = heatmap;
+      renderHeatmap();
+    }).catch(err=>console.error("Error loading heatmap:",err));
+
   }).catch(err=>console.error("Error loading graph data:",err));
 }
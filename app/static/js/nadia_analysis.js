@@ -10,8 +10,10 @@ function init_nadia_analysis() {
     // Initialize tab switching
     initTabSwitching();
     
-    // Load data from Flask endpoint
-    d3.json("/data/nadia_analysis")
+    // Load data from Flask endpoint; ?entity=... on the page profiles another entity
+    const entity = new URLSearchParams(window.location.search).get("entity");
+    const url = entity ? `/data/nadia_analysis?entity=${encodeURIComponent(entity)}` : "/data/nadia_analysis";
+    d3.json(url)
         .then(data => {
             if (data.error) {
                 showError(data.error);
@@ -361,7 +363,13 @@ function init_nadia_analysis() {
                 .attr("viewBox", [0, 0, width, height]);
             
             // Make a copy of the data to avoid mutating the original
-            const nodes = networkData.nodes.map(d => ({...d}));
+            // Positions are precomputed by the server (unit square)
+            const layout = networkData.layout;
+            const nodes = networkData.nodes.map((d, i) => layout ? {
+                ...d,
+                x: 30 + layout.x[i] * (width - 60),
+                y: 30 + layout.y[i] * (height - 60)
+            } : {...d});
             const links = networkData.links.map(d => ({...d}));
             
             const simulation = d3.forceSimulation(nodes)
@@ -369,6 +377,7 @@ function init_nadia_analysis() {
                 .force("charge", d3.forceManyBody().strength(-200))
                 .force("center", d3.forceCenter(width / 2, height / 2))
                 .force("collision", d3.forceCollide().radius(20));
+            if (layout) simulation.alpha(0).stop();
             
             // Links
             const link = svg.append("g")
@@ -414,7 +423,7 @@ function init_nadia_analysis() {
             node.append("title")
                 .text(d => `${d.name || d.id} (${d.type || 'Unknown'})\n${d.communication_count || 0} communications`);
             
-            simulation.on("tick", () => {
+            function ticked() {
                 link
                     .attr("x1", d => d.source.x)
                     .attr("y1", d => d.source.y)
@@ -428,7 +437,9 @@ function init_nadia_analysis() {
                 label
                     .attr("x", d => d.x)
                     .attr("y", d => d.y);
-            });
+            }
+            simulation.on("tick", ticked);
+            ticked();
             
             function dragstarted(event) {
                 if (!event.active) simulation.alphaTarget(0.3).restart();
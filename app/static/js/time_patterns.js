@@ -1,7 +1,8 @@
 // Global variables to store data and filters
-let allEvents = [];
-let filteredEvents = [];
 let filterOptions = {};
+let totalEvents = 0;
+let hourlyTotals = [];
+let typeTotals = {};
 let currentFilters = {
     eventTypes: [],
     sourceTypes: [],
@@ -15,6 +16,9 @@ let currentFilters = {
 const PAGE_SIZE = 10;
 let currentPage = 1;
 let totalPages = 1;
+// Pages fetched so far for the current filters, and the cursor that follows each one
+let pageCache = {};
+let pageCursors = [null];
 
 function init_time_patterns() {
     // Clear previous visualizations
@@ -27,14 +31,13 @@ function init_time_patterns() {
     d3.select("#hourly-chart").html('<div class="visualization-loading">Loading data...</div>');
     d3.select("#heatmap").html('<div class="visualization-loading">Loading data...</div>');
 
-    // Fetch data from Flask endpoint
-    d3.json("/data/time_patterns").then(data => {
+    // Fetch the first page; filter options come with it
+    fetchEvents({}).then(data => {
         if (data.error) {
             showError(data.error);
             return;
         }
 
-        allEvents = data.events;
         filterOptions = data.filter_options || {};
 
         // Initialize filter controls
@@ -48,6 +51,52 @@ function init_time_patterns() {
     });
 }
 
+function eventsUrl(filters, cursor) {
+    // Filtering and pagination run on the server
+    const params = new URLSearchParams();
+    const paramNames = {
+        eventTypes: 'event_type',
+        sourceTypes: 'source_type',
+        targetTypes: 'target_type',
+        sourceEntities: 'source_entity',
+        targetEntities: 'target_entity',
+        dates: 'date'
+    };
+    for (const key in paramNames) {
+        if (filters[key] && filters[key].length > 0) {
+            params.set(paramNames[key], filters[key].join(','));
+        }
+    }
+    params.set('limit', PAGE_SIZE);
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    return `/data/time_patterns?${params.toString()}`;
+}
+
+function fetchEvents(filters, cursor = null) {
+    return d3.json(eventsUrl(filters, cursor)).then(resolveTables);
+}
+
+function resolveTables(data) {
+    // Raw nodes and edges arrive once in shared tables, referenced by index
+    const tables = data.tables;
+    if (!tables || !data.events) {
+        return data;
+    }
+    const node = ref => (typeof ref === 'number' ? tables.nodes[ref] : ref);
+    const edge = ref => (typeof ref === 'number' ? tables.edges[ref] : ref);
+    const resolve = item => Object.assign(item, { raw: node(item.raw), edge: edge(item.edge) });
+
+    data.events.forEach(event => {
+        event.raw = node(event.raw);
+        event.sources.forEach(resolve);
+        event.targets.forEach(resolve);
+        event.evidence.forEach(resolve);
+    });
+    return data;
+}
+
 function showError(message) {
     d3.select("#hourly-chart").html(`<div class="text-red-600 p-4">${message}</div>`);
     d3.select("#heatmap").html(`<div class="text-red-600 p-4">${message}</div>`);
@@ -86,6 +135,32 @@ function initFilters() {
         setTimeout(applyFilters, 50);
     });
 
+    // Add pagination event listeners
+    document.getElementById('prev-page').addEventListener('click', () => {
+        if (currentPage > 1) {
+            goToPage(currentPage - 1);
+        }
+    });
+
+    document.getElementById('next-page').addEventListener('click', () => {
+        if (currentPage < totalPages) {
+            goToPage(currentPage + 1);
+        }
+    });
+
+    // Add modal close listener
+    document.getElementById('close-modal').addEventListener('click', () => {
+        document.getElementById('node-details-modal').classList.add('hidden');
+    });
+
+    // Close modal when clicking outside
+    window.addEventListener('click', (event) => {
+        const modal = document.getElementById('node-details-modal');
+        if (event.target === modal) {
+            modal.classList.add('hidden');
+        }
+    });
+
     // Add clear filter button listeners
     document.querySelectorAll('.clear-filter').forEach(button => {
         button.addEventListener('click', (e) => {
@@ -134,63 +209,46 @@ function applyFilters() {
         dates: getSelectedValues('#date-filter')  // Added date filter
     };
 
-    // Apply filters to events
-    filteredEvents = allEvents.filter(event => {
-        // Event type filter
-        if (currentFilters.eventTypes.length > 0 &&
-            !currentFilters.eventTypes.includes(event.sub_type)) {
-            return false;
-        }
-
-        // Source type filter
-        if (currentFilters.sourceTypes.length > 0) {
-            const sourceTypes = event.sources.map(s => s.sub_type);
-            if (!currentFilters.sourceTypes.some(t => sourceTypes.includes(t))) {
-                return false;
-            }
-        }
-
-        // Target type filter
-        if (currentFilters.targetTypes.length > 0) {
-            const targetTypes = event.targets.map(t => t.sub_type);
-            if (!currentFilters.targetTypes.some(t => targetTypes.includes(t))) {
-                return false;
-            }
+    fetchEvents(currentFilters).then(data => {
+        if (data.error) {
+            showError(data.error);
+            return;
         }
 
-        // Source entity filter
-        if (currentFilters.sourceEntities.length > 0) {
-            const sourceNames = event.sources.map(s => s.name);
-            if (!currentFilters.sourceEntities.some(e => sourceNames.includes(e))) {
-                return false;
-            }
-        }
+        totalEvents = data.total;
+        hourlyTotals = data.hourly_counts || [];
+        typeTotals = data.type_counts || {};
+        pageCache = { 1: data.events };
+        pageCursors = [null, data.next_cursor];
 
-        // Target entity filter
-        if (currentFilters.targetEntities.length > 0) {
-            const targetNames = event.targets.map(t => t.name);
-            if (!currentFilters.targetEntities.some(e => targetNames.includes(e))) {
-                return false;
-            }
-        }
+        // Update event count
+        document.getElementById('event-count').textContent = totalEvents;
 
-        // Date filter (newly added)
-        if (currentFilters.dates.length > 0 &&
-            !currentFilters.dates.includes(event.date)) {
-            return false;
-        }
+        // Reset to first page when filters change
+        currentPage = 1;
 
-        return true;
+        // Recreate visualizations with filtered data
+        createVisualizations();
+    }).catch(error => {
+        showError(`Failed to load data: ${error.message}`);
     });
+}
 
-    // Update event count
-    document.getElementById('event-count').textContent = filteredEvents.length;
-
-    // Reset to first page when filters change
-    currentPage = 1;
-
-    // Recreate visualizations with filtered data
-    createVisualizations();
+async function goToPage(page) {
+    // Cursors only move forward, so walk from the last page fetched
+    let known = Math.max(...Object.keys(pageCache).map(Number).filter(p => p < page));
+    while (!pageCache[page] && pageCursors[known]) {
+        const data = await fetchEvents(currentFilters, pageCursors[known]);
+        if (data.error) {
+            showError(data.error);
+            return;
+        }
+        known++;
+        pageCache[known] = data.events;
+        pageCursors[known] = data.next_cursor;
+    }
+    currentPage = page;
+    populateEventTable();
 }
 
 function getSelectedValues(selector) {
@@ -200,8 +258,8 @@ function getSelectedValues(selector) {
 
 function createVisualizations() {
     // Calculate aggregated data for visualizations
-    const hourlyCounts = calculateHourlyCounts(filteredEvents);
-    const typeCounts = calculateTypeCounts(filteredEvents);
+    const hourlyCounts = calculateHourlyCounts(hourlyTotals);
+    const typeCounts = calculateTypeCounts(typeTotals);
 
     // Create visualizations
     createHourlyChart(hourlyCounts);
@@ -210,50 +268,22 @@ function createVisualizations() {
     populateEventTable();
 }
 
-function calculateHourlyCounts(events) {
-    const counts = Array(24).fill(0);
-
-    events.forEach(event => {
-        if (event.hour >= 0 && event.hour < 24) {
-            counts[event.hour]++;
-        }
-    });
-
-    // Convert to object format
+function calculateHourlyCounts(counts) {
+    // Convert the server's per-hour totals to object format
     const countsObj = {};
-    counts.forEach((count, hour) => {
-        countsObj[hour] = count;
-    });
+    for (let hour = 0; hour < 24; hour++) {
+        countsObj[hour] = counts[hour] || 0;
+    }
 
     return countsObj;
 }
 
-function calculateTypeCounts(events) {
-    const typeCounts = {};
-
-    // Get all event types present in filtered data
-    const eventTypes = [...new Set(events.map(e => e.sub_type))];
-
-    // Initialize with zeros for all hours
-    eventTypes.forEach(type => {
-        typeCounts[type] = Array(24).fill(0);
-    });
-
-    // Count events
-    events.forEach(event => {
-        const type = event.sub_type;
-        const hour = event.hour;
-
-        if (typeCounts[type] && hour >= 0 && hour < 24) {
-            typeCounts[type][hour]++;
-        }
-    });
-
-    // Convert arrays to objects
+function calculateTypeCounts(counts) {
+    // Convert the server's type x hour totals to object format
     const result = {};
-    for (const type in typeCounts) {
+    for (const type in counts) {
         result[type] = {};
-        typeCounts[type].forEach((count, hour) => {
+        counts[type].forEach((count, hour) => {
             result[type][hour] = count;
         });
     }
@@ -488,10 +518,10 @@ function createHeatmap(typeCounts) {
 
 function updatePagination() {
     // Calculate total pages
-    totalPages = Math.ceil(filteredEvents.length / PAGE_SIZE);
+    totalPages = Math.max(1, Math.ceil(totalEvents / PAGE_SIZE));
 
     // Update page info
-    document.getElementById('total-events').textContent = filteredEvents.length;
+    document.getElementById('total-events').textContent = totalEvents;
 
     // Clear page buttons
     const pageButtons = document.getElementById('page-buttons');
@@ -512,17 +542,14 @@ function updatePagination() {
         button.className = `px-3 py-1 border rounded-md ${i === currentPage ? 'bg-blue-500 text-white' : 'bg-white text-gray-700 hover:bg-gray-50'
             }`;
         button.textContent = i;
-        button.addEventListener('click', () => {
-            currentPage = i;
-            populateEventTable();
-        });
+        button.addEventListener('click', () => goToPage(i));
         pageButtons.appendChild(button);
     }
 
     // Update start/end indicators
     const startIdx = (currentPage - 1) * PAGE_SIZE + 1;
-    const endIdx = Math.min(currentPage * PAGE_SIZE, filteredEvents.length);
-    document.getElementById('page-start').textContent = startIdx;
+    const endIdx = Math.min(currentPage * PAGE_SIZE, totalEvents);
+    document.getElementById('page-start').textContent = Math.min(startIdx, endIdx);
     document.getElementById('page-end').textContent = endIdx;
 
     // Enable/disable navigation buttons
@@ -534,25 +561,8 @@ function populateEventTable() {
     const table = d3.select("#event-table tbody");
     table.html("");
 
-    // Sort events by date and time
-    const sortedEvents = [...filteredEvents].sort((a, b) => {
-        // Use fallback values if properties are missing
-        const aDate = a.date || '1970-01-01';
-        const bDate = b.date || '1970-01-01';
-        const aTime = a.time || '00:00:00';
-        const bTime = b.time || '00:00:00';
-
-        // Combine date and time for comparison
-        const aDateTime = new Date(`${aDate}T${aTime}`);
-        const bDateTime = new Date(`${bDate}T${bTime}`);
-
-        return aDateTime - bDateTime;
-    });
-
-    // Get events for current page
-    const startIdx = (currentPage - 1) * PAGE_SIZE;
-    const endIdx = Math.min(startIdx + PAGE_SIZE, filteredEvents.length);
-    const pageEvents = sortedEvents.slice(startIdx, endIdx);
+    // Events of the current page, already sorted by date and time on the server
+    const pageEvents = pageCache[currentPage] || [];
 
     const rows = table.selectAll("tr")
         .data(pageEvents)
@@ -607,36 +617,6 @@ function populateEventTable() {
             `<div class="text-xs bg-green-100 rounded px-2 py-1 mb-1">${t.name} (${t.sub_type})</div>`
         ).join(''));
 
-    // Add pagination event listeners
-    document.getElementById('prev-page').addEventListener('click', () => {
-        if (currentPage > 1) {
-            currentPage--;
-            populateEventTable();
-            updatePagination();
-        }
-    });
-
-    document.getElementById('next-page').addEventListener('click', () => {
-        if (currentPage < totalPages) {
-            currentPage++;
-            populateEventTable();
-            updatePagination();
-        }
-    });
-
-    // Add modal close listener
-    document.getElementById('close-modal').addEventListener('click', () => {
-        document.getElementById('node-details-modal').classList.add('hidden');
-    });
-
-    // Close modal when clicking outside
-    window.addEventListener('click', (event) => {
-        const modal = document.getElementById('node-details-modal');
-        if (event.target === modal) {
-            modal.classList.add('hidden');
-        }
-    });
-
     // Update pagination controls
     updatePagination();
 }
@@ -61,15 +61,36 @@ function init_topic_modeling() {
         }
     }
 
+    // BERTopic fits run as background jobs: poll the job until its result is ready
+    function fetchTopicData(url) {
+        if (currentMethod !== "bertopic") {
+            return d3.json(url);
+        }
+        return d3.json(`${url}&async=1`).then(function poll(job) {
+            if (!job.job_id || job.status === "done") {
+                return job.result_url ? d3.json(job.result_url) : job;
+            }
+            if (job.status === "failed") {
+                return { error: job.error };
+            }
+            return new Promise(resolve => setTimeout(resolve, 1000))
+                .then(() => d3.json(job.status_url))
+                .then(status => poll({ ...job, ...status }));
+        });
+    }
+
     function loadTopicData() {
         const isAuto = topicCountAuto.property("checked");
         const topicCount = isAuto ? "auto" : topicCountSlider.property("value");
-        const url = `/data/topic_modeling?method=${currentMethod}&num_topics=${topicCount}`;
+        // BERTopic ignores the topic count; leaving it out shares one cached/precomputed response
+        const url = currentMethod === "bertopic"
+            ? `/data/topic_modeling?method=${currentMethod}`
+            : `/data/topic_modeling?method=${currentMethod}&num_topics=${topicCount}`;
 
         // Show loading indicator
         container.html(`<div class="text-center py-10"><div class="spinner"></div>Loading data...</div>`);
 
-        d3.json(url).then(data => {
+        fetchTopicData(url).then(data => {
             if (data.error) {
                 console.error("Error loading data:", data.error);
                 container.html(`<div class="error-message p-4 text-red-600">Error: ${data.error}</div>`);
@@ -151,8 +172,14 @@ function init_topic_modeling() {
             });
 
             // Prepare nodes and links
-            const nodes = graph.nodes.map(n => ({
+            // Positions are precomputed by the server (unit square)
+            const layout = graph.layout;
+            const nodes = graph.nodes.map((n, i) => ({
                 ...n,
+                ...(layout ? {
+                    x: 30 + layout.x[i] * (width - 60),
+                    y: 30 + layout.y[i] * (height - 60)
+                } : {}),
                 type: n.sub_type || "Entity",
                 topicScores: entity_topic_scores[n.id] || {}
             }));
@@ -169,6 +196,7 @@ function init_topic_modeling() {
                 .force("charge", d3.forceManyBody().strength(-300))
                 .force("center", d3.forceCenter(width / 2, height / 2))
                 .force("collision", d3.forceCollide().radius(25));
+            if (layout) simulation.alpha(0).stop();
 
             // Draw links
             const link = g.append("g")
@@ -222,7 +250,7 @@ function init_topic_modeling() {
             }));
 
             // Update positions on tick
-            simulation.on("tick", () => {
+            function ticked() {
                 link
                     .attr("x1", d => d.source.x)
                     .attr("y1", d => d.source.y)
@@ -236,7 +264,9 @@ function init_topic_modeling() {
                 label
                     .attr("x", d => d.x)
                     .attr("y", d => d.y);
-            });
+            }
+            simulation.on("tick", ticked);
+            ticked();
 
             // Topic selection handler
             topicSelector.on("change", function () {
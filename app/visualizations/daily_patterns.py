@@ -1,13 +1,11 @@
 import logging
-from datetime import datetime
-import json
-import networkx as nx
-import os
 from flask import current_app
-from sklearn.feature_extraction.text import TfidfVectorizer
+from app.core.events import event_index
+from app.core.influence import influence_engine
+from app.core.temporal import temporal_cube
 import re
 import numpy as np
-from .topic_modeling import extract_topics_bertopic, extract_topics_lda, extract_topics_tfidf
+from .topic_modeling import COUNTED_METHODS, TOPIC_COUNTS, fit_topics
 
 logger = logging.getLogger(__name__)
 
@@ -15,107 +13,57 @@ NAME = "daily_patterns"
 TITLE = "Daily Communication Patterns"
 DESCRIPTION = "Visualization of daily communication events with entity markers"
 
+PRECOMPUTE_GRID = [
+    {},
+    {"include_topics": "true", "method": "bertopic"},
+    {"include_topics": "true", "method": COUNTED_METHODS, "num_topics": TOPIC_COUNTS},
+]
+
+# No NORMALIZE: no object is repeated in the payload. Event content, half of
+# it, is distinct per event; callers that do not show it drop it with
+# fields=-events.content
+
+# Served (and cached) separately by /data/daily_patterns/<part>: roll-ups of
+# the temporal cube and the lead-lag influencers of each entity
+PARTS = {"cube": ["DATA_FILE"], "influence": ["DATA_FILE"]}
+
 
 def get_data(include_topics=False, method="bertopic", **kwargs):
     logger.debug(f"Generating daily patterns data, include_topics: {include_topics}")
 
-    # Get path to data file from config
-    data_file = current_app.config["DATA_FILE"]
-    if not data_file:
+    # Columnar event table, built once per version of the data file
+    try:
+        index = event_index("DATA_FILE")
+    except KeyError:
         logger.error("DATA_FILE not configured")
         return {"error": "Data file not configured"}
-
-    # Load graph data from file
-    try:
-        with open(data_file, "r") as f:
-            graph_data = json.load(f)
     except Exception as e:
         logger.error(f"Error loading graph data: {str(e)}")
         return {"error": f"Could not load data file: {str(e)}"}
 
-    # Create networkx graph using the correct 'edges' key
-    try:
-        G = nx.node_link_graph(graph_data, edges="edges")
-    except Exception as e:
-        logger.error(f"Error creating graph: {str(e)}")
-        return {"error": f"Could not create graph: {str(e)}"}
+    # Communication events in October 2040
+    in_month = index.sub_type_mask("Communication") & index.month_mask(2040, 10)
+    rows = np.flatnonzero(in_month)
+    entities = {
+        index.entity_ids[k]: index.entity_record(k) for k in index.participants(rows)
+    }
 
     october_events = []
-    entities = {}
-
-    # Process nodes to find communication events in October 2040
-    for node_id, node_data in G.nodes(data=True):
-        if (
-            node_data.get("type") == "Event"
-            and node_data.get("sub_type") == "Communication"
-        ):
-            # Handle different timestamp formats
-            timestamp = node_data.get("timestamp") or node_data.get("date")
-
-            if timestamp:
-                try:
-                    # Parse different timestamp formats
-                    if "T" in timestamp:
-                        # ISO format with 'T'
-                        dt = datetime.fromisoformat(timestamp)
-                    elif " " in timestamp:
-                        # Space-separated format "YYYY-MM-DD HH:MM:SS"
-                        dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                    else:
-                        # Date-only format
-                        dt = datetime.strptime(timestamp, "%Y-%m-%d")
-
-                    # Filter for October 2040
-                    if dt.year == 2040 and dt.month == 10:
-                        # Find source entity by looking for "sent" edges
-                        source_entity = None
-                        target_entities = []
-                        content = node_data.get("content", "")
-
-                        # Check all incoming edges to this event
-                        for predecessor, _, edge_data in G.in_edges(node_id, data=True):
-                            if edge_data.get("type") == "sent":
-                                pred_data = G.nodes[predecessor]
-                                if pred_data.get("type") == "Entity":
-                                    source_entity = {
-                                        "id": predecessor,
-                                        "sub_type": pred_data.get("sub_type"),
-                                        "label": pred_data.get("label", ""),
-                                    }
-                                    entities[predecessor] = source_entity
-                                    break
-
-                        # Find target entities by looking for "received" edges
-                        for _, successor, edge_data in G.out_edges(node_id, data=True):
-                            if edge_data.get("type") == "received":
-                                succ_data = G.nodes[successor]
-                                if succ_data.get("type") == "Entity":
-                                    target_entity = {
-                                        "id": successor,
-                                        "sub_type": succ_data.get("sub_type"),
-                                        "label": succ_data.get("label", ""),
-                                    }
-                                    entities[successor] = target_entity
-                                    target_entities.append(successor)
-
-                        if source_entity:
-                            # Convert datetime objects to string representations
-                            october_events.append(
-                                {
-                                    "id": node_id,
-                                    "timestamp": timestamp,
-                                    "entity_id": source_entity["id"],
-                                    "entity_sub_type": source_entity["sub_type"],
-                                    "time": dt.time().isoformat(),  # Convert to ISO time string
-                                    "day": dt.day,
-                                    "datetime": dt.isoformat(),  # Full datetime for frontend
-                                    "content": content,
-                                    "target_entities": target_entities,
-                                }
-                            )
-                except (ValueError, TypeError) as e:
-                    logger.debug(f"Skipping invalid timestamp: {timestamp} - {str(e)}")
-                    continue
+    for row in rows[index.sender[rows] >= 0]:
+        sender = index.sender[row]
+        october_events.append(
+            {
+                "id": index.ids[row],
+                "timestamp": index.raw_timestamps[row],
+                "entity_id": index.entity_ids[sender],
+                "entity_sub_type": index.entity_sub_types[sender],
+                "time": index.time(row),
+                "day": int(index.day[row]),
+                "datetime": str(index.iso[row]),  # Full datetime for frontend
+                "content": index.text(row),
+                "target_entities": [index.entity_ids[k] for k in index.receivers(row)],
+            }
+        )
 
     logger.info(f"Found {len(october_events)} communication events in October 2040")
 
@@ -140,6 +88,99 @@ def get_data(include_topics=False, method="bertopic", **kwargs):
     return response
 
 
+def _entity_positions(index, value):
+    """Entity positions of a comma-separated list of ids, None when not given"""
+    if not value:
+        return None
+    ids = [eid.strip() for eid in str(value).split(",") if eid.strip()]
+    unknown = [eid for eid in ids if eid not in index.entity_pos]
+    if unknown:
+        raise ValueError(f"Unknown entities: {', '.join(unknown)}")
+    return [index.entity_pos[eid] for eid in ids]
+
+
+def get_cube(keep="day,slot", entity=None, sender=None, receiver=None, days=None,
+             baseline_days=None, slot_minutes="60"):
+    """Slice and roll-up of the message counts by sender, receiver, day and time slot
+
+    ``keep`` lists the axes to return (``sender``, ``receiver``, ``day``,
+    ``slot``, or ``entity`` for messages sent or received by each entity);
+    the others are summed. ``entity``, ``sender`` and ``receiver`` are
+    comma-separated id filters, ``days`` an ISO ``first:last`` date range
+    and ``slot_minutes`` is 60 or 15. With ``baseline_days`` the same
+    roll-up over that range is returned with the difference, e.g. week 2
+    against week 1.
+    """
+    path = current_app.config.get("DATA_FILE")
+    if not path:
+        logger.error("DATA_FILE not configured")
+        return {"error": "Data file not configured"}
+
+    try:
+        cube = temporal_cube(path, int(slot_minutes))
+        axes = [axis.strip() for axis in str(keep).split(",") if axis.strip()]
+        filters = {
+            "involving": _entity_positions(cube.index, entity),
+            "senders": _entity_positions(cube.index, sender),
+            "receivers": _entity_positions(cube.index, receiver),
+        }
+        values, labels = cube.rollup(axes, days=cube.day_range(days), **filters)
+        baseline = None
+        if baseline_days:
+            baseline, baseline_labels = cube.rollup(axes, days=cube.day_range(baseline_days), **filters)
+            if baseline.shape != values.shape:
+                raise ValueError("days and baseline_days must span the same number of days")
+    except ValueError as e:
+        return {"error": str(e)}
+
+    response = {
+        "axes": axes,
+        "labels": labels,
+        "values": values.tolist(),
+        "total": int(values.sum()),
+        "slot_minutes": cube.slot_minutes,
+    }
+    if baseline is not None:
+        response["baseline"] = {
+            "labels": baseline_labels,
+            "values": baseline.tolist(),
+            "total": int(baseline.sum()),
+        }
+        response["delta"] = (values - baseline).tolist()
+    return response
+
+
+def get_influence(entity=None, window="60", top="10", min_followed="3"):
+    """Who each entity follows up on: ranked lead-lag influencers
+
+    An influencer's message is followed when ``entity`` sends a message
+    within ``window`` minutes after it. Influencers are ranked by lift over
+    the entity's base rate (see ``InfluenceEngine``); ``entity`` is a
+    comma-separated id filter, every sender by default.
+    """
+    path = current_app.config.get("DATA_FILE")
+    if not path:
+        logger.error("DATA_FILE not configured")
+        return {"error": "Data file not configured"}
+
+    try:
+        window_minutes = float(window)
+        top, min_followed = int(top), int(min_followed)
+        if window_minutes <= 0 or top < 1:
+            raise ValueError("window and top must be positive")
+        engine = influence_engine(path)
+        targets = _entity_positions(engine.index, entity)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    window_seconds = int(window_minutes * 60)
+    return {
+        "window_minutes": window_minutes,
+        "base_rates": engine.base_rates(window_seconds, targets),
+        "influencers": engine.influencers(window_seconds, targets, top, min_followed),
+    }
+
+
 def get_topic_data(october_events, method="bertopic", **kwargs):
     """Get topic modeling data for events"""
     logger.debug(f"Generating topic data with method: {method}")
@@ -165,7 +206,7 @@ def get_topic_data(october_events, method="bertopic", **kwargs):
                     except:
                         tfidf_num_topics = 5
                         
-                topics_list, doc_topics = extract_topics_tfidf(event_contents, num_topics=tfidf_num_topics)
+                result = fit_topics(event_contents, "tfidf", num_topics=tfidf_num_topics)
                 
             elif method.startswith("lda"):
                 # Parse vectorizer for LDA
@@ -175,14 +216,13 @@ def get_topic_data(october_events, method="bertopic", **kwargs):
                     if len(parts) > 1:
                         vectorizer_type = parts[1].split("=")[1] if "=" in parts[1] else "tfidf"
                     
-                topics_list, doc_topics, _, _ = extract_topics_lda(
-                    event_contents, num_topics=num_topics, vectorizer=vectorizer_type
+                result = fit_topics(
+                    event_contents, "lda", num_topics=num_topics, vectorizer=vectorizer_type
                 )
                 
             else:  # Default to BERTopic
-                topics_list, doc_topics, _ = extract_topics_bertopic(
-                    event_contents, min_topic_size=min_topic_size
-                )
+                result = fit_topics(event_contents, "bertopic", min_topic_size=min_topic_size)
+            topics_list, doc_topics = result["topics"], result["doc_topics"]
             
             # Format topics for frontend
             for i, keywords in enumerate(topics_list):
@@ -246,6 +286,8 @@ def extract_keywords(contents, max_keywords=15, ngram_range=(1, 3)):
         re.sub(r"[^\w\s]", "", content).lower().strip() for content in contents
     ]
 
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
     # Create TF-IDF matrix
     vectorizer = TfidfVectorizer(
         stop_words="english",
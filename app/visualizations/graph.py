@@ -1,8 +1,12 @@
-import networkx as nx
 import logging
-import json
-import pandas as pd
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
+from app.core.communities import communication_communities, relationship_communities
+from app.core.dataset import store
+from app.core.layout import LAYOUT_ALGORITHMS, file_layout
+from app.core.pseudonyms import similarity_matrix
+from app.visualizations.topic_modeling import message_topics
 
 logger = logging.getLogger(__name__)
 
@@ -11,58 +15,163 @@ NAME = "graph"
 TITLE = "Network Exploration"
 DESCRIPTION = "Vizualize the interaction between entities and their relationships."
 
+# Sub-resources served (and cached) separately by /data/graph/<part>, with
+# the data files each one reads: a part's ETag only changes with its files
+PARTS = {
+    "communication": ["COMMUNICATION_FILE"],
+    "relationships": ["RELATIONSHIPS_FILE"],
+    "heatmap": ["COMMUNICATION_FILE", "HEATMAP_SIMILARITY_FILE"],
+    "communities": ["COMMUNICATION_FILE", "RELATIONSHIPS_FILE"],
+}
+
+COMMUNITY_GRAPHS = {
+    "communication": ("COMMUNICATION_FILE", communication_communities),
+    "relationships": ("RELATIONSHIPS_FILE", relationship_communities),
+}
 
-def get_data():
-    logger.debug("Generating graph data")
 
-    logger.debug("Loading graph data from static/graph.json")
-    data_file = current_app.config["COMMUNICATION_FILE"]
-    relationships_file = current_app.config["RELATIONSHIPS_FILE"]
-    if not data_file:
-        logger.error("COMMUNICATION_FILE not configured")
+def _node_link_graph(config_key, layout):
+    """Nodes, links and precomputed positions of a node-link data file"""
+    if layout not in LAYOUT_ALGORITHMS:
+        return {"error": f"layout must be one of {', '.join(LAYOUT_ALGORITHMS)}"}
+    path = current_app.config.get(config_key)
+    if not path:
+        logger.error(f"{config_key} not configured")
         return {"error": "Data file not configured"}
 
-    # Load graph data from file
     try:
-        with open(data_file, "r") as f:
-            graph_data = json.load(f)
+        data = store.load(path)
     except Exception as e:
-        logger.error(f"Error loading graph data: {str(e)}")
+        logger.error(f"Error loading {config_key}: {str(e)}")
         return {"error": f"Could not load data file: {str(e)}"}
-    # breakpoint()
-    nodes = graph_data.get("nodes", [])
-    links = graph_data.get("links", graph_data.get("edges", []))
 
+    # Positions are computed once per file version and reused by every request
+    try:
+        positions = file_layout(path, layout)
+    except Exception as e:
+        logger.error(f"Error computing graph layout: {str(e)}")
+        return {"error": f"Could not compute graph layout: {str(e)}"}
+
+    nodes = data.get("nodes", [])
+    links = data.get("links", data.get("edges", []))
+    logger.debug(f"Loaded graph: {len(nodes)} nodes, {len(links)} edges")
+    return {"nodes": nodes, "links": links, "layout": positions}
+
+
+def get_communication(layout="force"):
+    """The communication graph; ``layout`` is ``force`` or ``spectral``"""
+    return _node_link_graph("COMMUNICATION_FILE", layout)
+
+
+def get_relationships(layout="force"):
+    """The relationship graph; ``layout`` is ``force`` or ``spectral``"""
+    return _node_link_graph("RELATIONSHIPS_FILE", layout)
+
+
+def get_heatmap():
+    """The heatmap's entity order; the matrix is served by /data/graph/heatmap/tiles"""
     try:
-        csv_path = current_app.config["HEATMAP_SIMILARITY_FILE"]
-        df = pd.read_csv(csv_path, index_col=0)
-        entities = df.index.tolist()
-        matrix = df.values.tolist()
+        entities, _, source = similarity_matrix()
     except Exception as e:
         logger.error(f"Error loading entity similarity matrix: {str(e)}")
         return {"error": f"Could not load entity similarity matrix: {str(e)}"}
+    return {"entities": entities, "source": source}
+
+
+def _group_topics(groups, topics):
+    """Topic distribution of the messages each group's members sent"""
+    group_of = {member: g for g, members in enumerate(groups) for member in members}
+    weights = [defaultdict(float) for _ in groups]
+    messages = [0] * len(groups)
+    for comm, topic_weights in zip(topics["communications"], topics["doc_topics"]):
+        g = group_of.get(comm["source"])
+        if g is None:
+            continue
+        messages[g] += 1
+        for topic_id, weight in enumerate(topic_weights):
+            weights[g][topic_id] += weight
+
+    summaries = []
+    for g, scores in enumerate(weights):
+        total = sum(scores.values())
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:5]
+        summaries.append({
+            "messages": messages[g],
+            "topics": [
+                {"id": t, "share": w / total, "keywords": topics["topics"][t][:5]}
+                for t, w in ranked if w > 0
+            ],
+        })
+    return summaries
+
+
+def get_communities(graph="communication", method="tfidf", num_topics="auto"):
+    """Modularity communities of a graph and the topics each group talks about
+
+    ``graph`` is ``communication`` (entities weighted by messages exchanged)
+    or ``relationships``. Groups are joined to the cached topic fit of
+    ``method`` (as in the topic modeling view) by the messages their
+    members sent. The default, TF-IDF, fits in about a second; slower
+    methods are best warmed first through the topic modeling view (e.g.
+    ``/data/topic_modeling?method=bertopic&async=1``), whose fit this reuses.
+    """
+    if graph not in COMMUNITY_GRAPHS:
+        return {"error": f"graph must be one of {', '.join(COMMUNITY_GRAPHS)}"}
+    config_key, communities_of = COMMUNITY_GRAPHS[graph]
+    path = current_app.config.get(config_key)
+    if not path:
+        return {"error": f"{config_key} not configured"}
 
-    # Load relationships data
     try:
-        with open(relationships_file, "r") as f:
-            relationships_data = json.load(f)
+        communities = communities_of(path).communities
     except Exception as e:
-        logger.error(f"Error loading relationships data: {str(e)}")
-        return {"error": f"Could not load relationships file: {str(e)}"}
-    relationships_nodes = relationships_data.get("nodes", [])
-    relationships_edges = relationships_data.get(
-        "links", relationships_data.get("edges", [])
-    )
+        logger.error(f"Error detecting communities: {str(e)}")
+        return {"error": f"Could not detect communities: {str(e)}"}
+    groups = communities.groups()
+
+    topics = message_topics(method, num_topics)
+    if topics.get("error"):
+        return topics
+    summaries = _group_topics(groups, topics)
 
-    logger.debug(f"Loaded graph: {len(nodes)} nodes, {len(links)} edges")
     return {
-        "communication": {
-            "nodes": nodes,
-            "links": links,
-        },
-        "relationships": {
-            "nodes": relationships_nodes,
-            "links": relationships_edges,
-        },
-        "heatmap": {"entities": entities, "matrix": matrix},
+        "graph": graph,
+        "method_used": topics["method"],
+        "modularity": communities.modularity(),
+        "groups": [
+            {"id": g, "size": len(members), "members": members, **summary}
+            for g, (members, summary) in enumerate(zip(groups, summaries))
+        ],
     }
+
+
+def _in_parallel(calls):
+    """Run ``{name: fn}`` in threads that share this request's app and dataset snapshot"""
+    app = current_app._get_current_object()
+    snapshot = store.snapshot()
+
+    def run(fn):
+        with app.app_context():
+            store.pin(snapshot)
+            try:
+                return fn()
+            finally:
+                store.unpin()
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = {name: pool.submit(run, fn) for name, fn in calls.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def get_data(layout="force"):
+    """All parts in one payload; the sources are loaded in parallel"""
+    logger.debug("Generating graph data")
+    parts = _in_parallel({
+        "communication": lambda: get_communication(layout),
+        "relationships": lambda: get_relationships(layout),
+        "heatmap": get_heatmap,
+    })
+    for part in parts.values():
+        if part.get("error"):
+            return part
+    return parts
@@ -1,13 +1,11 @@
 import logging
-from datetime import datetime
-import json
-import networkx as nx
-import os
 import re
-import math
 from collections import defaultdict
 from flask import current_app
-from sklearn.feature_extraction.text import TfidfVectorizer
+from app.core.dataset import store
+from app.core.events import event_index
+from app.core.matcher import TermMatcher
+from app.core.terms import CommunicationStats
 import numpy as np
 
 logger = logging.getLogger(__name__)
@@ -17,107 +15,71 @@ TITLE = "Keyword Communication Analysis"
 DESCRIPTION = "Identify important expressions and group communications by them"
 
 
+def preprocess(content):
+    return re.sub(r"[^\w\s]", "", content).lower().strip()
+
+
+def build_analyzer():
+    """Tokenizer of the keyword TF-IDF: unigrams and bigrams without stop words"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    analyze = TfidfVectorizer(stop_words="english", ngram_range=(1, 2)).build_analyzer()
+    return lambda content: analyze(preprocess(content))
+
+
+def communication_stats(data_file):
+    """Term counts of every message, kept current as communications are ingested"""
+    return store.derive(
+        data_file,
+        "keyword_stats",
+        lambda data: CommunicationStats(event_index(path=data_file), build_analyzer()),
+    )
+
+
 def get_data():
     logger.debug("Generating keyword analysis data")
 
-    # Get path to data file from config
-    data_file = current_app.config["DATA_FILE"]
-    if not data_file:
+    # Columnar event table, built once per version of the data file
+    try:
+        data_file = current_app.config.get("DATA_FILE")
+        index = event_index(path=data_file)
+        stats = communication_stats(data_file)
+    except KeyError:
         logger.error("DATA_FILE not configured")
         return {"error": "Data file not configured"}
-
-    # Load graph data from file
-    try:
-        with open(data_file, "r") as f:
-            graph_data = json.load(f)
     except Exception as e:
         logger.error(f"Error loading graph data: {str(e)}")
         return {"error": f"Could not load data file: {str(e)}"}
 
-    # Create networkx graph
-    try:
-        G = nx.node_link_graph(graph_data, edges="edges")
-    except Exception as e:
-        logger.error(f"Error creating graph: {str(e)}")
-        return {"error": f"Could not create graph: {str(e)}"}
+    # Communication events in October 2040 with a sender and some content
+    in_month = index.sub_type_mask("Communication") & index.month_mask(2040, 10)
+    rows = np.flatnonzero(in_month)
+    entities = {
+        index.entity_ids[k]: index.entity_record(k) for k in index.participants(rows)
+    }
+    has_content = np.diff(index.text_offsets)[rows] > 0
+    rows = rows[(index.sender[rows] >= 0) & has_content]
 
     october_events = []
-    entities = {}
-    event_contents = []
-
-    # Process nodes to find communication events in October 2040
-    for node_id, node_data in G.nodes(data=True):
-        if (
-            node_data.get("type") == "Event"
-            and node_data.get("sub_type") == "Communication"
-        ):
-            # Handle different timestamp formats
-            timestamp = node_data.get("timestamp") or node_data.get("date")
-
-            if timestamp:
-                try:
-                    # Parse different timestamp formats
-                    if "T" in timestamp:
-                        dt = datetime.fromisoformat(timestamp)
-                    elif " " in timestamp:
-                        dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                    else:
-                        dt = datetime.strptime(timestamp, "%Y-%m-%d")
-
-                    # Filter for October 2040
-                    if dt.year == 2040 and dt.month == 10:
-                        # Find source entity
-                        source_entity = None
-                        target_entities = []
-                        content = node_data.get("content", "")
-
-                        # Check incoming edges
-                        for predecessor, _, edge_data in G.in_edges(node_id, data=True):
-                            if edge_data.get("type") == "sent":
-                                pred_data = G.nodes[predecessor]
-                                if pred_data.get("type") == "Entity":
-                                    source_entity = {
-                                        "id": predecessor,
-                                        "sub_type": pred_data.get("sub_type"),
-                                        "label": pred_data.get("label", ""),
-                                    }
-                                    entities[predecessor] = source_entity
-                                    break
-
-                        # Find target entities
-                        for _, successor, edge_data in G.out_edges(node_id, data=True):
-                            if edge_data.get("type") == "received":
-                                succ_data = G.nodes[successor]
-                                if succ_data.get("type") == "Entity":
-                                    target_entity = {
-                                        "id": successor,
-                                        "sub_type": succ_data.get("sub_type"),
-                                        "label": succ_data.get("label", ""),
-                                    }
-                                    entities[successor] = target_entity
-                                    target_entities.append(successor)
-
-                        if source_entity and content:
-                            event_contents.append(content)
-                            october_events.append(
-                                {
-                                    "id": node_id,
-                                    "timestamp": timestamp,
-                                    "entity_id": source_entity["id"],
-                                    "entity_sub_type": source_entity["sub_type"],
-                                    "datetime": dt.isoformat(),
-                                    "content": content,
-                                    "target_entities": target_entities,
-                                }
-                            )
-                except (ValueError, TypeError) as e:
-                    logger.debug(f"Skipping invalid timestamp: {timestamp} - {str(e)}")
-                    continue
+    for row in rows:
+        sender = index.sender[row]
+        content = index.text(row)
+        october_events.append(
+            {
+                "id": index.ids[row],
+                "timestamp": index.raw_timestamps[row],
+                "entity_id": index.entity_ids[sender],
+                "entity_sub_type": index.entity_sub_types[sender],
+                "datetime": str(index.iso[row]),
+                "content": content,
+                "target_entities": [index.entity_ids[k] for k in index.receivers(row)],
+            }
+        )
 
     logger.info(f"Found {len(october_events)} communication events in October 2040")
 
-    # Extract keywords using TF-IDF
-    keywords = extract_keywords(event_contents)
+    # Extract keywords using TF-IDF over the already tokenized messages
+    keywords = extract_keywords(stats, stats.documents(rows))
 
     # Group events by keywords
     keyword_events = group_events_by_keywords(october_events, keywords)
@@ -131,31 +93,17 @@ def get_data():
     }
 
 
-def extract_keywords(contents, max_keywords=20):
+def extract_keywords(stats, docs, max_keywords=20):
     """Extract important keywords using TF-IDF"""
-    if not contents:
+    if len(docs) == 0:
         return []
 
-    # Preprocess text
-    processed_contents = [
-        re.sub(r"[^\w\s]", "", content).lower().strip() for content in contents
-    ]
-
-    # Create TF-IDF matrix
-    vectorizer = TfidfVectorizer(
-        stop_words="english",
-        max_features=500,
-        ngram_range=(1, 2),  # Include 1-2 word phrases
-    )
-
+    # Create TF-IDF matrix (same weights as TfidfVectorizer with max_features=500)
     try:
-        tfidf_matrix = vectorizer.fit_transform(processed_contents)
+        tfidf_matrix, feature_names = stats.terms.tfidf(docs, max_features=500)
     except ValueError:
         return []
 
-    # Get feature names
-    feature_names = vectorizer.get_feature_names_out()
-
     # Get top keywords across all documents
     tfidf_scores = np.sum(tfidf_matrix, axis=0)
     top_indices = np.argsort(tfidf_scores).tolist()[0][-max_keywords:]
@@ -180,13 +128,15 @@ def extract_keywords(contents, max_keywords=20):
 def group_events_by_keywords(events, keywords):
     """Group events by which keywords they contain"""
     keyword_events = {kw["id"]: [] for kw in keywords}
-    keyword_terms = {kw["id"]: kw["term"] for kw in keywords}
+    term_ids = defaultdict(list)
+    for kw in keywords:
+        term_ids[kw["term"].lower()].append(kw["id"])
 
+    # One scan per event for all keywords, whole word matches only
+    matcher = TermMatcher(list(term_ids), whole_words=True)
     for event in events:
-        content = event["content"].lower()
-        for kw_id, term in keyword_terms.items():
-            # Check for whole word matches
-            if re.search(rf"\b{re.escape(term)}\b", content):
+        for term in matcher.find(event["content"]):
+            for kw_id in term_ids[term]:
                 keyword_events[kw_id].append(event["id"])
 
     return keyword_events
@@ -4,6 +4,12 @@ from datetime import datetime
 import json
 from collections import Counter, defaultdict
 from flask import current_app
+from app.core.dataset import store
+from app.core.events import event_index
+from app.core.layout import graph_layout
+from app.core.matcher import TermMatcher
+from app.core.temporal import temporal_cube
+import numpy as np
 import os
 
 logger = logging.getLogger(__name__)
@@ -12,8 +18,29 @@ NAME = "nadia_analysis"
 TITLE = "Analysis of Nadia Conti"
 DESCRIPTION = "Visual analysis of Nadia Conti's activities to evaluate suspicions of illegal activities"
 
-def get_data():
-    logger.debug("Generating Nadia Conti analysis data")
+SUSPICIOUS_KEYWORDS = [
+    "permit", "authorization", "clearance", "secret", "private", "special",
+    "arrangement", "deal", "payment", "money", "cash", "funding",
+    "restricted", "access", "corridor", "bypass", "loophole",
+    "mining", "extraction", "drilling", "equipment", "operation",
+    "illegal", "unauthorized", "bribe", "corruption", "under table",
+    "approve", "approval", "license", "certificate", "official"
+]
+PERMIT_TERMS = ["permit", "authorization", "approval", "clearance", "license"]
+ALERT_TERMS = ["secret", "private", "illegal", "bribe", "unauthorized", "corruption"]
+
+# Entity profiled when no ``entity`` parameter is given
+DEFAULT_ENTITY = "Nadia Conti"
+
+# Substring matches of every term list in one pass over each message
+TERM_MATCHER = TermMatcher({
+    "suspicious": SUSPICIOUS_KEYWORDS,
+    "permit": PERMIT_TERMS,
+    "alert": ALERT_TERMS,
+})
+
+def get_data(entity=DEFAULT_ENTITY, view="profile", **kwargs):
+    logger.debug(f"Generating analysis data for {entity}")
     
     try:
         # Find any available communication data file
@@ -44,21 +71,29 @@ def get_data():
             return {"error": "No communication data file found"}
         
         logger.info(f"Loading communication data from: {comm_file}")
-        with open(comm_file, "r") as f:
-            comm_data = json.load(f)
         
-        # Analyze the structure of the data to find communications
-        nadia_communications = find_nadia_communications(comm_data)
+        # Ranked suspicion indicators of every entity
+        if view == "leaderboard":
+            return store.derive(comm_file, "leaderboard", lambda data: build_leaderboard(comm_file))
+        
+        index = event_index(path=comm_file)
         
-        if not nadia_communications:
-            logger.warning("No communications found for Nadia Conti")
+        # Profiles are cached per entity and version of the communication file;
+        # unknown entities are answered without creating a cache entry
+        profile = None
+        if not len(index) or entity in index.entity_pos:
+            profile = store.derive(
+                comm_file, f"profile:{entity}", lambda data: build_entity_profile(comm_file, data, entity)
+            )
+        
+        if profile is None:
+            logger.warning(f"No communications found for {entity}")
+            if entity != DEFAULT_ENTITY:
+                return {"error": f"No communications found for {entity}"}
             # Return a sample analysis to test the frontend
             return create_sample_analysis()
         
-        logger.info(f"Found {len(nadia_communications)} communications for Nadia Conti")
-        
-        # Perform the analysis
-        return analyze_nadia_data(nadia_communications)
+        return profile
         
     except FileNotFoundError as e:
         logger.error(f"File not found in nadia_analysis: {str(e)}")
@@ -70,22 +105,133 @@ def get_data():
         logger.error(f"Unexpected error in nadia_analysis: {str(e)}", exc_info=True)
         return {"error": f"Analysis error: {str(e)}"}
 
-def find_nadia_communications(comm_data):
+def build_entity_profile(comm_file, comm_data, entity_id):
+    """Profile of one entity, or None when it has no communications"""
+    index = event_index(path=comm_file)
+    
+    # Analyze the structure of the data to find communications
+    communications = find_entity_communications(comm_data, index, entity_id)
+    if not communications:
+        return None
+    
+    logger.info(f"Found {len(communications)} communications for {entity_id}")
+    
+    k = index.entity_pos.get(entity_id)
+    entity_type = index.entity_sub_types[k] if k is not None else None
+    
+    # Hour histogram from the cached temporal cube instead of a pass over the messages
+    hourly_distribution = temporal_cube(comm_file).entity_slots()[k].tolist() if k is not None else None
+    
+    # Perform the analysis
+    return analyze_entity_data(communications, entity_id, entity_type or "Person", hourly_distribution)
+
+def build_leaderboard(comm_file):
+    """Suspicion indicators of every entity at once, ranked
+    
+    Each message is scanned for terms once; per-entity counts are group-bys
+    over the (entity, message) pairs of the per-entity message index, giving
+    entity x hour, entity x keyword and entity x contact counts.
+    """
+    index = event_index(path=comm_file)
+    n_entities = len(index.entity_ids)
+    pair_entity = np.repeat(np.arange(n_entities), np.diff(index.entity_event_ptr))
+    pair_row = index.entity_event_rows
+    
+    # Global message order used by the single-entity analysis (sorted by datetime)
+    stamps = [t or "2040-01-01T00:00:00" for t in index.raw_timestamps]
+    rank = np.empty(len(index), dtype=np.int64)
+    rank[sorted(range(len(index)), key=stamps.__getitem__)] = np.arange(len(index))
+    pair_rank = rank[pair_row]
+    
+    # Message x keyword hits, one scan per message
+    n_keywords = len(SUSPICIOUS_KEYWORDS)
+    keyword_col = {term: i for i, term in enumerate(SUSPICIOUS_KEYWORDS)}
+    hits = np.zeros((len(index), n_keywords), dtype=bool)
+    permit_msg = np.zeros(len(index), dtype=bool)
+    for row in range(len(index)):
+        found = TERM_MATCHER.scan(index.text(row))
+        hits[row, [keyword_col[t] for t in found["suspicious"]]] = True
+        permit_msg[row] = bool(found["permit"])
+    
+    # Entity x hour counts, rolled up from the temporal cube
+    totals = np.bincount(pair_entity, minlength=n_entities)
+    entity_hours = temporal_cube(comm_file).entity_slots()
+    late_night = entity_hours[:, [23, 0, 1, 2, 3, 4]].sum(axis=1)
+    
+    # Entity x keyword counts and the order keywords were first mentioned
+    pair_hits = hits[pair_row]
+    entity_keywords = np.zeros((n_entities, n_keywords), dtype=np.int64)
+    np.add.at(entity_keywords, pair_entity, pair_hits)
+    hit_pair, hit_col = np.nonzero(pair_hits)
+    first_mention = np.full((n_entities, n_keywords), np.iinfo(np.int64).max)
+    np.minimum.at(first_mention, (pair_entity[hit_pair], hit_col), pair_rank[hit_pair] * n_keywords + hit_col)
+    suspicious_count = np.bincount(pair_entity, weights=pair_hits.any(axis=1), minlength=n_entities)
+    permit_count = np.bincount(pair_entity, weights=permit_msg[pair_row], minlength=n_entities)
+    
+    # Entity x contact counts, in order of first contact
+    sender = index.sender[pair_row]
+    other = np.where(sender == pair_entity, index.receiver[pair_row], sender)
+    keep = (other >= 0) & (other != pair_entity)
+    by_time = np.argsort(pair_rank[keep], kind="stable")
+    contact_keys = (pair_entity[keep] * n_entities + other[keep])[by_time]
+    keys, first, counts = np.unique(contact_keys, return_index=True, return_counts=True)
+    frequent = counts > 5
+    high_contacts = [[] for _ in range(n_entities)]
+    for key in keys[frequent][np.argsort(first[frequent], kind="stable")]:
+        high_contacts[key // n_entities].append(index.entity_ids[key % n_entities])
+    
+    leaderboard = []
+    for k in np.flatnonzero(totals):
+        mentioned = np.flatnonzero(entity_keywords[k])
+        keywords = [SUSPICIOUS_KEYWORDS[c] for c in mentioned[np.argsort(first_mention[k, mentioned])]]
+        indicators, recommendation = assess_suspicion(
+            total_comms=int(totals[k]),
+            late_night=int(late_night[k]),
+            keyword_total=int(entity_keywords[k].sum()),
+            keywords=keywords,
+            permit_count=int(permit_count[k]),
+            high_contacts=high_contacts[k],
+            suspicious_count=int(suspicious_count[k]),
+        )
+        leaderboard.append({
+            "entity": index.entity_ids[k],
+            "sub_type": index.entity_sub_types[k],
+            "total_communications": int(totals[k]),
+            "late_night_share": round(float(late_night[k] / totals[k]), 4),
+            "keyword_mentions": int(entity_keywords[k].sum()),
+            "distinct_keywords": len(keywords),
+            "permit_related": int(permit_count[k]),
+            "suspicious_messages": int(suspicious_count[k]),
+            "high_contacts": len(high_contacts[k]),
+            "indicators": indicators,
+            "overall_score": len(indicators),
+            "high_severity": sum(1 for i in indicators if i["severity"] == "high"),
+            "recommendation": recommendation,
+        })
+    
+    leaderboard.sort(key=lambda e: (-e["overall_score"], -e["high_severity"], -e["keyword_mentions"], e["entity"]))
+    for position, entry in enumerate(leaderboard, start=1):
+        entry["rank"] = position
+    
+    return {"leaderboard": leaderboard, "total_entities": len(leaderboard)}
+
+def find_nadia_communications(comm_data, index):
     """Find Nadia Conti communications in various data formats"""
+    return find_entity_communications(comm_data, index, DEFAULT_ENTITY)
+
+def find_entity_communications(comm_data, index, entity_id):
+    """Find the communications of an entity in various data formats"""
     
     nadia_communications = []
-    nadia_id = "Nadia Conti"
+    nadia_id = entity_id
     
     # Try different data structures
     
-    # Method 1: Look for 'links' or 'edges' array
-    links = comm_data.get("links", comm_data.get("edges", []))
-    
-    if links:
-        logger.info(f"Found {len(links)} links in data")
-        for link in links:
-            if link.get("source") == nadia_id or link.get("target") == nadia_id:
-                nadia_communications.append(process_communication_link(link, nadia_id))
+    # Method 1: Select the entity's rows from the per-entity message index
+    if len(index):
+        logger.info(f"Found {len(index)} events in data")
+        for row in index.entity_rows(nadia_id):
+            nadia_communications.append(process_communication_event(index, row, nadia_id))
     
     # Method 2: Look for 'nodes' with communication events
     if not nadia_communications:
@@ -106,28 +252,29 @@ def find_nadia_communications(comm_data):
     
     return [comm for comm in nadia_communications if comm]  # Filter out None values
 
-def process_communication_link(link, nadia_id):
-    """Process a communication link into standard format"""
-    try:
-        datetime_str = link.get("datetime", link.get("timestamp", "2040-01-01T00:00:00"))
-        
-        # Handle different datetime formats
-        comm_datetime = parse_datetime(datetime_str)
-        
-        return {
-            "id": link.get("event_id", link.get("id", f"comm_{id(link)}")),
-            "datetime": datetime_str,
-            "date": comm_datetime.strftime("%Y-%m-%d"),
-            "time": comm_datetime.strftime("%H:%M:%S"),
-            "hour": comm_datetime.hour,
-            "source": link.get("source", ""),
-            "target": link.get("target", ""),
-            "content": link.get("content", link.get("message", link.get("text", ""))),
-            "is_sender": link.get("source") == nadia_id
-        }
-    except Exception as e:
-        logger.warning(f"Error processing link: {e}")
-        return None
+def process_communication_event(index, row, nadia_id):
+    """Process a row of the event table into standard format"""
+    sender = index.sender[row]
+    receiver = index.receiver[row]
+    source = index.entity_ids[sender] if sender >= 0 else ""
+    target = index.entity_ids[receiver] if receiver >= 0 else ""
+    
+    if index.valid[row]:
+        date, time, hour = index.date(row), index.time(row), int(index.hour[row])
+    else:
+        date, time, hour = "2040-01-01", "00:00:00", 0
+    
+    return {
+        "id": index.ids[row],
+        "datetime": index.raw_timestamps[row] or "2040-01-01T00:00:00",
+        "date": date,
+        "time": time,
+        "hour": hour,
+        "source": source,
+        "target": target,
+        "content": index.text(row),
+        "is_sender": source == nadia_id
+    }
 
 def process_communication_message(msg, nadia_id):
     """Process a message into standard format"""
@@ -172,15 +319,26 @@ def parse_datetime(datetime_str):
 
 def analyze_nadia_data(nadia_communications):
     """Analyze Nadia's communication data"""
+    return analyze_entity_data(nadia_communications, DEFAULT_ENTITY)
+
+def analyze_entity_data(nadia_communications, entity_id, entity_type="Person", hourly_distribution=None):
+    """Analyze the communication data of one entity
+
+    ``hourly_distribution`` (messages per hour of day) is counted from the
+    communications when not given.
+    """
     
     # Sort by datetime
     nadia_communications.sort(key=lambda x: x["datetime"])
+
+    # Term hits of every message, computed once
+    term_hits = [TERM_MATCHER.scan(comm["content"]) for comm in nadia_communications]
     
     # Analyze contacts
     contacts = Counter()
     for comm in nadia_communications:
         other_party = comm["target"] if comm["is_sender"] else comm["source"]
-        if other_party and other_party != "Nadia Conti":
+        if other_party and other_party != entity_id:
             contacts[other_party] += 1
     
     # Analyze timing patterns
@@ -191,42 +349,28 @@ def analyze_nadia_data(nadia_communications):
         "late_night": 0        # 23-4 AM
     }
     
-    hourly_distribution = [0] * 24
+    if hourly_distribution is None:
+        hourly_distribution = [0] * 24
+        for comm in nadia_communications:
+            hourly_distribution[comm["hour"]] += 1
     
-    for comm in nadia_communications:
-        hour = comm["hour"]
-        hourly_distribution[hour] += 1
-        
+    for hour, count in enumerate(hourly_distribution):
         if 5 <= hour <= 7:
-            time_patterns["early_morning"] += 1
+            time_patterns["early_morning"] += count
         elif 8 <= hour <= 17:
-            time_patterns["business_hours"] += 1
+            time_patterns["business_hours"] += count
         elif 18 <= hour <= 22:
-            time_patterns["evening"] += 1
+            time_patterns["evening"] += count
         else:  # 23-24 or 0-4
-            time_patterns["late_night"] += 1
+            time_patterns["late_night"] += count
     
     # Analyze suspicious keywords
-    suspicious_keywords = [
-        "permit", "authorization", "clearance", "secret", "private", "special",
-        "arrangement", "deal", "payment", "money", "cash", "funding",
-        "restricted", "access", "corridor", "bypass", "loophole",
-        "mining", "extraction", "drilling", "equipment", "operation",
-        "illegal", "unauthorized", "bribe", "corruption", "under table",
-        "approve", "approval", "license", "certificate", "official"
-    ]
-    
     keyword_mentions = Counter()
     suspicious_messages = []
     
-    for comm in nadia_communications:
-        content_lower = comm["content"].lower()
-        found_keywords = []
-        
-        for keyword in suspicious_keywords:
-            if keyword in content_lower:
-                keyword_mentions[keyword] += 1
-                found_keywords.append(keyword)
+    for comm, hits in zip(nadia_communications, term_hits):
+        found_keywords = hits["suspicious"]
+        keyword_mentions.update(found_keywords)
         
         if found_keywords:
             suspicious_messages.append({
@@ -240,16 +384,15 @@ def analyze_nadia_data(nadia_communications):
     
     # Find permit-related communications
     permit_related = []
-    for comm in nadia_communications:
-        content_lower = comm["content"].lower()
-        if any(term in content_lower for term in ["permit", "authorization", "approval", "clearance", "license"]):
+    for comm, hits in zip(nadia_communications, term_hits):
+        if hits["permit"]:
             permit_related.append(comm)
     
     # Create network data
     network_nodes = [{
-        "id": "Nadia Conti",
-        "name": "Nadia Conti",
-        "type": "Person",
+        "id": entity_id,
+        "name": entity_id,
+        "type": entity_type,
         "category": "central",
         "communication_count": len(nadia_communications)
     }]
@@ -268,7 +411,7 @@ def analyze_nadia_data(nadia_communications):
             })
             
             network_links.append({
-                "source": "Nadia Conti",
+                "source": entity_id,
                 "target": contact,
                 "weight": count,
                 "type": "communication"
@@ -276,14 +419,13 @@ def analyze_nadia_data(nadia_communications):
     
     # Create timeline events
     timeline_events = []
-    for i, comm in enumerate(nadia_communications):
+    for i, (comm, hits) in enumerate(zip(nadia_communications, term_hits)):
         event_type = "normal"
         
         # Determine event type based on content
-        content_lower = comm["content"].lower()
-        if any(keyword in content_lower for keyword in ["secret", "private", "illegal", "bribe", "unauthorized", "corruption"]):
+        if hits["alert"]:
             event_type = "suspicious"
-        elif any(term in content_lower for term in ["permit", "authorization", "approval", "clearance", "license"]):
+        elif hits["permit"]:
             event_type = "permit_related"
         
         timeline_events.append({
@@ -300,51 +442,107 @@ def analyze_nadia_data(nadia_communications):
         })
     
     # Generate suspicion analysis
+    suspicion_indicators, recommendation = assess_suspicion(
+        total_comms=len(nadia_communications),
+        late_night=time_patterns["late_night"],
+        keyword_total=sum(keyword_mentions.values()),
+        keywords=list(keyword_mentions.keys()),
+        permit_count=len(permit_related),
+        high_contacts=[contact for contact, count in contacts.items() if count > 5],
+        suspicious_count=len(suspicious_messages),
+    )
+    
+    # Prepare response data
+    response_data = {
+        "nadia_profile": {
+            "total_communications": len(nadia_communications),
+            "date_range": {
+                "start": nadia_communications[0]["date"] if nadia_communications else None,
+                "end": nadia_communications[-1]["date"] if nadia_communications else None
+            },
+            "top_contacts": dict(contacts.most_common(10))
+        },
+        "communication_patterns": {
+            "time_distribution": time_patterns,
+            "hourly_distribution": hourly_distribution,
+            "suspicious_messages_count": len(suspicious_messages)
+        },
+        "keyword_analysis": {
+            "keyword_mentions": dict(keyword_mentions.most_common(15)),
+            "suspicious_messages": suspicious_messages[:20]  # Top 20 most suspicious
+        },
+        "authority_patterns": {
+            "permit_related": permit_related,
+            "authority_abuse_indicators": []
+        },
+        "network_data": {
+            "nodes": network_nodes,
+            "links": network_links,
+            "layout": graph_layout(network_nodes, network_links)
+        },
+        "timeline": timeline_events,
+        "suspicion_analysis": {
+            "indicators": suspicion_indicators,
+            "overall_score": len(suspicion_indicators),
+            "recommendation": recommendation
+        }
+    }
+    
+    logger.info(f"Generated analysis with {len(suspicion_indicators)} indicators, recommendation: {recommendation}")
+    logger.info(f"Analysis summary: {len(nadia_communications)} communications, {len(contacts)} contacts, {len(keyword_mentions)} suspicious keywords")
+    
+    return response_data
+
+def assess_suspicion(total_comms, late_night, keyword_total, keywords, permit_count,
+                     high_contacts, suspicious_count):
+    """Suspicion indicators and recommendation from an entity's summary counts
+    
+    ``keywords`` are the distinct suspicious keywords in order of first
+    mention, ``high_contacts`` the contacts with more than five messages in
+    order of first contact.
+    """
     suspicion_indicators = []
     
     # Check for unusual timing patterns
-    total_comms = len(nadia_communications)
-    late_night_percent = time_patterns["late_night"] / total_comms if total_comms > 0 else 0
+    late_night_percent = late_night / total_comms if total_comms > 0 else 0
     
     if late_night_percent > 0.15:  # More than 15%
         suspicion_indicators.append({
             "type": "timing",
-            "description": f"Unusually high number of late-night communications ({time_patterns['late_night']} out of {total_comms} total, {late_night_percent:.1%})",
+            "description": f"Unusually high number of late-night communications ({late_night} out of {total_comms} total, {late_night_percent:.1%})",
             "severity": "medium"
         })
     
     # Check for suspicious keywords
-    if len(keyword_mentions) > 0:
-        total_keyword_count = sum(keyword_mentions.values())
-        top_keywords = list(keyword_mentions.keys())[:5]
+    if len(keywords) > 0:
+        top_keywords = keywords[:5]
         suspicion_indicators.append({
             "type": "content",
-            "description": f"Multiple suspicious keywords detected ({total_keyword_count} mentions): {', '.join(top_keywords)}",
-            "severity": "high" if len(keyword_mentions) > 5 else "medium"
+            "description": f"Multiple suspicious keywords detected ({keyword_total} mentions): {', '.join(top_keywords)}",
+            "severity": "high" if len(keywords) > 5 else "medium"
         })
     
     # Check for permit-related activity
-    if len(permit_related) > 3:
+    if permit_count > 3:
         suspicion_indicators.append({
             "type": "authority_abuse", 
-            "description": f"Frequent involvement in permit-related communications ({len(permit_related)} instances)",
+            "description": f"Frequent involvement in permit-related communications ({permit_count} instances)",
             "severity": "high"
         })
     
     # Check for concentrated communication patterns
-    high_contact_entities = [contact for contact, count in contacts.items() if count > 5]
-    if len(high_contact_entities) > 2:
+    if len(high_contacts) > 2:
         suspicion_indicators.append({
             "type": "network",
-            "description": f"Frequent communication with specific entities: {', '.join(high_contact_entities[:3])}",
+            "description": f"Frequent communication with specific entities: {', '.join(high_contacts[:3])}",
             "severity": "medium"
         })
     
     # Check for suspicious message content
-    if len(suspicious_messages) > 5:
+    if suspicious_count > 5:
         suspicion_indicators.append({
             "type": "content_analysis",
-            "description": f"High number of messages containing suspicious keywords ({len(suspicious_messages)} messages)",
+            "description": f"High number of messages containing suspicious keywords ({suspicious_count} messages)",
             "severity": "high"
         })
     
@@ -359,45 +557,7 @@ def analyze_nadia_data(nadia_communications):
     else:
         recommendation = "LOW RISK"
     
-    # Prepare response data
-    response_data = {
-        "nadia_profile": {
-            "total_communications": len(nadia_communications),
-            "date_range": {
-                "start": nadia_communications[0]["date"] if nadia_communications else None,
-                "end": nadia_communications[-1]["date"] if nadia_communications else None
-            },
-            "top_contacts": dict(contacts.most_common(10))
-        },
-        "communication_patterns": {
-            "time_distribution": time_patterns,
-            "hourly_distribution": hourly_distribution,
-            "suspicious_messages_count": len(suspicious_messages)
-        },
-        "keyword_analysis": {
-            "keyword_mentions": dict(keyword_mentions.most_common(15)),
-            "suspicious_messages": suspicious_messages[:20]  # Top 20 most suspicious
-        },
-        "authority_patterns": {
-            "permit_related": permit_related,
-            "authority_abuse_indicators": []
-        },
-        "network_data": {
-            "nodes": network_nodes,
-            "links": network_links
-        },
-        "timeline": timeline_events,
-        "suspicion_analysis": {
-            "indicators": suspicion_indicators,
-            "overall_score": len(suspicion_indicators),
-            "recommendation": recommendation
-        }
-    }
-    
-    logger.info(f"Generated analysis with {len(suspicion_indicators)} indicators, recommendation: {recommendation}")
-    logger.info(f"Analysis summary: {len(nadia_communications)} communications, {len(contacts)} contacts, {len(keyword_mentions)} suspicious keywords")
-    
-    return response_data
+    return suspicion_indicators, recommendation
 
 def create_sample_analysis():
     """Create sample analysis data for testing when no real data is found"""
@@ -1,9 +1,10 @@
-import os
-import json
-from datetime import datetime
 import logging
-from collections import defaultdict
+import numpy as np
 from flask import current_app
+from app.core.adjacency import adjacency_index
+from app.core.dataset import dataset_version, store
+from app.core.events import WEEKDAYS, event_index
+from app.core.postings import PostingIndex, decode_cursor, encode_cursor, page
 
 # Metadata
 NAME = "time_patterns"
@@ -13,198 +14,279 @@ DESCRIPTION = "Visualization of event timing patterns with filtering capabilitie
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Edge types that attach supporting evidence to an event
+EVIDENCE_TYPES = ["evidence_for", "related_to", "supports"]
 
-def get_data():
-    try:
-        data_file = current_app.config["DATA_FILE"]
-        # Load the MC3 graph data
-        logger.info(f"Loading graph data from: {data_file}")
+# Raw nodes and edges are sent once in shared tables and referenced by index
+NORMALIZE = {"raw": "nodes", "edge": "edges"}
 
-        with open(data_file, "r") as f:
-            graph_data = json.load(f)
+# Query parameter -> posting list dimension
+FILTER_PARAMS = {
+    "event_type": "event_type",
+    "source_type": "source_type",
+    "target_type": "target_type",
+    "source_entity": "source_entity",
+    "target_entity": "target_entity",
+    "entity": "entity",
+    "date": "date",
+}
 
-        # Create node lookup dictionary
-        node_map = {node["id"]: node for node in graph_data["nodes"]}
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
 
-        # Create evidence map
-        evidence_map = defaultdict(list)
 
-        # First pass: Process evidence edges
-        for edge in graph_data["edges"]:
-            if edge.get("type") in ["evidence_for", "related_to", "supports"]:
-                evidence_map[edge["target"]].append(
-                    {"source": edge["source"], "edge": edge}
-                )
+def _connection(node, edge):
+    return {
+        "id": node["id"],
+        "name": node.get("name", "Unknown"),
+        "sub_type": node.get("sub_type", "Unknown"),
+        "raw": node,
+        "edge": edge,
+    }
+
+
+class TimePatterns:
+    """Event objects of the time patterns view plus their inverted indexes
+
+    ``events`` keeps the file order used by the unfiltered payload;
+    ``order`` lists event positions chronologically and the posting lists
+    hold ranks into ``order``, so filtered pages come back sorted by time.
+    """
+
+    def __init__(self, events, filter_options, order, postings):
+        self.events = events
+        self.filter_options = filter_options
+        self.order = order
+        self.postings = postings
+        self.hours = np.array([e["hour"] for e in events], dtype=np.int64)[order]
+        self.type_names = sorted({e["sub_type"] for e in events})
+        type_code = {name: i for i, name in enumerate(self.type_names)}
+        self.type_codes = np.array([type_code[e["sub_type"]] for e in events], dtype=np.int64)[order]
+
+    def counts(self, ranks):
+        """Hourly and type x hour event counts over the selected ranks"""
+        hours = self.hours[ranks]
+        hourly = np.bincount(hours, minlength=24)[:24]
+        by_type = np.zeros((len(self.type_names), 24), dtype=np.int64)
+        np.add.at(by_type, (self.type_codes[ranks], hours), 1)
+        return {
+            "hourly_counts": hourly.tolist(),
+            "type_counts": {
+                name: by_type[i].tolist()
+                for i, name in enumerate(self.type_names)
+                if by_type[i].any()
+            },
+        }
+
 
-        # Create source/target relationships
-        event_connections = defaultdict(lambda: {"sources": [], "targets": []})
+def build_time_patterns(graph_data, adjacency, index):
+    nodes = graph_data["nodes"]
+    edges = graph_data["edges"]
 
-        # Second pass: Process all relationships
-        for edge in graph_data["edges"]:
-            source_id = edge["source"]
-            target_id = edge["target"]
+    # Extract events with timestamps and connections
+    events = []
+    event_types = set()
+    source_types = set()
+    target_types = set()
+    source_entities = set()
+    target_entities = set()
+    unique_dates = set()
 
-            source_node = node_map.get(source_id)
-            target_node = node_map.get(target_id)
+    for row in np.flatnonzero(index.has_timestamp):
+        node = nodes[index.node_pos[row]]
+        event_text = index.text(row)
 
-            if not source_node or not target_node:
-                continue
+        if index.valid[row]:
+            date = index.date(row)
+            time = index.time(row)
+            day_of_week = WEEKDAYS[index.weekday[row]]
 
-            # Entity -> Event (source)
-            if (
-                source_node.get("type") == "Entity"
-                and target_node.get("type") == "Event"
-            ):
-                event_connections[target_id]["sources"].append(
+            pos = index.node_pos[row]
+
+            # Get connections for this event: Entity -> Event and Event -> Entity
+            connections = {"sources": [], "targets": []}
+            for source, edge_pos in zip(*adjacency.in_edges(pos)):
+                if adjacency.node_types[source] == "Entity":
+                    connections["sources"].append(
+                        _connection(nodes[source], edges[edge_pos])
+                    )
+            for target, edge_pos in zip(*adjacency.out_edges(pos)):
+                if adjacency.node_types[target] == "Entity":
+                    connections["targets"].append(
+                        _connection(nodes[target], edges[edge_pos])
+                    )
+
+            # Get evidence for this event
+            evidence = []
+            for source, edge_pos in zip(*adjacency.in_edges(pos, EVIDENCE_TYPES)):
+                source_node = nodes[source]
+                evidence.append(
                     {
-                        "id": source_id,
-                        "name": source_node.get("name", "Unknown"),
-                        "sub_type": source_node.get("sub_type", "Unknown"),
+                        "source_id": source_node["id"],
+                        "source_type": source_node.get("type", "Unknown"),
+                        "source_sub_type": source_node.get("sub_type", "Unknown"),
+                        "edge": edges[edge_pos],
                         "raw": source_node,
-                        "edge": edge,
                     }
                 )
 
-            # Event -> Entity (target)
-            if (
-                source_node.get("type") == "Event"
-                and target_node.get("type") == "Entity"
-            ):
-                event_connections[source_id]["targets"].append(
-                    {
-                        "id": target_id,
-                        "name": target_node.get("name", "Unknown"),
-                        "sub_type": target_node.get("sub_type", "Unknown"),
-                        "raw": target_node,
-                        "edge": edge,
-                    }
-                )
+            # Create event object
+            event_obj = {
+                "id": node["id"],
+                "raw": node,
+                "sub_type": node.get("sub_type", "Unknown"),
+                "hour": int(index.hour[row]),
+                "minute": int(index.minute[row]),
+                "day_of_week": day_of_week,
+                "full_timestamp": f"{date} {time} ({day_of_week})",
+                "date": date,
+                "time": time,
+                "text": event_text,
+                "sources": connections["sources"],
+                "targets": connections["targets"],
+                "evidence": evidence,
+            }
 
-        # Extract events with timestamps and connections
-        events = []
-        event_types = set()
-        source_types = set()
-        target_types = set()
-        source_entities = set()
-        target_entities = set()
-        unique_dates = set()
-
-        for node in graph_data["nodes"]:
-            if node.get("type") == "Event":
-                timestamp = None
-                event_text = (
-                    node.get("content")
-                    or node.get("findings")
-                    or node.get("results")
-                    or ""
-                )
+            events.append(event_obj)
+
+            # Update filter options
+            event_types.add(node.get("sub_type", "Unknown"))
+            unique_dates.add(date)
+
+            for source in connections["sources"]:
+                source_types.add(source.get("sub_type", "Unknown"))
+                source_entities.add(source.get("name", "Unknown"))
+
+            for target in connections["targets"]:
+                target_types.add(target.get("sub_type", "Unknown"))
+                target_entities.add(target.get("name", "Unknown"))
+        else:
+            logger.warning(
+                f"Error parsing timestamp '{index.raw_timestamps[row]}' for event {node.get('id')}"
+            )
+            # Create a fallback event object with minimal data
+            event_obj = {
+                "id": node["id"],
+                "raw": node,
+                "sub_type": node.get("sub_type", "Unknown"),
+                "hour": 0,
+                "minute": 0,
+                "day_of_week": "Unknown",
+                "full_timestamp": "Unknown",
+                "date": "Unknown",
+                "time": "00:00:00",
+                "text": event_text,
+                "sources": [],
+                "targets": [],
+                "evidence": [],
+            }
+            events.append(event_obj)
+
+    logger.info(f"Processed {len(events)} events")
 
-                # Handle different timestamp attributes
-                if node.get("timestamp"):
-                    timestamp = node["timestamp"]
-                elif node.get("date") and node.get("time"):
-                    timestamp = f"{node['date']} {node['time']}"
-                elif node.get("date"):
-                    timestamp = node["date"]
-
-                if timestamp:
-                    try:
-                        # Parse timestamp (handle different formats)
-                        if " " in timestamp:
-                            dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                        else:
-                            dt = datetime.strptime(timestamp, "%Y-%m-%d")
-
-                        # Get connections for this event
-                        connections = event_connections.get(
-                            node["id"], {"sources": [], "targets": []}
-                        )
-
-                        # Get evidence for this event
-                        evidence = []
-                        for ev in evidence_map.get(node["id"], []):
-                            source_node = node_map.get(ev["source"])
-                            if source_node:
-                                evidence.append(
-                                    {
-                                        "source_id": ev["source"],
-                                        "source_type": source_node.get(
-                                            "type", "Unknown"
-                                        ),
-                                        "source_sub_type": source_node.get(
-                                            "sub_type", "Unknown"
-                                        ),
-                                        "edge": ev["edge"],
-                                        "raw": source_node,
-                                    }
-                                )
-
-                        # Create event object
-                        event_obj = {
-                            "id": node["id"],
-                            "raw": node,
-                            "sub_type": node.get("sub_type", "Unknown"),
-                            "hour": dt.hour,
-                            "minute": dt.minute,
-                            "day_of_week": dt.strftime("%A"),
-                            "full_timestamp": f"{dt.strftime('%Y-%m-%d %H:%M:%S')} ({dt.strftime('%A')})",
-                            "date": dt.strftime("%Y-%m-%d"),
-                            "time": dt.strftime("%H:%M:%S"),
-                            "text": event_text,
-                            "sources": connections["sources"],
-                            "targets": connections["targets"],
-                            "evidence": evidence,
-                        }
-
-                        events.append(event_obj)
-
-                        # Update filter options
-                        event_types.add(node.get("sub_type", "Unknown"))
-                        unique_dates.add(dt.strftime("%Y-%m-%d"))
-
-                        for source in connections["sources"]:
-                            source_types.add(source.get("sub_type", "Unknown"))
-                            source_entities.add(source.get("name", "Unknown"))
-
-                        for target in connections["targets"]:
-                            target_types.add(target.get("sub_type", "Unknown"))
-                            target_entities.add(target.get("name", "Unknown"))
-
-                    except Exception as e:
-                        logger.warning(
-                            f"Error parsing timestamp '{timestamp}' for event {node.get('id')}: {str(e)}"
-                        )
-                        # Create a fallback event object with minimal data
-                        event_obj = {
-                            "id": node["id"],
-                            "raw": node,
-                            "sub_type": node.get("sub_type", "Unknown"),
-                            "hour": 0,
-                            "minute": 0,
-                            "day_of_week": "Unknown",
-                            "full_timestamp": "Unknown",
-                            "date": "Unknown",
-                            "time": "00:00:00",
-                            "text": event_text,
-                            "sources": [],
-                            "targets": [],
-                            "evidence": [],
-                        }
-                        events.append(event_obj)
-
-        logger.info(f"Processed {len(events)} events")
-
-        # Convert sets to sorted lists for filter options
-        filter_options = {
-            "event_types": sorted(event_types),
-            "source_types": sorted(source_types),
-            "target_types": sorted(target_types),
-            "source_entities": sorted(source_entities),
-            "target_entities": sorted(target_entities),
-            "dates": sorted(unique_dates),
+    # Convert sets to sorted lists for filter options
+    filter_options = {
+        "event_types": sorted(event_types),
+        "source_types": sorted(source_types),
+        "target_types": sorted(target_types),
+        "source_entities": sorted(source_entities),
+        "target_entities": sorted(target_entities),
+        "dates": sorted(unique_dates),
+    }
+
+    # Chronological order (undated events first), stable on file order
+    order = np.array(
+        sorted(range(len(events)), key=lambda i: (
+            events[i]["date"] if events[i]["date"] != "Unknown" else "",
+            events[i]["time"],
+        )),
+        dtype=np.int64,
+    )
+
+    postings = PostingIndex()
+    for rank, position in enumerate(order):
+        event = events[position]
+        postings.add("event_type", event["sub_type"], rank)
+        postings.add("date", event["date"], rank)
+        for source in event["sources"]:
+            postings.add("source_type", source["sub_type"], rank)
+            postings.add("source_entity", source["name"], rank)
+            postings.add("entity", source["name"], rank)
+        for target in event["targets"]:
+            postings.add("target_type", target["sub_type"], rank)
+            postings.add("target_entity", target["name"], rank)
+            postings.add("entity", target["name"], rank)
+    postings.freeze(len(events))
+
+    return TimePatterns(events, filter_options, order, postings)
+
+
+def time_patterns(data_file):
+    """Events and posting lists, built once per version of the data file"""
+    return store.derive(
+        data_file,
+        "time_patterns",
+        lambda data: build_time_patterns(
+            data, adjacency_index(path=data_file), event_index(path=data_file)
+        ),
+    )
+
+
+def _values(value):
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value if str(v)]
+    return [v for v in str(value).split(",") if v]
+
+
+def _paging(params, version):
+    """(limit, position after which the page starts) of a request
+
+    Raises ValueError for a non-integer ``limit`` and for a malformed or
+    stale ``cursor`` (see ``decode_cursor``).
+    """
+    try:
+        limit = min(max(int(params.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except (TypeError, ValueError):
+        raise ValueError(f"limit must be an integer, got {params.get('limit')!r}") from None
+    cursor = params.get("cursor")
+    return limit, decode_cursor(cursor, version) if cursor else None
+
+
+def get_data(**params):
+    # Bad paging parameters are the caller's error: raised for the route to answer 400
+    version = dataset_version()
+    limit, after = _paging(params, version)
+    paginated = "limit" in params or "cursor" in params
+
+    try:
+        data_file = current_app.config["DATA_FILE"]
+        logger.info(f"Loading graph data from: {data_file}")
+        patterns = time_patterns(data_file)
+
+        filters = {
+            dimension: _values(params[param])
+            for param, dimension in FILTER_PARAMS.items()
+            if _values(params.get(param, ""))
         }
 
-        return {"events": events, "filter_options": filter_options}
+        # Without filters or pagination keep returning the complete event set
+        if not filters and not paginated:
+            return {"events": patterns.events, "filter_options": patterns.filter_options}
+
+        ranks = patterns.postings.select(filters)
+        page_ranks, last = page(ranks, after, limit)
+
+        result = {
+            "events": [patterns.events[i] for i in patterns.order[page_ranks]],
+            "total": int(len(ranks)),
+            "limit": limit,
+            "next_cursor": encode_cursor(version, last) if last is not None else None,
+        }
+        # Options and aggregates describe the whole selection, sent with the first page only
+        if after is None:
+            result["filter_options"] = patterns.filter_options
+            result.update(patterns.counts(ranks))
+        return result
 
     except Exception as e:
         logger.exception("Error in get_data for time_patterns")
@@ -1,13 +1,11 @@
-import json
 import logging
 import numpy as np
 from collections import defaultdict
-from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
-from sklearn.metrics import pairwise_distances
-from bertopic import BERTopic
-from bertopic.representation import KeyBERTInspired
 from flask import current_app
+from app.core.cache import corpus_key, topic_cache
+from app.core.dataset import store
+from app.core.embeddings import embedding_store
+from app.core.layout import graph_layout
 import re
 
 logger = logging.getLogger(__name__)
@@ -16,6 +14,17 @@ NAME = "topic_modeling"
 TITLE = "Topic Modeling Explorer"
 DESCRIPTION = "Visualize entity participation in different communication topics"
 
+# Methods offered by the UI and the parameter grid warmed by `flask precompute`
+TOPIC_METHODS = ["bertopic", "lda?vectorizer=tfidf", "lda?vectorizer=bow", "tfidf"]
+TOPIC_COUNTS = ["auto"] + [str(n) for n in range(5, 21)]
+# BERTopic picks its own number of topics, so the UI leaves num_topics out for it
+COUNTED_METHODS = [m for m in TOPIC_METHODS if m != "bertopic"]
+PRECOMPUTE_GRID = [{"method": "bertopic"}, {"method": COUNTED_METHODS, "num_topics": TOPIC_COUNTS}]
+
+# No NORMALIZE: no object is repeated in the payload. Message content, half
+# of it, is distinct per message; callers that do not show it drop it with
+# fields=-messages.content
+
 # Common stopwords for filtering
 STOPWORDS = set(
     [
@@ -90,9 +99,13 @@ def is_meaningful_text(text, min_words=3):
     return len(meaningful_words) >= min_words
 
 
-def get_data(method="bertopic", **kwargs):
-    logger.debug(f"Generating topic modeling data with method: {method}")
+def message_topics(method="bertopic", num_topics="auto", min_topic_size=5):
+    """Meaningful messages of the communication file and their fitted topics
 
+    Returns ``communications`` (one dict per message), the ``method`` and
+    ``vectorizer`` used and the cached fit (``topics``, ``doc_topics``,
+    ``metrics``), or ``{"error": ...}``.
+    """
     # Parse vectorizer for LDA
     vectorizer_type = "tfidf"
     if method.startswith("lda"):
@@ -101,18 +114,13 @@ def get_data(method="bertopic", **kwargs):
         if len(parts) > 1:
             vectorizer_type = parts[1].split("=")[1] if "=" in parts[1] else "tfidf"
 
-    # Get topic count parameters
-    num_topics = kwargs.get("num_topics", "auto")
-    min_topic_size = kwargs.get("min_topic_size", 5)
-
     # Load communication data
     data_file = current_app.config.get("COMMUNICATION_FILE")
     if not data_file:
         return {"error": "Communication file not configured"}
 
     try:
-        with open(data_file, "r") as f:
-            comm_data = json.load(f)
+        comm_data = store.load(data_file)
     except Exception as e:
         return {"error": f"Could not load communication data: {str(e)}"}
 
@@ -139,7 +147,7 @@ def get_data(method="bertopic", **kwargs):
     logger.debug(f"Found {len(communications)} meaningful communications")
 
     # Apply topic modeling based on method
-    metrics = {}
+    texts = [c["content"] for c in communications]
     if method == "tfidf":
         # Handle auto topic count for TF-IDF
         tfidf_num_topics = num_topics
@@ -151,26 +159,29 @@ def get_data(method="bertopic", **kwargs):
             except:
                 tfidf_num_topics = 10
         
-        topics, doc_topics = extract_topics_tfidf(
-            [c["content"] for c in communications], num_topics=tfidf_num_topics
-        )
-        metrics = calculate_tfidf_metrics(topics)
+        result = fit_topics(texts, "tfidf", num_topics=tfidf_num_topics, with_metrics=True)
     elif method == "lda":
-        topics, doc_topics, lda_model, vectorizer = extract_topics_lda(
-            [c["content"] for c in communications],
-            num_topics=num_topics,
-            vectorizer=vectorizer_type,
-        )
-        metrics = calculate_lda_metrics(
-            lda_model, vectorizer, [c["content"] for c in communications]
+        result = fit_topics(
+            texts, "lda", num_topics=num_topics, vectorizer=vectorizer_type, with_metrics=True
         )
     else:  # Default to BERTopic
-        topics, doc_topics, topic_model = extract_topics_bertopic(
-            [c["content"] for c in communications], min_topic_size=min_topic_size
-        )
-        metrics = calculate_bertopic_metrics(
-            topic_model, [c["content"] for c in communications]
+        result = fit_topics(
+            texts, "bertopic", min_topic_size=min_topic_size, with_metrics=True
         )
+    return dict(result, communications=communications, method=method, vectorizer=vectorizer_type)
+
+
+def get_data(method="bertopic", **kwargs):
+    logger.debug(f"Generating topic modeling data with method: {method}")
+    result = message_topics(
+        method, kwargs.get("num_topics", "auto"), kwargs.get("min_topic_size", 5)
+    )
+    if result.get("error"):
+        return result
+    communications = result["communications"]
+    method, vectorizer_type = result["method"], result["vectorizer"]
+    comm_data = store.load(current_app.config["COMMUNICATION_FILE"])
+    topics, doc_topics, metrics = result["topics"], result["doc_topics"], result["metrics"]
 
     # Calculate entity topic scores
     entity_topic_scores = defaultdict(lambda: defaultdict(float))
@@ -306,7 +317,7 @@ def get_data(method="bertopic", **kwargs):
                 }
             )
 
-    graph = {"nodes": nodes, "edges": edges}
+    graph = {"nodes": nodes, "edges": edges, "layout": graph_layout(nodes, edges)}
 
     return {
         "graph": graph,
@@ -321,12 +332,69 @@ def get_data(method="bertopic", **kwargs):
     }
 
 
+def fit_topics(
+    texts,
+    method="bertopic",
+    num_topics="auto",
+    vectorizer="tfidf",
+    min_topic_size=5,
+    with_metrics=False,
+):
+    """Fit a topic model, reusing the cached result for the same corpus and parameters
+
+    Returns a dict with ``topics``, ``doc_topics`` and ``metrics`` (empty
+    unless ``with_metrics`` is set). When LDA or BERTopic fails and the
+    TF-IDF fallback answers instead, the result is not cached under the
+    failed method's key, so the method is tried again next time.
+    """
+    params = {
+        "method": method,
+        "num_topics": num_topics if method != "bertopic" else "none",
+        "vectorizer": vectorizer if method == "lda" else "none",
+        "min_topic_size": min_topic_size if method == "bertopic" else "none",
+        "with_metrics": with_metrics,
+    }
+    key = corpus_key(texts, **params)
+    result = topic_cache.get_or_compute(
+        key,
+        lambda: _fit_topics(texts, method, num_topics, vectorizer, min_topic_size, with_metrics),
+        keep=lambda result: not result["fallback"],
+    )
+    # Entries cached before the flag was stored lack it
+    result.pop("fallback", None)
+    return result
+
+
+def _fit_topics(texts, method, num_topics, vectorizer, min_topic_size, with_metrics):
+    metrics = {}
+    fallback = False
+    if method == "tfidf":
+        topics, doc_topics = extract_topics_tfidf(texts, num_topics=num_topics)
+        if with_metrics:
+            metrics = calculate_tfidf_metrics(topics)
+    elif method == "lda":
+        topics, doc_topics, lda_model, vectorizer_model, fallback = extract_topics_lda(
+            texts, num_topics=num_topics, vectorizer=vectorizer
+        )
+        if with_metrics:
+            metrics = calculate_lda_metrics(lda_model, vectorizer_model, texts)
+    else:
+        topics, doc_topics, topic_model, fallback = extract_topics_bertopic(
+            texts, min_topic_size=min_topic_size
+        )
+        if with_metrics:
+            metrics = calculate_bertopic_metrics(topic_model, texts)
+    return {"topics": topics, "doc_topics": doc_topics, "metrics": metrics, "fallback": fallback}
+
+
 def extract_topics_tfidf(texts, num_topics=15):
     """Extract topics using TF-IDF keywords - each high-scoring term is treated as a separate topic"""
     if len(texts) < 2:
         return [["insufficient", "data"]], [[1.0] for _ in texts]
 
     try:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
         # Create TF-IDF matrix
         tfidf = TfidfVectorizer(
             stop_words="english",
@@ -372,9 +440,13 @@ def extract_topics_tfidf(texts, num_topics=15):
 
 
 def extract_topics_lda(texts, num_topics="auto", vectorizer="tfidf", top_n=10):
-    """Extract topics using LDA with choice of vectorizer"""
+    """Extract topics using LDA with choice of vectorizer
+
+    The last value is True when LDA failed and the topics come from the
+    TF-IDF fallback.
+    """
     if len(texts) < 5:
-        return [["insufficient", "data"]], [[1.0] for _ in texts], None, None
+        return [["insufficient", "data"]], [[1.0] for _ in texts], None, None, False
 
     # Determine number of topics
     if num_topics == "auto":
@@ -386,6 +458,9 @@ def extract_topics_lda(texts, num_topics="auto", vectorizer="tfidf", top_n=10):
             num_topics = 5
 
     try:
+        from sklearn.decomposition import LatentDirichletAllocation
+        from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
         # Create vectorizer with more lenient parameters for small datasets
         if vectorizer == "bow":
             vectorizer_model = CountVectorizer(
@@ -429,24 +504,37 @@ def extract_topics_lda(texts, num_topics="auto", vectorizer="tfidf", top_n=10):
         # Get document topic distributions
         doc_topics = lda.transform(dtm).tolist()
 
-        return topics, doc_topics, lda, vectorizer_model
+        return topics, doc_topics, lda, vectorizer_model, False
     except Exception as e:
         logger.error(f"LDA extraction failed: {str(e)}")
         # Fallback to TF-IDF
         topics, doc_topics = extract_topics_tfidf(texts)
-        return topics, doc_topics, None, None
+        return topics, doc_topics, None, None, True
 
 
 def extract_topics_bertopic(texts, min_topic_size=5, top_n=10):
-    """Extract topics using BERTopic"""
+    """Extract topics using BERTopic
+
+    The last value is True when BERTopic failed and the topics come from
+    the TF-IDF fallback.
+    """
     if len(texts) < min_topic_size * 2:
         min_topic_size = max(2, len(texts) // 4)
 
     try:
+        # Heavy imports (sentence-transformers, UMAP, HDBSCAN, numba) only when BERTopic runs
+        from bertopic import BERTopic
+        from bertopic.representation import KeyBERTInspired
+
         # Use KeyBERT for better keyword extraction
         representation_model = KeyBERTInspired()
 
+        # Precomputed embeddings: each unique message is encoded only once
+        embedder = embedding_store()
+        embeddings = embedder.embed(texts)
+
         topic_model = BERTopic(
+            embedding_model=embedder.encoder,
             min_topic_size=min_topic_size,
             nr_topics="auto",
             language="english",
@@ -454,7 +542,7 @@ def extract_topics_bertopic(texts, min_topic_size=5, top_n=10):
             representation_model=representation_model,
             verbose=False,
         )
-        topics, probs = topic_model.fit_transform(texts)
+        topics, probs = topic_model.fit_transform(texts, embeddings=embeddings)
 
         # Get topic keywords
         topic_keywords = {}
@@ -471,7 +559,7 @@ def extract_topics_bertopic(texts, min_topic_size=5, top_n=10):
 
         if not topic_keywords:
             # Fallback if no topics found
-            return extract_topics_tfidf(texts) + (None,)
+            return extract_topics_tfidf(texts) + (None, False)
 
         # Prepare document topic weights
         doc_topics = []
@@ -491,12 +579,12 @@ def extract_topics_bertopic(texts, min_topic_size=5, top_n=10):
             else:
                 topics_list.append([])
 
-        return topics_list, doc_topics, topic_model
+        return topics_list, doc_topics, topic_model, False
     except Exception as e:
         logger.error(f"BERTopic failed: {str(e)}")
         # Fallback to TF-IDF
         topics, doc_topics = extract_topics_tfidf(texts)
-        return topics, doc_topics, None
+        return topics, doc_topics, None, True
 
 
 def calculate_tfidf_metrics(topics):
@@ -558,8 +646,8 @@ def calculate_bertopic_metrics(topic_model, texts):
         return {}
 
     try:
-        # Get topics and probabilities
-        topics, probs = topic_model.transform(texts)
+        # Get topics and probabilities, reusing the stored embeddings
+        topics, probs = topic_model.transform(texts, embeddings=embedding_store().embed(texts))
 
         # Diversity
         topic_info = topic_model.get_topic_info()
@@ -575,6 +663,8 @@ def calculate_bertopic_metrics(topic_model, texts):
         # Coherence (using topic similarity)
         topic_embeddings = topic_model.topic_embeddings_
         if topic_embeddings is not None and len(topic_embeddings) > 1:
+            from sklearn.metrics import pairwise_distances
+
             distances = pairwise_distances(topic_embeddings, metric="cosine")
             np.fill_diagonal(distances, np.nan)
             avg_distance = np.nanmean(distances)
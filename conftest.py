@@ -0,0 +1,45 @@
+import os
+import shutil
+
+import pytest
+
+from app import app, response_cache
+from app.core.cache import topic_cache
+from app.core.dataset import DATA_CONFIG_KEYS, store
+
+SETTINGS = ["CACHE_DIR", "ARTIFACT_DIR", "WATCH_DATA_INTERVAL"]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """The app, in an app context, reading copies of its data files in ``tmp_path``
+
+    Every test starts with an empty dataset store and empty response and
+    topic caches, so ingests and edits never touch ``data/``.
+    """
+    original = {key: app.config.get(key) for key in DATA_CONFIG_KEYS + SETTINGS}
+    copies = {}
+    for key in DATA_CONFIG_KEYS:
+        path = original[key]
+        if path:
+            copies.setdefault(path, shutil.copy(path, tmp_path / os.path.basename(path)))
+            app.config[key] = str(copies[path])
+    app.config.update({
+        "CACHE_DIR": str(tmp_path / "cache"),
+        "ARTIFACT_DIR": str(tmp_path / "artifacts"),
+        "WATCH_DATA_INTERVAL": 0,
+    })
+    settings = store.compile, store.check_files
+    store.compile, store.check_files = False, True
+    store.clear()
+    response_cache.clear()
+    topic_cache.clear()
+    try:
+        with app.app_context():
+            yield app
+    finally:
+        app.config.update(original)
+        store.compile, store.check_files = settings
+        store.clear()
+        response_cache.clear()
+        topic_cache.clear()
@@ -0,0 +1,74 @@
+from app.core.benchmark import NOISE_FLOOR, compare, scale_messages
+
+GRAPH = {
+    "directed": True,
+    "nodes": [
+        {"id": "Sam", "type": "Entity"},
+        {"id": "Nadia", "type": "Entity"},
+        {"id": "Event_Communication_1", "type": "Event", "sub_type": "Communication", "content": "hi"},
+        {"id": "Event_Monitoring_1", "type": "Event", "sub_type": "Monitoring"},
+    ],
+    "edges": [
+        {"id": "e1", "source": "Sam", "target": "Event_Communication_1", "type": "sent"},
+        {"id": "e2", "source": "Event_Communication_1", "target": "Nadia", "type": "received"},
+        {"id": "e3", "source": "Sam", "target": "Event_Monitoring_1", "type": "participant"},
+    ],
+}
+
+MESSAGES = {
+    "nodes": [{"id": "Sam"}, {"id": "Nadia"}],
+    "links": [{"source": "Sam", "target": "Nadia", "event_id": "Event_Communication_1", "content": "hi"}],
+}
+
+
+def test_scale_graph_copies_communications_with_their_edges():
+    scaled = scale_messages(GRAPH, 2)
+    assert [node["id"] for node in scaled["nodes"]] == [
+        "Sam", "Nadia", "Event_Communication_1", "Event_Monitoring_1", "Event_Communication_1#1",
+    ]
+    assert scaled["nodes"][-1]["content"] == "hi"
+    copies = scaled["edges"][len(GRAPH["edges"]):]
+    assert copies == [
+        {"id": "e1#1", "source": "Sam", "target": "Event_Communication_1#1", "type": "sent"},
+        {"id": "e2#1", "source": "Event_Communication_1#1", "target": "Nadia", "type": "received"},
+    ]
+    # The input is left as it was
+    assert len(GRAPH["nodes"]) == 4 and len(GRAPH["edges"]) == 3
+    assert scale_messages(GRAPH, 1) == GRAPH
+
+
+def test_scale_messages_copies_every_link():
+    scaled = scale_messages(MESSAGES, 3)
+    assert scaled["nodes"] == MESSAGES["nodes"]
+    assert [link["event_id"] for link in scaled["links"]] == [
+        "Event_Communication_1", "Event_Communication_1#1", "Event_Communication_1#2",
+    ]
+    assert all(link["source"] == "Sam" and link["target"] == "Nadia" for link in scaled["links"])
+
+
+def _results(**metrics):
+    return {"results": [{"case": "graph", "scale": 1, "error": None, **metrics}]}
+
+
+def test_compare_flags_growth_above_ratio_and_noise_floor():
+    floor = NOISE_FLOOR["seconds"]
+    baseline = _results(seconds=1.0, peak_bytes=None, payload_bytes=10_000)
+
+    # Slower by more than 25% and more than the floor
+    [regression] = compare(_results(seconds=1.5, payload_bytes=10_000), baseline)
+    assert regression["metric"] == "seconds" and regression["ratio"] == 1.5
+    # Within the tolerance
+    assert compare(_results(seconds=1.2, payload_bytes=10_000), baseline) == []
+    # A large ratio on a tiny value is noise
+    tiny = _results(seconds=floor / 10, payload_bytes=10)
+    assert compare(_results(seconds=floor / 2, payload_bytes=10 + NOISE_FLOOR["payload_bytes"]), tiny) == []
+    assert [r["metric"] for r in compare(_results(seconds=2 * floor, payload_bytes=10), tiny)] == ["seconds"]
+
+
+def test_compare_flags_new_errors():
+    baseline = _results(seconds=1.0)
+    failed = _results(seconds=0.1)
+    failed["results"][0]["error"] = "HTTP 500"
+    assert [r["metric"] for r in compare(failed, baseline)] == ["error"]
+    # Cases missing from the baseline are not compared
+    assert compare({"results": [{"case": "new", "scale": 1, "error": None, "seconds": 9.0}]}, baseline) == []
@@ -0,0 +1,67 @@
+import json
+from collections import defaultdict
+
+import networkx as nx
+import pytest
+
+from app.core.communities import CommunicationCommunities, RelationshipCommunities, communication_communities
+from app.core.dataset import Delta, store
+from app.core.events import event_index
+
+MESSAGES = [
+    {"source": "Nadia Conti", "target": "Sam", "event_id": f"Event_Communication_X{i}",
+     "datetime": f"2040-10-14 23:{i:02d}:00", "content": "The permit for the reef cargo is ready."}
+    for i in range(5)
+] + [{"source": "Sam", "target": "New Contact", "event_id": "Event_Communication_X9",
+      "datetime": "2040-10-15 01:00:00", "content": "Meet at the dock."}]
+
+
+def _check(incremental, fresh):
+    """Same weighted graph as a fresh build, with consistent community bookkeeping"""
+    assert incremental.adjacency == fresh.adjacency
+    assert incremental.degree == fresh.degree
+    assert incremental.total_weight == pytest.approx(fresh.total_weight)
+
+    degrees = defaultdict(float)
+    for node, label in incremental.community.items():
+        degrees[label] += incremental.degree[node]
+    for label, degree in incremental.community_degree.items():
+        assert degree == pytest.approx(degrees[label], abs=1e-9)
+
+    graph = nx.Graph()
+    graph.add_nodes_from(incremental.adjacency)
+    graph.add_weighted_edges_from(
+        (u, v, w) for u, neighbours in incremental.adjacency.items() for v, w in neighbours.items() if u < v
+    )
+    assert incremental.modularity() == pytest.approx(nx.community.modularity(graph, incremental.groups()))
+
+
+def test_ingested_messages_update_the_communities(dataset):
+    path = dataset.config["COMMUNICATION_FILE"]
+    before = communication_communities(path)
+    groups = before.communities.groups()
+    store.append(path, {"links": MESSAGES})
+
+    after = communication_communities(path)
+    assert after is not before and before.communities.groups() == groups
+    assert "New Contact" in after.communities.community
+    _check(after.communities, CommunicationCommunities(event_index(path=path)).communities)
+
+
+def test_appended_relationships_update_the_communities(dataset):
+    with open(dataset.config["RELATIONSHIPS_FILE"]) as f:
+        data = json.load(f)
+    key = "links" if "links" in data else "edges"
+    half = len(data[key]) // 2
+    base = RelationshipCommunities({"nodes": data["nodes"], key: data[key][:half]})
+    extended = base.extended(Delta(data, {key: data[key][half:]}, {key: half}))
+    assert extended.communities.total_weight > base.communities.total_weight
+    _check(extended.communities, RelationshipCommunities(data).communities)
+
+
+def test_communities_default_to_the_tfidf_fit(dataset):
+    response = dataset.test_client().get("/data/graph/communities?graph=relationships")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["method_used"] == "tfidf" and body["groups"]
+    assert any(group["topics"] for group in body["groups"])
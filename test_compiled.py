@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from app.core.compiled import open_compiled, write_compiled
+from app.core.events import build_event_index, build_event_index_columns
+
+DATA = {
+    "directed": True,
+    "graph": {"name": "sample"},
+    "nodes": [
+        {"id": "a", "type": "Entity", "weight": 1.5, "flag": True},
+        {"type": "Event", "id": "é ✓", "count": 2 ** 70, "nested": {"k": [1, None]}},
+        {"id": "c", "flag": False, "count": 0, "empty": "", "none": None},
+    ],
+    "edges": [],
+}
+
+
+def _write(tmp_path, name, data):
+    path = str(tmp_path / name)
+    with open(path, "w") as f:
+        json.dump(data, f)
+    write_compiled(path, data)
+    return path
+
+
+def test_records_round_trip(tmp_path):
+    path = _write(tmp_path, "sample.json", DATA)
+    compiled = open_compiled(path)
+    records = compiled.records("nodes")
+    assert records == DATA["nodes"]
+    # Key order and bool/int types survive too
+    assert [list(r) for r in records] == [list(r) for r in DATA["nodes"]]
+    assert [type(r.get("flag")) for r in records] == [bool, type(None), bool]
+    assert compiled.records("nodes", keys=("id",)) == [{"id": r["id"]} for r in DATA["nodes"]]
+    assert compiled.values("nodes", "weight").tolist() == [1.5, None, None]
+    assert compiled.meta["scalars"]["graph"] == DATA["graph"]
+
+
+def test_changed_json_is_not_served_from_the_snapshot(tmp_path):
+    path = _write(tmp_path, "sample.json", DATA)
+    with open(path, "w") as f:
+        json.dump({**DATA, "nodes": DATA["nodes"][:1]}, f)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path + ".snapshot/meta.json").st_mtime_ns))
+    assert open_compiled(path) is None
+
+
+def test_event_index_from_columns_matches_the_json(tmp_path):
+    for name in ("MC3_graph.json", "MC3_graph_communication.json"):
+        path = shutil.copy(os.path.join("data", name), tmp_path / name)
+        with open(path) as f:
+            data = json.load(f)
+        write_compiled(str(path), data)
+        parsed, columnar = build_event_index(data), build_event_index_columns(open_compiled(str(path)))
+        for column in ("ids", "ts", "sender", "receiver", "recv_ptr", "recv_idx", "entity_event_rows"):
+            assert np.array_equal(getattr(parsed, column), getattr(columnar, column)), (name, column)
+        assert list(parsed.entity_ids) == list(columnar.entity_ids)
+        assert [parsed.text(r) for r in range(len(parsed))] == [columnar.text(r) for r in range(len(columnar))]
@@ -0,0 +1,13 @@
+def test_unknown_part_parameter_is_a_bad_request(dataset):
+    client = dataset.test_client()
+    response = client.get("/data/graph/heatmap?x=1")
+    assert response.status_code == 400
+    assert "x" in response.get_json()["error"]
+
+
+def test_part_parameters_are_passed_on(dataset):
+    client = dataset.test_client()
+    response = client.get("/data/daily_patterns/cube?keep=slot&slot_minutes=15")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["axes"] == ["slot"] and len(body["values"]) == 96
@@ -0,0 +1,51 @@
+import json
+import os
+import time
+
+from app.core.dataset import dataset_version, store
+
+
+def _touch(path):
+    """Rewrite a data file with the same contents and a newer mtime"""
+    with open(path, "r") as f:
+        data = json.load(f)
+    data["nodes"].append({"id": "Edited", "type": "Entity", "sub_type": "Person"})
+    with open(path, "w") as f:
+        json.dump(data, f)
+    later = time.time() + 5
+    os.utime(path, (later, later))
+
+
+def test_edited_file_changes_version_without_watcher(dataset):
+    client = dataset.test_client()
+    path = dataset.config["COMMUNICATION_FILE"]
+    etag = client.get("/data/nadia_analysis").headers["ETag"]
+    version = dataset_version()
+
+    _touch(path)
+    assert dataset_version() != version
+    response = client.get("/data/nadia_analysis", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert any(node["id"] == "Edited" for node in store.load(path)["nodes"])
+
+
+def test_watched_snapshot_keeps_its_version_until_refresh(dataset):
+    path = dataset.config["COMMUNICATION_FILE"]
+    store.load(path)
+    store.check_files = False
+    version = dataset_version()
+
+    _touch(path)
+    assert dataset_version() == version
+    assert store.refresh()
+    assert dataset_version() != version
+
+
+def test_stats_count_file_and_journal_bytes(dataset):
+    path = dataset.config["COMMUNICATION_FILE"]
+    store.load(path)
+    assert store.stats()["file_bytes"] == os.path.getsize(path)
+
+    store.append(path, {"nodes": [{"id": "Ghost Vessel", "type": "Entity", "sub_type": "Vessel"}]})
+    journal = store.journal_path(path)
+    assert store.stats()["file_bytes"] == os.path.getsize(path) + os.path.getsize(journal)
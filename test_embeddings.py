@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+
+from app.core.embeddings import EmbeddingStore
+
+
+class _LetterEncoder:
+    """Letter counts, a stand-in sentence encoder"""
+
+    def encode(self, texts, show_progress_bar=False, convert_to_numpy=True):
+        return np.array([[t.count(c) for c in "abcdefghij"] for t in texts], dtype=np.float32)
+
+
+def _store(directory):
+    store = EmbeddingStore(str(directory))
+    store._encoder = _LetterEncoder()
+    return store
+
+
+def _files(directory):
+    return {
+        os.path.join(root, name): os.stat(os.path.join(root, name)).st_mtime_ns
+        for root, _, names in os.walk(directory)
+        for name in names
+    }
+
+
+def test_processes_share_appended_chunks(tmp_path):
+    first, second = _store(tmp_path), _store(tmp_path)
+    expected = _LetterEncoder().encode(["abc", "bad", "cafe"])
+
+    assert np.array_equal(first.embed(["abc", "bad"]), expected[:2])
+    written = _files(tmp_path)
+    # The second store picks up the first one's chunk and only encodes the new text
+    assert np.array_equal(second.embed(["bad", "cafe", "abc"]), expected[[1, 2, 0]])
+    assert second.encoded == 1 and second.hits == 2
+
+    # Appends add files and never rewrite existing ones
+    files = _files(tmp_path)
+    assert all(files[path] == mtime for path, mtime in written.items())
+    assert len(files) == 2 * len(written)
+
+    reopened = _store(tmp_path)
+    assert len(reopened) == 3
+    assert np.array_equal(reopened.embed(["cafe", "abc", "bad"]), expected[[2, 0, 1]])
+    assert reopened.encoded == 0
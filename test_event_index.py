@@ -0,0 +1,80 @@
+import numpy as np
+
+from app.core.adjacency import build_adjacency_index
+from app.core.communities import communication_communities
+from app.core.dataset import Delta
+from app.core.events import build_event_index, event_index
+from app.core.temporal import temporal_cube
+
+
+def test_dependents_share_the_event_index(dataset):
+    comm_file = dataset.config["COMMUNICATION_FILE"]
+    communities = communication_communities(comm_file)
+    index = event_index(path=comm_file)
+    assert communities.index is index
+    assert temporal_cube(comm_file).index is index
+
+
+def test_nadia_ignores_unknown_parameters(dataset):
+    response = dataset.test_client().get("/data/nadia_analysis?entity=Nadia%20Conti&page=2")
+    assert response.status_code == 200
+    assert "error" not in response.get_json()
+
+
+def _graph(events):
+    nodes = [{"id": e, "type": "Entity", "sub_type": "Person"} for e in ("A", "B", "C")]
+    edges = []
+    for i in range(events):
+        event = f"Event_{i}"
+        nodes.append({"id": event, "type": "Event", "sub_type": "Communication",
+                      "timestamp": f"2040-10-{1 + i % 9:02d}T0{i % 10}:00:00", "content": f"message {i}"})
+        edges.append({"type": "sent", "source": "ABC"[i % 3], "target": event})
+        edges.append({"type": "received", "source": event, "target": "ABC"[(i + 1) % 3]})
+    return {"nodes": nodes, "edges": edges}
+
+
+def _append(adjacency, index, full, base_events, events):
+    """Extend both indexes from the graph of ``base_events`` to the one of ``events``"""
+    delta = Delta(full, {"nodes": full["nodes"][3 + base_events:3 + events],
+                         "edges": full["edges"][2 * base_events:2 * events]},
+                  {"nodes": 3 + base_events, "edges": 2 * base_events})
+    delta._extended[id(adjacency)] = adjacency = adjacency.extended(delta)
+    return adjacency, index.extended(delta)
+
+
+def _same_index(a, b):
+    for name in ("ts", "sender", "receiver", "recv_ptr", "recv_idx", "text_offsets",
+                 "entity_event_ptr", "entity_event_rows", "ids", "iso"):
+        assert np.array_equal(getattr(a, name), getattr(b, name)), name
+    assert [a.text(row) for row in range(len(a))] == [b.text(row) for row in range(len(b))]
+
+
+def test_appends_match_a_fresh_build():
+    full = _graph(12)
+    base = {"nodes": full["nodes"][:3 + 4], "edges": full["edges"][:8]}
+    adjacency = build_adjacency_index(base)
+    index = build_event_index(base, adjacency)
+    before = [index.text(row) for row in range(len(index))]
+
+    middle = _append(adjacency, index, full, 4, 8)
+    adjacency_12, index_12 = _append(*middle, full, 8, 12)
+    # A second branch off the first version must not see the others' rows
+    adjacency_10, index_10 = _append(adjacency, index, full, 4, 10)
+
+    fresh = build_adjacency_index(full)
+    for node in range(len(fresh)):
+        for edge_type in ("sent", "received"):
+            for a, b in zip(adjacency_12.in_edges(node, edge_type), fresh.in_edges(node, edge_type)):
+                assert np.array_equal(a, b)
+    nodes = np.arange(len(fresh))
+    for a, b in zip(adjacency_12.neighbour_lists(nodes, "received"), fresh.neighbour_lists(nodes, "received")):
+        assert np.array_equal(a, b)
+
+    _same_index(index_12, build_event_index(full, fresh))
+    ten = {"nodes": full["nodes"][:3 + 10], "edges": full["edges"][:20]}
+    _same_index(index_10, build_event_index(ten))
+    assert len(adjacency_10) == 3 + 10
+    # Appends to the newest version write into the storage it already has
+    assert np.shares_memory(middle[1].ts, index_12.ts)
+    assert [index.text(row) for row in range(len(index))] == before
+    assert index.entity_rows("A").tolist() == [0, 2, 3]
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from app.core.heatmap import MAX_TILE, encode_tile, parse_range
+
+
+def _matrix(n=7):
+    rng = np.random.default_rng(0)
+    matrix = rng.random((n, n), dtype=np.float32)
+    return (matrix + matrix.T) / 2
+
+
+def test_parse_range():
+    assert parse_range(None, 10) == (0, 10)
+    assert parse_range("2:", 10) == (2, 10)
+    assert parse_range(":4", 10) == (0, 4)
+    assert parse_range("5:50", 10) == (5, 10)
+    assert parse_range("0:5000", 5000) == (0, MAX_TILE)
+    for bad in ("3", "a:b", "6:2"):
+        with pytest.raises(ValueError):
+            parse_range(bad, 10)
+
+
+def test_dense_tile():
+    matrix = _matrix()
+    body, headers = encode_tile(matrix, (1, 4), (2, 7), dtype="float16")
+    assert headers["X-Heatmap-Layout"] == "dense" and headers["X-Heatmap-Shape"] == "3,5"
+    tile = np.frombuffer(body, dtype="<f2").reshape(3, 5)
+    assert np.allclose(tile, matrix[1:4, 2:7], atol=1e-3)
+
+
+def test_top_k_tile_lists_each_rows_best_columns():
+    matrix = _matrix()
+    body, headers = encode_tile(matrix, (0, 7), (2, 7), top_k=3)
+    assert headers["X-Heatmap-Layout"] == "topk" and headers["X-Heatmap-Shape"] == "7,3"
+    indices = np.frombuffer(body[:7 * 3 * 4], dtype="<i4").reshape(7, 3)
+    values = np.frombuffer(body[7 * 3 * 4:], dtype="<f4").reshape(7, 3)
+    for row in range(7):
+        # Best over the whole row, self-similarity excluded, then kept if within the tile
+        others = np.delete(np.arange(7), row)
+        best = others[np.argsort(-matrix[row, others], kind="stable")[:3]]
+        expected = np.where(best >= 2, best, -1)
+        assert indices[row].tolist() == expected.tolist()
+        assert np.array_equal(values[row][expected >= 0], matrix[row, best[best >= 2]])
+        assert np.isnan(values[row][expected < 0]).all()
+    with pytest.raises(ValueError, match="dtype"):
+        encode_tile(matrix, (0, 7), (0, 7), dtype="int8")
+    with pytest.raises(ValueError, match="Empty column range"):
+        encode_tile(matrix, (0, 7), (3, 3), top_k=3)
+    with pytest.raises(ValueError, match="top_k must be positive"):
+        encode_tile(matrix, (0, 7), (0, 7), top_k=0)
+
+
+def test_tiles_endpoint(dataset):
+    client = dataset.test_client()
+    entities = client.get("/data/graph/heatmap").get_json()
+    response = client.get("/data/graph/heatmap/tiles?rows=0:3&cols=0:4")
+    assert response.status_code == 200
+    assert response.headers["X-Heatmap-Shape"] == "3,4"
+    assert len(response.get_data()) == 3 * 4 * 4
+    assert int(response.headers["X-Heatmap-Entities"]) > 3 and entities
+    assert client.get("/data/graph/heatmap/tiles?rows=9:2").status_code == 400
@@ -0,0 +1,57 @@
+import numpy as np
+
+from app.core import influence
+from app.core.dataset import store
+from app.core.events import build_event_index, event_index
+from app.core.influence import InfluenceEngine, influence_engine
+
+
+def _brute_force(index, window):
+    """followed/delay matrices by comparing every message with every later one"""
+    rows = np.flatnonzero(index.sub_type_mask("Communication") & index.valid & (index.sender >= 0))
+    ts, senders = index.ts[rows].astype(np.int64), index.sender[rows].astype(np.int64)
+    n = len(index.entity_ids)
+    followed, delay = np.zeros((n, n), dtype=np.int64), np.zeros((n, n))
+    for t, a in zip(ts, senders):
+        later = (ts > t) & (ts - t <= window) & (senders != a)
+        for b in np.unique(senders[later]):
+            gap = ts[later & (senders == b)].min() - t
+            followed[a, b] += 1
+            delay[a, b] += gap
+    return followed, delay
+
+
+def test_matrices_match_brute_force(dataset):
+    path = dataset.config["DATA_FILE"]
+    engine = influence_engine(path)
+    for window in (600, 3600):
+        _, followed, delay, _ = engine.matrices(window)
+        expected_followed, expected_delay = _brute_force(event_index(path=path), window)
+        assert np.array_equal(followed, expected_followed)
+        assert np.allclose(delay, expected_delay)
+
+
+def test_incremental_engine_matches_fresh_build(dataset):
+    path = dataset.config["DATA_FILE"]
+    influence_engine(path).matrices(3600)
+    payload = {
+        "nodes": [{"id": "Event_Communication_I1", "type": "Event", "sub_type": "Communication",
+                   "timestamp": "2040-10-05 03:10:00", "content": "on my way"}],
+        "edges": [{"type": "sent", "source": "Kelly", "target": "Event_Communication_I1"},
+                  {"type": "received", "source": "Event_Communication_I1", "target": "Sam"}],
+    }
+    assert dataset.test_client().post("/ingest", json=payload).status_code == 200
+
+    fresh = InfluenceEngine(build_event_index(store.load(path)))
+    for got, expected in zip(influence_engine(path).matrices(3600), fresh.matrices(3600)):
+        assert np.allclose(got, expected)
+
+
+def test_window_matrices_are_bounded(dataset, monkeypatch):
+    monkeypatch.setattr(influence, "MAX_WINDOWS", 3)
+    engine = influence_engine(dataset.config["DATA_FILE"])
+    for window in range(60, 600, 60):
+        engine.matrices(window)
+    engine.matrices(420)
+    engine.matrices(900)
+    assert list(engine._matrices) == [540, 420, 900]
@@ -0,0 +1,113 @@
+import os
+import threading
+
+import numpy as np
+
+from app.core.adjacency import adjacency_index
+from app.core.dataset import store
+from app.core.events import event_index
+
+COLUMNS = ["ts", "sender", "receiver", "recv_ptr", "recv_idx", "text_offsets", "node_pos", "hour",
+           "valid", "entity_event_ptr", "entity_event_rows"]
+
+PAYLOAD = {
+    "nodes": [
+        {"id": "Event_Communication_X1", "type": "Event", "sub_type": "Communication",
+         "timestamp": "2040-10-14 23:30:00", "content": "The permit for the reef cargo is ready."},
+        {"id": "Ghost Vessel", "type": "Entity", "sub_type": "Vessel", "label": "Ghost Vessel"},
+    ],
+    "edges": [
+        {"type": "sent", "source": "Ghost Vessel", "target": "Event_Communication_X1"},
+        {"type": "received", "source": "Event_Communication_X1", "target": "Nadia Conti"},
+        {"type": "received", "source": "Event_Communication_X1", "target": "Sam"},
+    ],
+}
+
+
+def _snapshot_of(index):
+    return {name: np.array(getattr(index, name)) for name in COLUMNS} | {
+        "ids": list(index.ids),
+        "texts": [index.text(row) for row in range(len(index))],
+        "entity_ids": list(index.entity_ids),
+    }
+
+
+def _assert_same(a, b):
+    assert a.keys() == b.keys()
+    for name in a:
+        if isinstance(a[name], np.ndarray):
+            assert np.array_equal(a[name], b[name]), name
+        else:
+            assert a[name] == b[name], name
+
+
+def test_ingest_matches_journal_replay(dataset):
+    client = dataset.test_client()
+    paths = [dataset.config["DATA_FILE"], dataset.config["COMMUNICATION_FILE"]]
+    for path in paths:
+        event_index(path=path)
+    assert client.post("/ingest", json=PAYLOAD).status_code == 200
+    incremental = {path: _snapshot_of(event_index(path=path)) for path in paths}
+    graph = adjacency_index(path=paths[0])
+
+    store.clear()
+    for path in paths:
+        _assert_same(incremental[path], _snapshot_of(event_index(path=path)))
+    replayed = adjacency_index(path=paths[0])
+    sam = replayed.node_pos["Sam"]
+    for edge_type in replayed.edge_types:
+        for a, b in zip(graph.in_edges(sam, edge_type), replayed.in_edges(sam, edge_type)):
+            assert np.array_equal(a, b)
+
+
+def test_pinned_snapshot_is_unchanged_by_ingest(dataset):
+    client = dataset.test_client()
+    path = dataset.config["COMMUNICATION_FILE"]
+    pinned = store.pin()
+    try:
+        index = event_index(path=path)
+        before = _snapshot_of(index)
+        messages = len(store.load(path)["links"])
+        # Another request ingests meanwhile
+        responses = []
+        writer = threading.Thread(target=lambda: responses.append(client.post("/ingest", json=PAYLOAD)))
+        writer.start()
+        writer.join()
+        assert responses[0].status_code == 200
+
+        # Still this thread's snapshot: same objects, same contents
+        assert store.snapshot() is pinned and event_index(path=path) is index
+        assert len(store.load(path)["links"]) == messages
+        _assert_same(before, _snapshot_of(index))
+    finally:
+        store.unpin()
+
+    assert len(event_index(path=path)) == len(index) + 2
+    assert len(store.load(path)["links"]) == messages + 2
+
+
+def test_failed_ingest_changes_neither_file(dataset, monkeypatch):
+    client = dataset.test_client()
+    paths = [dataset.config["DATA_FILE"], dataset.config["COMMUNICATION_FILE"]]
+    indexes = {path: event_index(path=path) for path in paths}
+    before = store.snapshot()
+    extended = type(indexes[paths[1]]).extended
+
+    def failing(index, delta):
+        # The graph file is extended first, then the message list fails
+        if index is indexes[paths[1]]:
+            raise RuntimeError("encoder crashed")
+        return extended(index, delta)
+
+    monkeypatch.setattr(type(indexes[paths[1]]), "extended", failing)
+    assert client.post("/ingest", json=PAYLOAD).status_code == 500
+
+    assert store.snapshot() is before
+    for path in paths:
+        assert event_index(path=path) is indexes[path]
+        assert not os.path.exists(store.journal_path(path))
+    monkeypatch.undo()
+    # Nothing was half-applied, so the same payload goes through afterwards
+    assert client.post("/ingest", json=PAYLOAD).status_code == 200
+    # One new event in the graph, one message per receiver in the message list
+    assert [len(event_index(path=path)) - len(indexes[path]) for path in paths] == [1, 2]
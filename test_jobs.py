@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+from app import job_queue, load_visualization_module
+from app.core.jobs import _run_visualization, job_id_for
+
+
+def test_job_id_depends_on_dataset_version():
+    params = {"method": "lda", "num_topics": "5"}
+    assert job_id_for("topic_modeling", params, "v1") == job_id_for("topic_modeling", dict(params), "v1")
+    assert job_id_for("topic_modeling", params, "v1") != job_id_for("topic_modeling", params, "v2")
+
+
+def test_async_topic_modeling_job(dataset):
+    client = dataset.test_client()
+    try:
+        response = client.get("/data/topic_modeling?async=true&method=tfidf&num_topics=3")
+        assert response.status_code == 202
+        job = response.get_json()
+        status_url, result_url = job["status_url"], job["result_url"]
+        deadline = time.time() + 120
+        while job["status"] in ("queued", "running") and time.time() < deadline:
+            time.sleep(0.5)
+            job = client.get(status_url).get_json()
+        assert job["status"] == "done", job
+
+        result = client.get(result_url)
+        assert result.status_code == 200
+        assert len(result.get_json()["topics"]) == 3
+    finally:
+        job_queue.shutdown()
+
+
+def test_error_responses_fail_the_job(dataset, monkeypatch):
+    monkeypatch.setattr(load_visualization_module("topic_modeling"), "get_data",
+                        lambda **params: {"error": "No communications"})
+    with pytest.raises(RuntimeError, match="No communications"):
+        _run_visualization("topic_modeling", {}, {"CACHE_DIR": dataset.config["CACHE_DIR"]})
@@ -0,0 +1,66 @@
+import numpy as np
+
+from app import response_cache
+from app.core import layout
+from app.core.layout import _edge_arrays, force_layout, graph_layout, spectral_layout
+
+
+def _graph(n=40):
+    """A path with a few chords, as node-link lists"""
+    nodes = [{"id": f"n{i}"} for i in range(n)]
+    links = [{"source": f"n{i}", "target": f"n{i + 1}"} for i in range(n - 1)]
+    links += [{"source": f"n{i}", "target": f"n{i + 7}"} for i in range(0, n - 7, 9)]
+    return nodes, links
+
+
+def _in_unit_square(xy):
+    return np.all((xy >= -1e-9) & (xy <= 1 + 1e-9))
+
+
+def test_parallel_edges_merge_into_log_weights():
+    nodes = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+    links = [{"source": "a", "target": "b"}] * 3 + [{"source": "b", "target": "a"},
+                                                    {"source": "c", "target": "c"},
+                                                    {"source": "a", "target": "missing"},
+                                                    {"source": "b", "target": "c"}]
+    n, sources, targets, weights = _edge_arrays(nodes, links)
+    assert n == 3
+    assert list(zip(sources.tolist(), targets.tolist())) == [(0, 1), (1, 2)]
+    assert np.allclose(weights, np.log1p([4, 1]))
+
+
+def test_force_layout_is_deterministic_and_in_the_unit_square(monkeypatch):
+    edges = _edge_arrays(*_graph())
+    first = force_layout(*edges, iterations=30, seed=3)
+    assert np.array_equal(first, force_layout(*edges, iterations=30, seed=3))
+    assert first.shape == (40, 2) and _in_unit_square(first)
+    # Row blocks smaller than the graph give the same positions
+    monkeypatch.setattr(layout, "FORCE_CHUNK", 7)
+    assert np.allclose(first, force_layout(*edges, iterations=30, seed=3))
+
+    positions = graph_layout(*_graph(), algorithm="force")
+    assert positions == graph_layout(*_graph(), algorithm="force")
+    assert _in_unit_square(np.array([positions["x"], positions["y"]]))
+
+
+def test_sparse_spectral_layout_matches_the_dense_one(monkeypatch):
+    edges = _edge_arrays(*_graph())
+    dense = spectral_layout(*edges)
+    monkeypatch.setattr(layout, "DENSE_SPECTRAL_NODES", 10)
+    sparse = spectral_layout(*edges)
+    assert _in_unit_square(dense) and _in_unit_square(sparse)
+    # Eigenvectors are defined up to sign
+    for axis in range(2):
+        assert abs(np.corrcoef(dense[:, axis], sparse[:, axis])[0, 1]) > 0.999
+
+
+def test_file_layout_is_computed_once_per_file_version(dataset, monkeypatch):
+    builds = []
+    monkeypatch.setattr(layout, "graph_layout", lambda *args: builds.append(args) or graph_layout(*args))
+    client = dataset.test_client()
+    first = client.get("/data/graph/relationships?layout=spectral").get_json()
+    response_cache.clear()
+    second = client.get("/data/graph/relationships?layout=spectral").get_json()
+    assert len(builds) == 1
+    assert first["layout"] == second["layout"]
+    assert len(first["layout"]["x"]) == len(first["nodes"])
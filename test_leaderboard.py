@@ -0,0 +1,15 @@
+def test_leaderboard_matches_the_entity_profiles(dataset):
+    client = dataset.test_client()
+    board = client.get("/data/nadia_analysis?view=leaderboard").get_json()
+    assert board["total_entities"] == len(board["leaderboard"]) > 1
+    assert [entry["rank"] for entry in board["leaderboard"]] == list(range(1, board["total_entities"] + 1))
+
+    for entry in board["leaderboard"]:
+        profile = client.get("/data/nadia_analysis", query_string={"entity": entry["entity"]}).get_json()
+        suspicion = profile["suspicion_analysis"]
+        assert entry["total_communications"] == profile["nadia_profile"]["total_communications"], entry["entity"]
+        assert entry["indicators"] == suspicion["indicators"], entry["entity"]
+        assert entry["overall_score"] == suspicion["overall_score"]
+        assert entry["recommendation"] == suspicion["recommendation"]
+        assert entry["permit_related"] == len(profile["authority_patterns"]["permit_related"])
+        assert entry["suspicious_messages"] == profile["communication_patterns"]["suspicious_messages_count"]
@@ -0,0 +1,27 @@
+import random
+import re
+
+from app.core.matcher import TermMatcher
+
+
+def _expected(terms, text, whole_words):
+    text = text.lower()
+    if whole_words:
+        return {t for t in terms if re.search(rf"\b{re.escape(t)}\b", text)}
+    return {t for t in terms if t in text}
+
+
+def test_matches_like_one_search_per_term():
+    rng = random.Random(0)
+    for _ in range(300):
+        terms = list({"".join(rng.choice("ab -") for _ in range(rng.randint(1, 4))) for _ in range(6)})
+        text = "".join(rng.choice("abAB -.") for _ in range(rng.randint(0, 30)))
+        for whole_words in (False, True):
+            assert TermMatcher(terms, whole_words).find(text) == _expected(terms, text, whole_words)
+
+
+def test_word_boundaries():
+    matcher = TermMatcher({"permits": ["permit", "permits"], "cargo": ["cargo"]}, whole_words=True)
+    assert matcher.scan("Permits for the reef cargo.") == {"permits": ["permits"], "cargo": ["cargo"]}
+    assert matcher.scan("permitted cargoes") == {"permits": [], "cargo": []}
+    assert matcher.scan("a permit, then permits") == {"permits": ["permit", "permits"], "cargo": []}
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from app.core.postings import PostingIndex, decode_cursor, encode_cursor, page
+
+
+def test_select_unions_values_and_intersects_dimensions():
+    rows = [("a", "x"), ("b", "x"), ("a", "y"), ("c", "y"), ("b", "z")]
+    postings = PostingIndex()
+    for position, (letter, axis) in enumerate(rows):
+        postings.add("letter", letter, position)
+        postings.add("axis", axis, position)
+    postings.freeze(len(rows))
+
+    for filters in ({}, {"letter": ["a", "b"]}, {"letter": ["a", "b"], "axis": ["y", "z"]}, {"axis": ["q"]}):
+        expected = [i for i, (letter, axis) in enumerate(rows)
+                    if letter in filters.get("letter", [letter]) and axis in filters.get("axis", [axis])]
+        assert postings.select(filters).tolist() == expected
+
+
+def test_pages_follow_the_cursor():
+    positions = np.array([2, 3, 5, 8, 13])
+    first, last = page(positions, None, 2)
+    assert first.tolist() == [2, 3]
+    second, last = page(positions, decode_cursor(encode_cursor("v1", last), "v1"), 2)
+    assert second.tolist() == [5, 8]
+    third, last = page(positions, last, 2)
+    assert third.tolist() == [13] and last is None
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("v1", 3), "v2")
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor", "v1")
+
+
+def test_paging_covers_the_filtered_events(dataset):
+    client = dataset.test_client()
+    events = client.get("/data/time_patterns").get_json()["events"]
+    expected = {e["id"] for e in events
+                if e["sub_type"] in ("Communication", "Monitoring") and e["date"] in ("2040-10-01", "2040-10-02")}
+
+    assert len(expected) > 7
+    seen, cursor = [], None
+    while True:
+        query = "event_type=Communication,Monitoring&date=2040-10-01,2040-10-02&limit=7"
+        body = client.get(f"/data/time_patterns?{query}" + (f"&cursor={cursor}" if cursor else "")).get_json()
+        assert body["total"] == len(expected)
+        assert ("filter_options" in body) == (cursor is None)
+        seen.extend(e["id"] for e in body["events"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) and set(seen) == expected
+
+
+def test_bad_paging_parameters_are_rejected(dataset):
+    client = dataset.test_client()
+    query = "/data/time_patterns?event_type=Communication&limit=5"
+    cursor = client.get(query).get_json()["next_cursor"]
+    assert client.get(f"{query}&cursor={cursor}").status_code == 200
+    assert client.get("/data/time_patterns?limit=five").status_code == 400
+    assert client.get(f"{query}&cursor=not-a-cursor").status_code == 400
+
+    # Positions move when events are ingested: the earlier cursor is stale
+    event = {"id": "Event_Communication_X1", "type": "Event", "sub_type": "Communication",
+             "timestamp": "2040-10-14 23:30:00", "content": "The permit for the reef cargo is ready."}
+    edges = [{"type": "sent", "source": "Sam", "target": event["id"]},
+             {"type": "received", "source": event["id"], "target": "Nadia Conti"}]
+    assert client.post("/ingest", json={"nodes": [event], "edges": edges}).status_code == 200
+    response = client.get(f"{query}&cursor={cursor}")
+    assert response.status_code == 400
+    assert "different version" in response.get_json()["error"]
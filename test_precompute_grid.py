@@ -0,0 +1,45 @@
+import os
+
+import app as app_module
+from app.core.artifacts import artifact_path, expand_grid, find_artifact
+from app.core.dataset import dataset_version
+from app.visualizations import daily_patterns, topic_modeling
+
+
+def test_bertopic_is_precomputed_once():
+    for module in (topic_modeling, daily_patterns):
+        combos = expand_grid(module.PRECOMPUTE_GRID)
+        bertopic = [params for params in combos if params.get("method") == "bertopic"]
+        assert len(bertopic) == 1 and "num_topics" not in bertopic[0]
+        lda = [params for params in combos if params.get("method") == "lda?vectorizer=bow"]
+        assert len(lda) == len(topic_modeling.TOPIC_COUNTS)
+
+
+def test_precomputed_artifacts_are_served_for_their_version(dataset, monkeypatch):
+    client = dataset.test_client()
+    result = dataset.test_cli_runner().invoke(args=["precompute", "--only", "keyword_analysis"])
+    assert result.exit_code == 0 and "keyword_analysis {}: ok" in result.output
+
+    version = dataset_version()
+    path = artifact_path("keyword_analysis", {})
+    assert path == os.path.join(dataset.config["ARTIFACT_DIR"], version, "keyword_analysis", os.path.basename(path))
+    with open(path, "rb") as f:
+        body = f.read()
+
+    # The artifact is served as-is, without loading the visualization module
+    loaded, load = [], app_module.load_visualization_module
+    monkeypatch.setattr(app_module, "load_visualization_module", lambda name: loaded.append(name) or load(name))
+    response = client.get("/data/keyword_analysis")
+    assert response.status_code == 200 and response.get_data() == body
+    assert loaded == []
+
+    # A new dataset version has no artifact yet: the module computes the response
+    event = {"id": "Event_Communication_X1", "type": "Event", "sub_type": "Communication",
+             "timestamp": "2040-10-14 23:30:00", "content": "The permit for the reef cargo is ready."}
+    edges = [{"type": "sent", "source": "Sam", "target": event["id"]},
+             {"type": "received", "source": event["id"], "target": "Nadia Conti"}]
+    assert client.post("/ingest", json={"nodes": [event], "edges": edges}).status_code == 200
+    assert dataset_version() != version and find_artifact("keyword_analysis", {}) is None
+    response = client.get("/data/keyword_analysis")
+    assert response.status_code == 200 and response.get_data() != body
+    assert loaded == ["keyword_analysis"]
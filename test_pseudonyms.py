@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+
+from app.core.dataset import store
+from app.core.events import event_index
+from app.core.pseudonyms import SimilarityEngine, similarity_matrix
+
+MESSAGE = {"source": "Nadia Conti", "target": "Sam", "event_id": "Event_Communication_X1",
+           "datetime": "2040-10-14 23:30:00", "content": "The permit for the reef cargo is ready."}
+
+
+def _letters(texts):
+    """Letter counts, a stand-in sentence encoder"""
+    return [[text.lower().count(c) for c in "abcdefghijklmnopqrstuvwxyz"] for text in texts]
+
+
+def test_readers_proceed_while_new_messages_are_encoded(dataset):
+    path = dataset.config["COMMUNICATION_FILE"]
+    encoding, release = threading.Event(), threading.Event()
+
+    def slow(texts):
+        if texts == [MESSAGE["content"]]:
+            encoding.set()
+            release.wait(5)
+        return _letters(texts)
+
+    def engine():
+        return store.derive(path, "pseudonyms", lambda data: SimilarityEngine(event_index(path=path), slow))
+
+    before = engine()
+    writer = threading.Thread(target=store.append, args=(path, {"links": [MESSAGE]}))
+    writer.start()
+    try:
+        assert encoding.wait(5)
+        # The append is stuck in the encoder: reads still get the current engine
+        assert engine() is before
+        assert dataset.test_client().get("/data/keyword_analysis").status_code == 200
+    finally:
+        release.set()
+        writer.join()
+
+    after = engine()
+    assert after is not before and after.counts.sum() == before.counts.sum() + 1
+    fresh = SimilarityEngine(event_index(path=path), _letters)
+    assert np.array_equal(after.counts, fresh.counts)
+    assert np.allclose(after.similarity, fresh.similarity, atol=1e-5)
+
+
+def test_missing_encoder_is_tried_once_per_version(dataset, monkeypatch):
+    attempts = []
+
+    def unavailable():
+        attempts.append(1)
+        raise ImportError("No module named 'sentence_transformers'")
+
+    monkeypatch.setattr("app.core.pseudonyms.embedding_store", unavailable)
+    for _ in range(3):
+        entities, matrix, source = similarity_matrix()
+        assert source == "csv" and matrix.shape == (len(entities), len(entities))
+    assert len(attempts) == 1
+
+    # A new version of the message list gets one more try
+    store.append(dataset.config["COMMUNICATION_FILE"], {"links": [MESSAGE]})
+    similarity_matrix()
+    similarity_matrix()
+    assert len(attempts) == 2
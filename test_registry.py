@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.core.registry import VisualizationRegistry, read_metadata
+
+# Runs in a fresh interpreter, so modules imported by other tests do not count
+INDEX_SCRIPT = """
+import json, sys
+from app import app, visualization_registry
+response = app.test_client().get("/")
+heavy = [name for name in ("sklearn", "bertopic", "sentence_transformers") if name in sys.modules]
+print(json.dumps({
+    "status": response.status_code,
+    "page": response.get_data(as_text=True),
+    "topic_modeling": visualization_registry.metadata("topic_modeling"),
+    "loaded": sorted(name for name in sys.modules if name.startswith("app.visualizations.")),
+    "heavy": heavy,
+}))
+"""
+
+
+def test_read_metadata_without_importing(tmp_path):
+    path = tmp_path / "sample.py"
+    path.write_text(
+        "import not_installed_anywhere\n"
+        "NAME = 'sample'\n"
+        "TITLE = 'Sample ' + 'View'\n"
+        "DESCRIPTION = 'Counts things'\n"
+    )
+    # Only literal values are read; the import is never executed
+    assert read_metadata(str(path)) == {"NAME": "sample", "DESCRIPTION": "Counts things"}
+
+    registry = VisualizationRegistry(str(tmp_path))
+    assert registry.metadata("sample") == {
+        "name": "sample", "title": "Sample", "description": "Counts things",
+    }
+    assert registry.metadata("missing")["title"] == "Missing"
+
+
+def test_index_lists_visualizations_without_importing_them():
+    output = subprocess.run(
+        [sys.executable, "-c", INDEX_SCRIPT], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result["status"] == 200
+    assert result["topic_modeling"]["title"] == "Topic Modeling Explorer"
+    assert "Topic Modeling Explorer" in result["page"]
+    assert result["loaded"] == [] and result["heavy"] == []
@@ -0,0 +1,21 @@
+from test_ingest import PAYLOAD
+
+
+def test_etag_and_not_modified(dataset):
+    client = dataset.test_client()
+    first = client.get("/data/keyword_analysis")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag
+    again = client.get("/data/keyword_analysis", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and not again.get_data()
+    compressed = client.get("/data/keyword_analysis", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == etag
+
+
+def test_etag_changes_with_the_data(dataset):
+    client = dataset.test_client()
+    etag = client.get("/data/keyword_analysis").headers["ETag"]
+    assert client.post("/ingest", json=PAYLOAD).status_code == 200
+    after = client.get("/data/keyword_analysis", headers={"If-None-Match": etag})
+    assert after.status_code == 200 and after.headers["ETag"] != etag
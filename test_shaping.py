@@ -0,0 +1,68 @@
+import copy
+
+import pytest
+
+from app.core.shaping import normalize, parse_fields, project, shape_response
+
+NODE = {"id": "n1", "type": "Event"}
+DATA = {
+    "events": [
+        {"id": "e1", "raw": NODE, "sources": [{"id": "a", "raw": {"id": "a"}}], "text": "x"},
+        {"id": "e2", "raw": NODE, "sources": [], "text": "y"},
+    ],
+    "filter_options": {"dates": ["2040-10-01"]},
+}
+
+
+class _Normalized:
+    NORMALIZE = {"raw": "nodes"}
+
+
+def _denormalize(value, tables, references):
+    if isinstance(value, list):
+        return [_denormalize(item, tables, references) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        name: tables[references[name]][item] if name in references and isinstance(item, int)
+        else _denormalize(item, tables, references)
+        for name, item in value.items()
+    }
+
+
+def test_fields_projection():
+    include, exclude = parse_fields("events.id,events.sources.id,filter_options")
+    assert project(DATA, include, exclude) == {
+        "events": [{"id": "e1", "sources": [{"id": "a"}]}, {"id": "e2", "sources": []}],
+        "filter_options": {"dates": ["2040-10-01"]},
+    }
+    include, exclude = parse_fields("-events.raw,-events.sources,-filter_options")
+    assert project(DATA, include, exclude) == {"events": [{"id": "e1", "text": "x"}, {"id": "e2", "text": "y"}]}
+    assert shape_response(None, DATA, {"fields": "events.text"}) == {"events": [{"text": "x"}, {"text": "y"}]}
+
+
+def test_unknown_fields_are_rejected():
+    for fields in ("evnts", "events.texts", "-filter_options.days"):
+        with pytest.raises(ValueError, match=fields.lstrip("-")):
+            shape_response(None, DATA, {"fields": fields})
+    # An empty list cannot tell a misspelled field from a missing one
+    assert shape_response(None, {"events": []}, {"fields": "events.id"}) == {"events": []}
+
+
+def test_unknown_fields_are_a_bad_request(dataset):
+    client = dataset.test_client()
+    response = client.get("/data/time_patterns?fields=events.idd")
+    assert response.status_code == 400 and "events.idd" in response.get_json()["error"]
+    assert client.get("/data/graph/heatmap?fields=nope").status_code == 400
+
+
+def test_normalized_payload_round_trips():
+    original = copy.deepcopy(DATA)
+    shaped = shape_response(_Normalized, DATA)
+    # The node shared by both events is sent once
+    assert [e["raw"] for e in shaped["events"]] == [0, 0]
+    assert shaped["tables"]["nodes"] == [NODE, {"id": "a"}]
+    tables = shaped.pop("tables")
+    assert _denormalize(shaped, tables, _Normalized.NORMALIZE) == DATA == original
+    assert shape_response(_Normalized, DATA, {"normalize": "false"}) == DATA
+    assert normalize(DATA, {})["tables"] == {}
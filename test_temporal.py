@@ -0,0 +1,61 @@
+import numpy as np
+
+from app.core.dataset import store
+from app.core.events import build_event_index, event_index
+from app.core.temporal import TemporalCube, temporal_cube
+
+
+def _message(event_id, sender, receivers, timestamp):
+    """Graph nodes and edges of one Communication event, as posted to /ingest"""
+    nodes = [{
+        "id": event_id, "type": "Event", "sub_type": "Communication",
+        "timestamp": timestamp, "content": "meet at the north dock",
+    }]
+    edges = [{"type": "sent", "source": sender, "target": event_id}]
+    edges += [{"type": "received", "source": event_id, "target": r} for r in receivers]
+    return {"nodes": nodes, "edges": edges}
+
+
+def test_message_to_several_receivers_counts_once_for_its_sender(dataset):
+    client = dataset.test_client()
+    paths = [dataset.config["DATA_FILE"], dataset.config["COMMUNICATION_FILE"]]
+    before = {path: temporal_cube(path).entity_slots().copy() for path in paths}
+
+    payload = _message("Event_Communication_T1", "Sam", ["Kelly", "Nadia Conti"], "2040-10-05 03:10:00")
+    assert client.post("/ingest", json=payload).status_code == 200
+
+    for path in paths:
+        index = event_index(path=path)
+        cube = temporal_cube(path)
+        added = cube.entity_slots() - np.pad(before[path], ((0, cube.n_entities - len(before[path])), (0, 0)))
+        for entity in ("Sam", "Kelly", "Nadia Conti"):
+            assert added[index.entity_pos[entity], 3] == 1
+        assert added.sum() == 3
+
+        # The pair cube keeps one count per receiver
+        sam = index.entity_pos["Sam"]
+        values, labels = cube.rollup(keep=("receiver",), senders=[sam], days=cube.day_range("2040-10-05"))
+        counts = dict(zip(labels["receiver"], values.tolist()))
+        assert counts["Kelly"] >= 1 and counts["Nadia Conti"] >= 1
+
+        # Filtered entity roll-ups count the message once as well
+        filtered, _ = cube.rollup(keep=("entity", "slot"), receivers=[index.entity_pos["Kelly"]],
+                                  days=cube.day_range("2040-10-05"))
+        full, _ = cube.rollup(keep=("sender", "receiver", "slot"), days=cube.day_range("2040-10-05"))
+        assert filtered[sam, 3] == full[sam, index.entity_pos["Kelly"], 3]
+
+
+def test_incremental_cube_matches_fresh_build(dataset):
+    client = dataset.test_client()
+    path = dataset.config["COMMUNICATION_FILE"]
+    incremental = temporal_cube(path, 15)
+    payload = _message("Event_Communication_T2", "Sam", ["Kelly", "Nadia Conti"], "2040-10-20 23:50:00")
+    payload["nodes"].append({"id": "Newcomer", "type": "Entity", "sub_type": "Person"})
+    payload["edges"].append({"type": "received", "source": "Event_Communication_T2", "target": "Newcomer"})
+    assert client.post("/ingest", json=payload).status_code == 200
+
+    incremental = temporal_cube(path, 15)
+    fresh = TemporalCube(build_event_index(store.load(path)), 15)
+    assert incremental.first_day == fresh.first_day
+    assert np.array_equal(incremental.counts, fresh.counts)
+    assert np.array_equal(incremental.sent, fresh.sent)
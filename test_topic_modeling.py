@@ -0,0 +1,40 @@
+from app.core.cache import ResultCache, topic_cache
+from app.visualizations import topic_modeling
+
+TEXTS = [
+    "shipment of fish arrives at the north dock tonight",
+    "the north dock shipment is delayed until morning",
+    "meet at the harbor office about the permit",
+    "permit for the harbor office was approved today",
+    "fish and cargo inspection scheduled at the dock",
+    "cargo inspection moved to the harbor office",
+    "tonight the vessel leaves the north dock",
+    "approved permit covers the vessel and cargo",
+]
+
+
+def test_get_or_compute_skips_values_not_kept():
+    cache = ResultCache("test")
+    assert cache.get_or_compute("a", lambda: {"x": 1}, keep=lambda value: False) == {"x": 1}
+    assert cache.get("a") is None
+    assert cache.get_or_compute("a", lambda: {"x": 2}) == {"x": 2}
+    assert cache.get("a") == {"x": 2}
+
+
+def test_fallback_fit_is_not_cached_under_failed_method(monkeypatch):
+    def failing_lda(*args, **kwargs):
+        raise RuntimeError("LDA unavailable")
+
+    monkeypatch.setattr("sklearn.decomposition.LatentDirichletAllocation", failing_lda)
+    topic_cache.clear()
+    result = topic_modeling.fit_topics(TEXTS, "lda", num_topics=3)
+    assert result["topics"] and "fallback" not in result
+    assert topic_cache.stats()["entries"] == 0
+
+    monkeypatch.undo()
+    result = topic_modeling.fit_topics(TEXTS, "lda", num_topics=3)
+    assert len(result["topics"]) == 3 and "fallback" not in result
+    assert topic_cache.stats()["entries"] == 1
+    # Served from the cache, the flag is stripped all the same
+    assert topic_modeling.fit_topics(TEXTS, "lda", num_topics=3) == result
+    topic_cache.clear()